@@ -0,0 +1,174 @@
+# Métricas sobre séries diárias compactas (médias, desvio, tendência, histogramas).
+#
+# As séries chegam como vetores: arrays do NumPy quando ele está instalado, ou
+# array.array da biblioteca padrão como alternativa. Com NumPy os cálculos são
+# vetorizados; sem ele as mesmas funções percorrem os arrays em Python e
+# devolvem os mesmos resultados.
+from array import array
+import math
+
+try:
+    import numpy as np
+except ImportError:  # NumPy é opcional
+    np = None
+
+HAS_NUMPY = np is not None
+
+
+def as_series(values, integer=False):
+    if HAS_NUMPY:
+        return np.fromiter(values, dtype=np.int64 if integer else np.float64)
+    return array('q' if integer else 'd', values)
+
+
+def mean(series):
+    if not len(series):
+        return 0.0
+    if HAS_NUMPY:
+        return float(np.mean(series))
+    return math.fsum(series) / len(series)
+
+
+def std(series):
+    # Desvio padrão populacional
+    if not len(series):
+        return 0.0
+    if HAS_NUMPY:
+        return float(np.std(series))
+    series_mean = mean(series)
+    return math.sqrt(math.fsum((value - series_mean) ** 2 for value in series) / len(series))
+
+
+def rolling_mean(series, window):
+    # Médias das janelas completas: len(series) - window + 1 valores
+    if window <= 0 or len(series) < window:
+        return as_series([])
+    if HAS_NUMPY:
+        cumulative = np.concatenate(([0.0], np.cumsum(series, dtype=np.float64)))
+        return (cumulative[window:] - cumulative[:-window]) / window
+
+    result = array('d')
+    window_sum = math.fsum(series[:window])
+    result.append(window_sum / window)
+    for index in range(window, len(series)):
+        window_sum += series[index] - series[index - window]
+        result.append(window_sum / window)
+    return result
+
+
+def trend_slope(series):
+    # Inclinação da reta de mínimos quadrados (variação por posição da série)
+    count = len(series)
+    if count < 2:
+        return 0.0
+    if HAS_NUMPY:
+        positions = np.arange(count, dtype=np.float64)
+        centered = positions - positions.mean()
+        return float(np.dot(centered, series - np.mean(series)) / np.dot(centered, centered))
+
+    position_mean = (count - 1) / 2
+    series_mean = mean(series)
+    numerator = math.fsum((index - position_mean) * (value - series_mean) for index, value in enumerate(series))
+    denominator = math.fsum((index - position_mean) ** 2 for index in range(count))
+    return numerator / denominator
+
+
+def argmax(series):
+    # Primeira posição do maior valor, como max() do Python
+    if not len(series):
+        return None
+    if HAS_NUMPY:
+        return int(np.argmax(series))
+    return max(range(len(series)), key=series.__getitem__)
+
+
+def percentile(series, pct):
+    # Interpolação linear entre as posições vizinhas, como o padrão de numpy.percentile
+    if not len(series):
+        return 0.0
+    if HAS_NUMPY:
+        return float(np.percentile(series, pct))
+
+    ordered = sorted(series)
+    position = (len(ordered) - 1) * pct / 100
+    lower = math.floor(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def distribution(series):
+    return {
+        'count': len(series),
+        'average': round(mean(series), 1),
+        'median': round(percentile(series, 50), 1),
+        'p90': round(percentile(series, 90), 1),
+        'min': int(min(series)) if len(series) else 0,
+        'max': int(max(series)) if len(series) else 0
+    }
+
+
+def count_positive(series):
+    if HAS_NUMPY:
+        return int(np.count_nonzero(np.asarray(series) > 0))
+    return sum(1 for value in series if value > 0)
+
+
+def histogram(keys, weights, size):
+    # Soma dos pesos por chave inteira em [0, size)
+    if HAS_NUMPY:
+        return np.bincount(np.asarray(keys, dtype=np.int64), weights=np.asarray(weights, dtype=np.float64),
+                           minlength=size)[:size]
+
+    totals = array('d', [0.0] * size)
+    for key, weight in zip(keys, weights):
+        totals[key] += weight
+    return totals
+
+
+def first_occurrence(keys, positions, size):
+    # Menor posição (ex.: id) vista para cada chave; math.inf quando a chave não aparece
+    if HAS_NUMPY:
+        result = np.full(size, np.inf)
+        np.minimum.at(result, np.asarray(keys, dtype=np.int64), np.asarray(positions, dtype=np.float64))
+        return result
+
+    result = array('d', [math.inf] * size)
+    for key, position in zip(keys, positions):
+        if position < result[key]:
+            result[key] = position
+    return result
+
+
+def ordered_buckets(totals, first_seen):
+    # Índices com total positivo, na ordem em que cada um apareceu primeiro
+    return sorted((index for index in range(len(totals)) if totals[index] > 0), key=lambda index: first_seen[index])
+
+
+def historical_patterns(dates, counts):
+    # dates: datas ISO em ordem; counts: atividades concluídas em cada data
+    series = as_series(counts)
+    if not len(series):
+        return {}
+
+    average = mean(series)
+    best_index = argmax(series)
+    deviation = std(series)
+    consistency = max(0, 100 - (deviation / average * 100)) if average > 0 else 0
+
+    trend = 'stable'
+    if len(series) >= 14:
+        weekly = rolling_mean(series, 7)
+        first_week, last_week = weekly[0], weekly[-1]
+        if last_week > first_week * 1.2:
+            trend = 'up'
+        elif last_week < first_week * 0.8:
+            trend = 'down'
+
+    return {
+        'average_daily_activities': round(average, 1),
+        'best_day': dates[best_index],
+        'best_day_count': counts[best_index],
+        'consistency_score': round(consistency, 1),
+        'trend': trend,
+        'trend_slope': round(trend_slope(series), 3)
+    }
@@ -1,16 +1,28 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session, g
-from models import db, User, Category, Activity, Progress, Reward, ScheduledActivity, UserPoints, PointTransaction, WeeklyStreak    
+from flask import Flask, render_template, request, jsonify, redirect, url_for, session, g, has_app_context, has_request_context, Response
+from models import db, User, Category, Activity, Progress, Reward, ScheduledActivity, UserPoints, PointTransaction, WeeklyStreak, ActivityProgressTotal, DailyStatsRollup, ScheduleTimeRollup, UserDataVersion, ResponseCacheEntry, BackgroundJob, PointBalanceSnapshot, ScheduleRecurrence
 from datetime import datetime, date, timedelta
 import json
 import os
+import hashlib
+import base64
+import csv
+import io
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import random
 import logging
-from sqlalchemy import func, or_, text, desc, asc, and_, not_, case
+from sqlalchemy import func, or_, text, desc, asc, and_, not_, case, event, insert, update, select, inspect, cast, Integer
+from sqlalchemy.engine import Engine
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
+from sqlalchemy.orm import joinedload, Session
 from werkzeug.security import generate_password_hash, check_password_hash
 from functools import wraps
 import traceback
 import time
+import threading
+import click
+import analytics
 
 # ============ CONFIGURAÇÃO ============
 app = Flask(__name__)
@@ -34,6 +46,34 @@ app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['SESSION_PERMANENT'] = True
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(hours=24)
 
+# Cache de respostas por usuário: 'memory' (LRU do processo) ou 'database' (compartilhado entre workers)
+app.config['RESPONSE_CACHE_BACKEND'] = os.environ.get('RESPONSE_CACHE_BACKEND', 'memory')
+app.config['RESPONSE_CACHE_TTL'] = int(os.environ.get('RESPONSE_CACHE_TTL', 300))
+app.config['RESPONSE_CACHE_MAX_ENTRIES'] = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 1024))
+
+# Métricas internas: cabeçalho Server-Timing opcional e token do endpoint /internal/metrics
+app.config['SERVER_TIMING'] = os.environ.get('SERVER_TIMING', '').lower() in ('1', 'true', 'yes')
+app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+
+# Tarefas pós-commit: 'thread' (pool de threads do processo) ou 'sync' (executa logo após o commit);
+# com BACKGROUND_JOBS_DURABLE as tarefas também ficam gravadas em background_jobs até serem executadas
+app.config['BACKGROUND_JOBS_MODE'] = os.environ.get('BACKGROUND_JOBS_MODE', 'thread')
+app.config['BACKGROUND_WORKERS'] = int(os.environ.get('BACKGROUND_WORKERS', 2))
+app.config['BACKGROUND_JOBS_DURABLE'] = os.environ.get('BACKGROUND_JOBS_DURABLE', '').lower() in ('1', 'true', 'yes')
+app.config['BACKGROUND_JOBS_MAX_ATTEMPTS'] = int(os.environ.get('BACKGROUND_JOBS_MAX_ATTEMPTS', 5))
+
+# Granularidade dos snapshots de saldo de pontos: 'day' ou 'month'
+app.config['POINT_SNAPSHOT_GRANULARITY'] = os.environ.get('POINT_SNAPSHOT_GRANULARITY', 'day')
+
+# Máximo de registros aceitos por chamada de /api/progress/batch
+app.config['PROGRESS_BATCH_MAX_ENTRIES'] = int(os.environ.get('PROGRESS_BATCH_MAX_ENTRIES', 5000))
+
+# Análise de horários dos agendamentos: 'window' recalcula a cada leitura sobre os últimos
+# TIME_PATTERNS_WINDOW_DAYS dias (0 = todo o histórico); 'incremental' lê os contadores por
+# dia da semana e hora mantidos na escrita (sempre todo o histórico)
+app.config['TIME_PATTERNS_MODE'] = os.environ.get('TIME_PATTERNS_MODE', 'window')
+app.config['TIME_PATTERNS_WINDOW_DAYS'] = int(os.environ.get('TIME_PATTERNS_WINDOW_DAYS', 0))
+
 # Configurações de pool de conexões para PostgreSQL
 app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
     'pool_recycle': 300,
@@ -44,6 +84,118 @@ app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
 
 db.init_app(app)
 
+# ============ MÉTRICAS ============
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+request_metrics = {}
+request_metrics_lock = threading.Lock()
+
+def new_histogram(buckets):
+    return {'buckets': [0] * len(buckets), 'sum': 0.0, 'count': 0}
+
+def observe_histogram(histogram, buckets, value):
+    for i, bound in enumerate(buckets):
+        if value <= bound:
+            histogram['buckets'][i] += 1
+    histogram['sum'] += value
+    histogram['count'] += 1
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def track_sql_start(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def track_sql_end(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['query_start_time'].pop()
+    if has_request_context() and 'request_started' in g:
+        g.sql_count += 1
+        g.sql_time += time.perf_counter() - started
+
+@event.listens_for(Engine, 'handle_error')
+def track_sql_error(exception_context):
+    # Comandos que falham não passam por after_cursor_execute
+    connection = exception_context.connection
+    if connection is not None and connection.info.get('query_start_time'):
+        connection.info['query_start_time'].pop()
+
+@app.before_request
+def start_request_metrics():
+    g.request_started = time.perf_counter()
+    g.sql_count = 0
+    g.sql_time = 0.0
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.get('request_started')
+    if started is None:
+        return response
+    
+    elapsed = time.perf_counter() - started
+    key = (request.endpoint or 'not_found', request.method)
+    
+    with request_metrics_lock:
+        metrics = request_metrics.get(key)
+        if not metrics:
+            metrics = request_metrics[key] = {
+                'latency': new_histogram(LATENCY_BUCKETS),
+                'sql_per_request': new_histogram(SQL_COUNT_BUCKETS),
+                'sql_statements': 0,
+                'db_seconds': 0.0
+            }
+        observe_histogram(metrics['latency'], LATENCY_BUCKETS, elapsed)
+        observe_histogram(metrics['sql_per_request'], SQL_COUNT_BUCKETS, g.sql_count)
+        metrics['sql_statements'] += g.sql_count
+        metrics['db_seconds'] += g.sql_time
+    
+    if app.config['SERVER_TIMING']:
+        response.headers['Server-Timing'] = (
+            f'db;desc="SQL ({g.sql_count})";dur={g.sql_time * 1000:.1f}, '
+            f'total;dur={elapsed * 1000:.1f}'
+        )
+    return response
+
+def render_prometheus_metrics():
+    lines = []
+    
+    def histogram_lines(name, description, buckets, attr):
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} histogram')
+        for (endpoint, method), metrics in sorted(request_metrics.items()):
+            histogram = metrics[attr]
+            labels = f'endpoint="{endpoint}",method="{method}"'
+            for bound, count in zip(buckets, histogram['buckets']):
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram["count"]}')
+            lines.append(f'{name}_sum{{{labels}}} {histogram["sum"]}')
+            lines.append(f'{name}_count{{{labels}}} {histogram["count"]}')
+    
+    def counter_lines(name, description, attr):
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} counter')
+        for (endpoint, method), metrics in sorted(request_metrics.items()):
+            lines.append(f'{name}{{endpoint="{endpoint}",method="{method}"}} {metrics[attr]}')
+    
+    with request_metrics_lock:
+        histogram_lines('organizador_request_duration_seconds', 'Latência das requisições por endpoint',
+                        LATENCY_BUCKETS, 'latency')
+        histogram_lines('organizador_sql_statements_per_request', 'Comandos SQL executados por requisição',
+                        SQL_COUNT_BUCKETS, 'sql_per_request')
+        counter_lines('organizador_sql_statements_total', 'Total de comandos SQL por endpoint', 'sql_statements')
+        counter_lines('organizador_db_time_seconds_total', 'Tempo total gasto no banco por endpoint', 'db_seconds')
+    
+    return '\n'.join(lines) + '\n'
+
+@app.route('/internal/metrics')
+def internal_metrics():
+    token = app.config['METRICS_TOKEN']
+    if token:
+        if request.headers.get('Authorization') != f'Bearer {token}':
+            return jsonify({'error': 'Não autorizado'}), 401
+    elif request.remote_addr not in ('127.0.0.1', '::1'):
+        return jsonify({'error': 'Não autorizado'}), 401
+    
+    return app.response_class(render_prometheus_metrics(), mimetype='text/plain; version=0.0.4')
 
 # Função para obter o ID do usuário atual
 def get_current_user_id():
@@ -53,7 +205,7 @@ def get_current_user_id():
 @app.before_request
 def check_authentication():
     public_routes = ['login', 'logout', 'api_auth_login', 'api_auth_logout', 
-                     'api_auth_status', 'static', 'dashboard', 'api_health']
+                     'api_auth_status', 'static', 'dashboard', 'api_health', 'internal_metrics']
     
     if request.endpoint in public_routes:
         return
@@ -122,15 +274,7 @@ def api_auth_reset_database():
             return jsonify({'success': False, 'message': 'Usuário não autenticado'}), 401
         
         if user_id == 2:
-            Progress.query.filter_by(user_id=2).delete()
-            ScheduledActivity.query.filter_by(user_id=2).delete()
-            Activity.query.filter_by(user_id=2).delete()
-            Category.query.filter_by(user_id=2).delete()
-            Reward.query.filter_by(user_id=2).delete()
-            UserPoints.query.filter_by(user_id=2).delete()
-            PointTransaction.query.filter_by(user_id=2).delete()
-            WeeklyStreak.query.filter_by(user_id=2).delete()
-            
+            delete_user_data(2)
             db.session.commit()
             
             categories = [
@@ -149,15 +293,7 @@ def api_auth_reset_database():
                 'message': 'Banco de dados do usuário 2 resetado com sucesso!'
             })
         else:
-            Progress.query.filter_by(user_id=1).delete()
-            ScheduledActivity.query.filter_by(user_id=1).delete()
-            Activity.query.filter_by(user_id=1).delete()
-            Category.query.filter_by(user_id=1).delete()
-            Reward.query.filter_by(user_id=1).delete()
-            UserPoints.query.filter_by(user_id=1).delete()
-            PointTransaction.query.filter_by(user_id=1).delete()
-            WeeklyStreak.query.filter_by(user_id=1).delete()
-            
+            delete_user_data(1)
             db.session.commit()
             
             create_sample_data_for_user(1)
@@ -172,7 +308,75 @@ def api_auth_reset_database():
         print(f"Erro ao resetar banco: {str(e)}")
         return jsonify({'success': False, 'message': f'Erro ao resetar banco: {str(e)}'}), 500
 
+def delete_user_data(user_id, remove_account=False):
+    # Ordem respeita as chaves estrangeiras: tudo que referencia atividades sai antes delas.
+    # A versão dos dados só sai junto com a conta: num reset ela continua crescendo e
+    # ETags antigos não voltam a coincidir com o conteúdo recriado
+    Progress.query.filter_by(user_id=user_id).delete()
+    ActivityProgressTotal.query.filter_by(user_id=user_id).delete()
+    DailyStatsRollup.query.filter_by(user_id=user_id).delete()
+    ScheduleTimeRollup.query.filter_by(user_id=user_id).delete()
+    ScheduledActivity.query.filter_by(user_id=user_id).delete()
+    ScheduleRecurrence.query.filter_by(user_id=user_id).delete()
+    PointTransaction.query.filter_by(user_id=user_id).delete()
+    PointBalanceSnapshot.query.filter_by(user_id=user_id).delete()
+    Reward.query.filter_by(user_id=user_id).delete()
+    Activity.query.filter_by(user_id=user_id).delete()
+    Category.query.filter_by(user_id=user_id).delete()
+    UserPoints.query.filter_by(user_id=user_id).delete()
+    WeeklyStreak.query.filter_by(user_id=user_id).delete()
+    ResponseCacheEntry.query.filter_by(user_id=user_id).delete()
+    
+    # Tarefas pendentes guardam o usuário só no payload JSON
+    pending_jobs = [job_id for job_id, payload in db.session.query(BackgroundJob.id, BackgroundJob.payload)
+                    if json.loads(payload).get('user_id') == user_id]
+    for job_ids in chunked(pending_jobs):
+        BackgroundJob.query.filter(BackgroundJob.id.in_(job_ids)).delete(synchronize_session=False)
+    
+    if remove_account:
+        UserDataVersion.query.filter_by(user_id=user_id).delete()
+
 # ============ FUNÇÕES AUXILIARES ============
+# Contadores acumulados do processo para a memoização por requisição
+memo_counters = {'hits': 0, 'misses': 0}
+memo_counters_lock = threading.Lock()
+
+def request_memoized(func):
+    # Memoiza o resultado em flask.g durante a requisição atual, chaveado pela
+    # função e pelos argumentos (o primeiro argumento é sempre o user_id)
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if not has_app_context():
+            return func(*args, **kwargs)
+        
+        if 'memo_cache' not in g:
+            g.memo_cache = {}
+            g.memo_stats = {'hits': 0, 'misses': 0}
+        
+        key = (func.__name__, args, tuple(sorted(kwargs.items())))
+        if key in g.memo_cache:
+            g.memo_stats['hits'] += 1
+            with memo_counters_lock:
+                memo_counters['hits'] += 1
+            return g.memo_cache[key]
+        
+        g.memo_stats['misses'] += 1
+        with memo_counters_lock:
+            memo_counters['misses'] += 1
+        
+        result = func(*args, **kwargs)
+        g.memo_cache[key] = result
+        return result
+    
+    return wrapper
+
+@app.after_request
+def add_memo_stats_header(response):
+    memo_stats = g.get('memo_stats')
+    if memo_stats:
+        response.headers['X-Request-Memo'] = f"hits={memo_stats['hits']}; misses={memo_stats['misses']}"
+    return response
+
 def create_sample_data_for_user(user_id):
     categories = [
         Category(name='Leitura', description='Livros e materiais de leitura', color='#3498db', icon='📚', user_id=user_id),
@@ -225,15 +429,165 @@ def create_sample_data_for_user(user_id):
     
     db.session.commit()
 
-def calculate_activity_progress(activity):
+SYNTHETIC_CATEGORY_NAMES = ['Leitura', 'Exercício', 'Estudo', 'Trabalho', 'Música', 'Idiomas', 'Saúde', 'Finanças',
+                            'Projetos', 'Família', 'Culinária', 'Escrita']
+
+def create_synthetic_data_for_user(user_id, categories=8, activities=2000, max_depth=6, days=730,
+                                   progress_per_day=10, schedules_per_day=8, seed=42):
+    # Gera um usuário grande para testes de carga: hierarquias profundas, anos de
+    # progresso e calendário denso, tudo com inserções em lote
+    rng = random.Random(seed)
+    today = date.today()
+    now = datetime.utcnow()
+    
+    category_rows = [{
+        'name': SYNTHETIC_CATEGORY_NAMES[i % len(SYNTHETIC_CATEGORY_NAMES)] + (f' {i // len(SYNTHETIC_CATEGORY_NAMES) + 1}' if i >= len(SYNTHETIC_CATEGORY_NAMES) else ''),
+        'description': 'Categoria sintética',
+        'color': '#%06x' % rng.randint(0, 0xFFFFFF),
+        'icon': '📁',
+        'user_id': user_id,
+        'created_at': now
+    } for i in range(categories)]
+    db.session.execute(insert(Category), category_rows)
+    category_ids = [cat_id for (cat_id,) in db.session.query(Category.id).filter_by(user_id=user_id).order_by(Category.id).all()]
+    
+    activity_rows = []
+    for i in range(activities):
+        measurement_type = rng.choice(['boolean', 'units', 'percentage'])
+        activity_rows.append({
+            'name': f'Atividade sintética {i + 1}',
+            'description': '',
+            'category_id': rng.choice(category_ids),
+            'user_id': user_id,
+            'measurement_type': measurement_type,
+            'target_value': float(rng.choice([10, 50, 100, 300, 1000])) if measurement_type == 'units' else None,
+            'target_unit': 'unidades' if measurement_type == 'units' else None,
+            'manual_percentage': float(rng.randint(0, 100)) if measurement_type == 'percentage' else 0.0,
+            'status': rng.choice(['want_to_do', 'in_progress', 'in_progress', 'completed', 'cancelled']),
+            'created_at': now - timedelta(days=rng.randint(0, days))
+        })
+    for rows in chunked(activity_rows, 1000):
+        db.session.execute(insert(Activity), rows)
+    
+    activity_ids = [act_id for (act_id,) in db.session.query(Activity.id).filter_by(user_id=user_id).order_by(Activity.id).all()]
+    
+    # Hierarquia: cada atividade pode pendurar-se numa anterior que ainda não atingiu a profundidade máxima
+    depth = {}
+    parent_updates = []
+    for index, act_id in enumerate(activity_ids):
+        depth[act_id] = 0
+        if index > 0 and rng.random() < 0.7:
+            parent_id = activity_ids[rng.randint(max(0, index - 50), index - 1)]
+            if depth[parent_id] < max_depth - 1:
+                depth[act_id] = depth[parent_id] + 1
+                parent_updates.append({'id': act_id, 'parent_activity_id': parent_id})
+    for rows in chunked(parent_updates, 1000):
+        db.session.execute(update(Activity), rows)
+    
+    activity_meta = {act_id: row for act_id, row in zip(activity_ids, activity_rows)}
+    
+    progress_rows = []
+    transaction_rows = []
+    schedule_rows = []
+    total_points = 0
+    for offset in range(days):
+        day = today - timedelta(days=days - 1 - offset)
+        for act_id in rng.sample(activity_ids, min(progress_per_day, len(activity_ids))):
+            meta = activity_meta[act_id]
+            completed = rng.random() < 0.1
+            if meta['measurement_type'] == 'units':
+                value = round(rng.uniform(0, meta['target_value'] / 20), 1)
+                points = int(value / meta['target_value'] * 100 / 10) + (5 if completed else 0)
+            elif meta['measurement_type'] == 'percentage':
+                value = float(rng.randint(0, 100))
+                points = int(value / 10) + (5 if completed else 0)
+            else:
+                value, completed, points = 1, True, 10
+            
+            created_at = datetime.combine(day, datetime.min.time()) + timedelta(hours=rng.randint(6, 22))
+            progress_rows.append({
+                'activity_id': act_id, 'user_id': user_id, 'date': day, 'value': value,
+                'unit': meta['target_unit'] or 'unidades', 'notes': '', 'completed': completed,
+                'from_schedule': False, 'points_earned': points, 'streak_bonus': 0, 'created_at': created_at
+            })
+            if points > 0:
+                total_points += points
+                transaction_rows.append({
+                    'user_id': user_id, 'points': points, 'description': f"Progresso em {meta['name']}",
+                    'activity_id': act_id, 'created_at': created_at
+                })
+        
+        for _ in range(schedules_per_day):
+            schedule_rows.append({
+                'activity_id': rng.choice(activity_ids), 'user_id': user_id, 'scheduled_date': day,
+                'scheduled_time': f'{rng.randint(6, 22):02d}:{rng.choice(["00", "30"])}',
+                'duration': rng.choice([15, 30, 45, 60, 90, 120]), 'created_at': now
+            })
+    
+    for rows in chunked(progress_rows, 1000):
+        db.session.execute(insert(Progress), rows)
+    for rows in chunked(transaction_rows, 1000):
+        db.session.execute(insert(PointTransaction), rows)
+    for rows in chunked(schedule_rows, 1000):
+        db.session.execute(insert(ScheduledActivity), rows)
+    
+    db.session.execute(insert(Reward), [{
+        'name': f'Recompensa sintética {i + 1}', 'description': '', 'reward_type': 'custom',
+        'points_required': (i + 1) * 100, 'condition_type': 'points', 'condition_value': (i + 1) * 100,
+        'achieved': False, 'user_id': user_id, 'created_at': now
+    } for i in range(20)])
+    
+    user_points = UserPoints.query.filter_by(user_id=user_id).first()
+    if not user_points:
+        user_points = UserPoints(user_id=user_id, points=0)
+        db.session.add(user_points)
+    user_points.points = (user_points.points or 0) + total_points
+    
+    rebuild_daily_stats(user_id)
+    rebuild_schedule_time_stats(user_id)
+    db.session.commit()
+    rebuild_progress_totals(user_id=user_id)
+    
+    return {
+        'categories': len(category_ids),
+        'activities': len(activity_ids),
+        'max_depth': max(depth.values()) + 1 if depth else 0,
+        'progress': len(progress_rows),
+        'schedules': len(schedule_rows),
+        'transactions': len(transaction_rows)
+    }
+
+@app.cli.command('seed-synthetic')
+@click.option('--user-id', type=int, required=True, help='Usuário que receberá os dados (é criado se não existir)')
+@click.option('--categories', type=int, default=8)
+@click.option('--activities', type=int, default=2000)
+@click.option('--max-depth', type=int, default=6)
+@click.option('--days', type=int, default=730)
+@click.option('--progress-per-day', type=int, default=10)
+@click.option('--schedules-per-day', type=int, default=8)
+@click.option('--seed', type=int, default=42)
+@click.option('--reset', is_flag=True, help='Apaga os dados existentes do usuário antes de gerar')
+def seed_synthetic_command(user_id, reset, **options):
+    if not db.session.get(User, user_id):
+        db.session.add(User(id=user_id, username=f'sintetico{user_id}', email=f'sintetico{user_id}@exemplo.com'))
+        db.session.commit()
+    
+    if reset:
+        delete_user_data(user_id)
+        db.session.commit()
+    
+    started = time.perf_counter()
+    summary = create_synthetic_data_for_user(user_id, **options)
+    click.echo(f"Dados sintéticos criados em {time.perf_counter() - started:.1f}s: {summary}")
+
+def calculate_activity_progress(activity, total_progress=None):
     if not activity:
         return 0
-    
+
     if activity.measurement_type == 'units':
         if activity.target_value and activity.target_value > 0:
-            total_progress = db.session.query(func.sum(Progress.value)).filter(
-                Progress.activity_id == activity.id
-            ).scalar() or 0
+            if total_progress is None:
+                total_progress = get_progress_total(activity)
             progress_percentage = min((total_progress / activity.target_value) * 100, 100)
             return round(progress_percentage, 1)
         return 0
@@ -242,16 +596,578 @@ def calculate_activity_progress(activity):
     else:
         return 100 if activity.status == 'completed' else 0
 
-def get_current_progress_value(activity):
+def get_current_progress_value(activity, total_progress=None):
     if activity.measurement_type == 'units':
-        return db.session.query(func.sum(Progress.value)).filter(
-            Progress.activity_id == activity.id
-        ).scalar() or 0
+        if total_progress is not None:
+            return total_progress
+        return get_progress_total(activity)
     elif activity.measurement_type == 'percentage':
         return activity.manual_percentage or 0
     else:
         return 1 if activity.status == 'completed' else 0
 
+def get_progress_total(activity):
+    # Leitura O(1) do total materializado; a soma completa só é usada
+    # para atividades que ainda não têm linha em activity_progress_totals
+    total_row = db.session.get(ActivityProgressTotal, activity.id)
+    if total_row:
+        return total_row.total_value or 0
+    return db.session.query(func.sum(Progress.value)).filter(
+        Progress.activity_id == activity.id
+    ).scalar() or 0
+
+def insert_missing_progress_totals(user_id, activity_ids):
+    # Linhas iniciais calculadas a partir do histórico já gravado. Duas primeiras escritas
+    # simultâneas da mesma atividade tentam criar a mesma linha: ON CONFLICT DO NOTHING
+    # mantém a que chegou antes e quem chama relê a linha em seguida
+    for ids in chunked(activity_ids):
+        sums = {
+            activity_id: (total or 0, count)
+            for activity_id, total, count in db.session.query(
+                Progress.activity_id, func.sum(Progress.value), func.count(Progress.id)
+            ).filter(Progress.activity_id.in_(ids)).group_by(Progress.activity_id).all()
+        }
+        rows = []
+        for activity_id in ids:
+            total_value, entry_count = sums.get(activity_id, (0, 0))
+            rows.append({'activity_id': activity_id, 'user_id': user_id,
+                         'total_value': total_value, 'entry_count': entry_count})
+        
+        statement = dialect_insert(ActivityProgressTotal).on_conflict_do_nothing(
+            index_elements=[ActivityProgressTotal.activity_id]
+        )
+        db.session.execute(statement, rows)
+
+def get_or_create_progress_total(activity):
+    # Deve ser chamada antes de alterar os registros de progresso da atividade,
+    # pois a linha inicial é calculada a partir do histórico já gravado
+    total_row = db.session.get(ActivityProgressTotal, activity.id)
+    if not total_row:
+        insert_missing_progress_totals(activity.user_id, [activity.id])
+        total_row = db.session.get(ActivityProgressTotal, activity.id)
+    return total_row
+
+def apply_progress_total_delta(total_row, value_delta, count_delta=0):
+    # Incremento feito no próprio UPDATE para não perder escritas concorrentes
+    total_row.total_value = ActivityProgressTotal.total_value + value_delta
+    total_row.entry_count = ActivityProgressTotal.entry_count + count_delta
+    total_row.updated_at = datetime.utcnow()
+
+def rebuild_progress_totals(user_id=None, fix=True):
+    # Recalcula os totais a partir de Progress e devolve as divergências encontradas
+    sums_query = db.session.query(
+        Progress.activity_id,
+        func.sum(Progress.value),
+        func.count(Progress.id)
+    ).group_by(Progress.activity_id)
+    activities_query = db.session.query(Activity.id, Activity.user_id)
+    totals_query = ActivityProgressTotal.query
+    
+    if user_id is not None:
+        sums_query = sums_query.filter(Progress.user_id == user_id)
+        activities_query = activities_query.filter(Activity.user_id == user_id)
+        totals_query = totals_query.filter(ActivityProgressTotal.user_id == user_id)
+    
+    expected = {activity_id: (total or 0, count) for activity_id, total, count in sums_query.all()}
+    stored = {row.activity_id: row for row in totals_query.all()}
+    
+    mismatches = []
+    for activity_id, owner_id in activities_query.all():
+        total_value, entry_count = expected.get(activity_id, (0, 0))
+        row = stored.get(activity_id)
+        
+        if row and abs((row.total_value or 0) - total_value) < 1e-6 and row.entry_count == entry_count:
+            continue
+        
+        mismatches.append({
+            'activity_id': activity_id,
+            'stored_total': row.total_value if row else None,
+            'expected_total': total_value,
+            'stored_count': row.entry_count if row else None,
+            'expected_count': entry_count
+        })
+        
+        if fix:
+            if not row:
+                row = ActivityProgressTotal(activity_id=activity_id, user_id=owner_id)
+                db.session.add(row)
+            row.total_value = total_value
+            row.entry_count = entry_count
+            row.updated_at = datetime.utcnow()
+    
+    if fix:
+        db.session.commit()
+    
+    return mismatches
+
+@app.cli.command('rebuild-progress-totals')
+@click.option('--user-id', type=int, default=None, help='Limita a verificação a um usuário')
+@click.option('--verify-only', is_flag=True, help='Apenas relata divergências, sem corrigir')
+def rebuild_progress_totals_command(user_id, verify_only):
+    mismatches = rebuild_progress_totals(user_id=user_id, fix=not verify_only)
+    
+    for item in mismatches:
+        click.echo(
+            f"Atividade {item['activity_id']}: armazenado={item['stored_total']} "
+            f"({item['stored_count']} registros), esperado={item['expected_total']} "
+            f"({item['expected_count']} registros)"
+        )
+    
+    if verify_only:
+        click.echo(f"{len(mismatches)} divergências encontradas")
+    else:
+        click.echo(f"{len(mismatches)} totais reconstruídos")
+
+# Limite de ids por cláusula IN (SQLite aceita no máximo 999 parâmetros em versões antigas)
+BATCH_IN_LIMIT = 500
+
+def chunked(values, size=BATCH_IN_LIMIT):
+    values = list(values)
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+def dialect_insert(model):
+    # INSERT com ON CONFLICT do dialeto em uso (PostgreSQL em produção, SQLite local)
+    if db.engine.dialect.name == 'postgresql':
+        return postgresql.insert(model)
+    return sqlite.insert(model)
+
+PROGRESS_UPSERT_FIELDS = ('value', 'unit', 'notes', 'completed', 'from_schedule', 'points_earned', 'streak_bonus')
+
+def progress_upsert_statement():
+    # Grava o progresso do dia usando a restrição unique_progress_per_day (activity_id, date)
+    statement = dialect_insert(Progress)
+    return statement.on_conflict_do_update(
+        index_elements=[Progress.activity_id, Progress.date],
+        set_={field: getattr(statement.excluded, field) for field in PROGRESS_UPSERT_FIELDS}
+    )
+
+def upsert_progress_entry(values, update_fields=PROGRESS_UPSERT_FIELDS):
+    # Grava o progresso do dia sem o SELECT-then-INSERT sujeito a corrida (IntegrityError
+    # com duas submissões simultâneas). Devolve (id, anterior), onde anterior traz
+    # value/completed/points_earned do registro substituído ou é None se ele foi criado
+    key = and_(Progress.activity_id == values['activity_id'], Progress.date == values['date'])
+    
+    # ON CONFLICT DO NOTHING espera a transação concorrente que inseriu a mesma chave:
+    # só uma das submissões simultâneas recebe o id de volta e conta como criação
+    inserted_id = db.session.execute(
+        dialect_insert(Progress).values(**values).on_conflict_do_nothing(
+            index_elements=[Progress.activity_id, Progress.date]
+        ).returning(Progress.id)
+    ).scalar()
+    if inserted_id is not None:
+        return inserted_id, None
+    
+    # O registro existe: a versão confirmada mais recente é lida sob bloqueio de linha
+    # (FOR UPDATE no PostgreSQL; o SQLite já serializa as escritas) e as diferenças
+    # são calculadas a partir dela
+    previous = db.session.query(
+        Progress.id, Progress.value, Progress.completed, Progress.points_earned
+    ).filter(key).with_for_update().first()
+    if previous is None:
+        # Excluído entre as duas instruções: volta a tentar como criação
+        return upsert_progress_entry(values, update_fields)
+    
+    db.session.execute(
+        update(Progress).where(Progress.id == previous.id).values(
+            **{field: values[field] for field in update_fields}
+        ).execution_options(synchronize_session=False)
+    )
+    return previous.id, {'value': previous.value, 'completed': previous.completed,
+                         'points_earned': previous.points_earned}
+
+def normalize_progress_input(activity, data):
+    # Valida e normaliza um registro de progresso; lança ValueError com a mensagem para o usuário
+    measurement_type = data.get('measurement_type', activity.measurement_type)
+    value = float(data.get('value', 0))
+    unit = data.get('unit', '')
+    completed = data.get('completed', False)
+    
+    if measurement_type == 'units':
+        if not unit:
+            unit = activity.target_unit or 'unidades'
+        if activity.target_value and value > activity.target_value:
+            raise ValueError(f'O valor não pode exceder o alvo ({activity.target_value})')
+    elif measurement_type == 'percentage':
+        unit = '%'
+        if value < 0 or value > 100:
+            raise ValueError('A porcentagem deve estar entre 0 e 100')
+        if value >= 100:
+            completed = True
+    elif measurement_type == 'boolean':
+        unit = 'unidades'
+        value = 1
+        completed = True
+    
+    return measurement_type, value, unit, completed
+
+def calculate_progress_points(activity, measurement_type, value, completed):
+    points_earned = 0
+    
+    if measurement_type == 'units' and activity.target_value and activity.target_value > 0:
+        progress_ratio = (value / activity.target_value) * 100 if activity.target_value > 0 else 0
+        points_earned = int(progress_ratio / 10)
+        
+        if completed:
+            points_earned += 5
+    elif measurement_type == 'percentage':
+        points_earned = int(value / 10)
+        if completed:
+            points_earned += 5
+    elif measurement_type == 'boolean' and completed:
+        points_earned = 10
+    
+    return points_earned
+
+def build_activity_progress_map(activities):
+    # Calcula progresso, categoria e filhos de uma lista inteira de atividades
+    # com um número fixo de consultas agrupadas, em vez de 3-5 consultas por atividade
+    if not activities:
+        return {}
+
+    activity_ids = [act.id for act in activities]
+    units_ids = [act.id for act in activities if act.measurement_type == 'units']
+    category_ids = {act.category_id for act in activities if act.category_id}
+
+    totals = {}
+    for ids in chunked(units_ids):
+        totals.update(db.session.query(
+            ActivityProgressTotal.activity_id,
+            ActivityProgressTotal.total_value
+        ).filter(ActivityProgressTotal.activity_id.in_(ids)).all())
+    
+    # Atividades ainda sem total materializado caem na soma agrupada
+    missing_ids = [activity_id for activity_id in units_ids if activity_id not in totals]
+    for ids in chunked(missing_ids):
+        totals.update(db.session.query(
+            Progress.activity_id,
+            func.sum(Progress.value)
+        ).filter(Progress.activity_id.in_(ids)).group_by(Progress.activity_id).all())
+
+    children_counts = {}
+    for ids in chunked(activity_ids):
+        children_counts.update(db.session.query(
+            Activity.parent_activity_id,
+            func.count(Activity.id)
+        ).filter(Activity.parent_activity_id.in_(ids)).group_by(Activity.parent_activity_id).all())
+
+    categories = {}
+    for ids in chunked(category_ids):
+        for cat_id, name, color in db.session.query(
+            Category.id, Category.name, Category.color
+        ).filter(Category.id.in_(ids)).all():
+            categories[cat_id] = (name, color)
+
+    progress_map = {}
+    for act in activities:
+        total_progress = totals.get(act.id) or 0
+        category = categories.get(act.category_id)
+        progress_map[act.id] = {
+            'progress_percentage': calculate_activity_progress(act, total_progress),
+            'current_value': get_current_progress_value(act, total_progress),
+            'category_name': category[0] if category else None,
+            'category_color': category[1] if category else '#3498db',
+            'children_count': children_counts.get(act.id, 0)
+        }
+
+    return progress_map
+
+# ============ CACHE DE RESPOSTAS ============
+class MemoryCacheBackend:
+    # LRU em memória, local a cada processo do gunicorn
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+    
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if not entry:
+                return None
+            payload, expires_at = entry
+            if expires_at < time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return payload
+    
+    def set(self, key, user_id, payload, ttl):
+        with self.lock:
+            self.entries[key] = (payload, time.time() + ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+    
+    def invalidate_user(self, user_id):
+        # Entradas antigas ficam inacessíveis pela mudança de versão e saem pelo LRU
+        pass
+
+class DatabaseCacheBackend:
+    # Compartilhado entre workers através da tabela response_cache_entries
+    def get(self, key):
+        entry = db.session.get(ResponseCacheEntry, key)
+        if not entry or entry.expires_at < datetime.utcnow():
+            return None
+        return entry.payload
+    
+    def set(self, key, user_id, payload, ttl):
+        # Conexão própria: gravar o cache não confirma o que a view deixou pendente na sessão
+        statement = dialect_insert(ResponseCacheEntry).values(
+            cache_key=key,
+            user_id=user_id,
+            payload=payload,
+            expires_at=datetime.utcnow() + timedelta(seconds=ttl)
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[ResponseCacheEntry.cache_key],
+            set_={'payload': statement.excluded.payload, 'expires_at': statement.excluded.expires_at}
+        )
+        with db.engine.begin() as connection:
+            connection.execute(statement)
+    
+    def invalidate_user(self, user_id):
+        ResponseCacheEntry.query.filter_by(user_id=user_id).delete()
+        db.session.commit()
+
+CACHE_BACKENDS = {
+    'memory': lambda: MemoryCacheBackend(app.config['RESPONSE_CACHE_MAX_ENTRIES']),
+    'database': DatabaseCacheBackend
+}
+
+response_cache = CACHE_BACKENDS[app.config['RESPONSE_CACHE_BACKEND']]()
+
+def get_user_data_version(user_id):
+    if g.get('data_version_user') == user_id:
+        return g.data_version
+    
+    version = db.session.query(UserDataVersion.version).filter_by(user_id=user_id).scalar() or 0
+    g.data_version_user = user_id
+    g.data_version = version
+    return version
+
+def bump_user_data_version(user_id):
+    updated = UserDataVersion.query.filter_by(user_id=user_id).update({
+        UserDataVersion.version: UserDataVersion.version + 1,
+        UserDataVersion.updated_at: datetime.utcnow()
+    }, synchronize_session=False)
+    
+    if not updated:
+        db.session.add(UserDataVersion(user_id=user_id, version=1))
+    
+    # As entradas antigas já ficam inacessíveis pela nova versão; a limpeza pode esperar
+    enqueue_after_commit('purge_response_cache', durable=False, user_id=user_id)
+    
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Outra requisição criou a linha ao mesmo tempo
+        db.session.rollback()
+        bump_user_data_version(user_id)
+        return
+    
+    g.pop('data_version_user', None)
+
+@app.after_request
+def invalidate_user_cache_after_write(response):
+    # Toda escrita bem-sucedida na API muda a versão dos dados do usuário
+    if request.method in ('POST', 'PUT', 'PATCH', 'DELETE') and request.path.startswith('/api/') and response.status_code < 400:
+        user_id = get_current_user_id()
+        if user_id:
+            try:
+                bump_user_data_version(user_id)
+            except SQLAlchemyError as e:
+                db.session.rollback()
+                logger.warning(f"Falha ao invalidar cache do usuário {user_id}: {e}")
+    return response
+
+def user_response_key(user_id):
+    # Identifica a representação atual de um GET: muda com a versão dos dados,
+    # o dia (conteúdo relativo a hoje) e a URL completa com query string
+    raw_key = f"{user_id}:{get_user_data_version(user_id)}:{date.today().isoformat()}:{request.full_path}"
+    return hashlib.sha256(raw_key.encode('utf-8')).hexdigest()
+
+def conditional_user_response(view):
+    # ETag forte derivado da versão dos dados; If-None-Match correspondente
+    # recebe 304 sem executar a view nem serializar o JSON
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        user_id = get_current_user_id()
+        if request.method != 'GET' or not user_id:
+            return view(*args, **kwargs)
+        
+        etag = user_response_key(user_id)[:40]
+        if request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+        else:
+            g.pop('skip_response_cache', None)
+            response = app.make_response(view(*args, **kwargs))
+            if response.status_code != 200 or g.get('skip_response_cache'):
+                return response
+        
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        response.vary.add('Cookie')
+        return response
+    return wrapper
+
+# Cabeçalhos que não fazem parte da representação guardada no cache
+CACHE_SKIPPED_HEADERS = {
+    'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization', 'te', 'trailer',
+    'transfer-encoding', 'upgrade', 'content-length', 'set-cookie', 'x-cache'
+}
+
+def dump_cached_response(response):
+    return json.dumps({
+        'headers': [[name, value] for name, value in response.headers.items()
+                    if name.lower() not in CACHE_SKIPPED_HEADERS],
+        'body': response.get_data(as_text=True)
+    })
+
+def load_cached_response(payload):
+    entry = json.loads(payload)
+    if not isinstance(entry, dict) or set(entry) != {'headers', 'body'}:
+        # Entrada gravada em outro formato: tratada como ausente
+        return None
+    return app.response_class(entry['body'], headers=entry['headers'])
+
+def skip_response_cache():
+    # Resposta de contingência (falha transitória): entregue com 200, mas sem cache nem ETag
+    g.skip_response_cache = True
+
+def user_cached_response(ttl=None):
+    # Reaproveita a resposta (corpo e cabeçalhos, como X-Total-Count) entre requisições
+    # enquanto a versão dos dados do usuário não mudar
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            user_id = get_current_user_id()
+            if not user_id:
+                return view(*args, **kwargs)
+            
+            key = user_response_key(user_id)
+            
+            try:
+                payload = response_cache.get(key)
+            except SQLAlchemyError as e:
+                db.session.rollback()
+                logger.warning(f"Falha ao ler cache de respostas: {e}")
+                payload = None
+            
+            response = load_cached_response(payload) if payload is not None else None
+            if response is not None:
+                response.headers['X-Cache'] = 'HIT'
+                return response
+            
+            g.pop('skip_response_cache', None)
+            response = app.make_response(view(*args, **kwargs))
+            if response.status_code == 200 and response.is_json and not g.get('skip_response_cache'):
+                try:
+                    response_cache.set(key, user_id, dump_cached_response(response), ttl or app.config['RESPONSE_CACHE_TTL'])
+                except SQLAlchemyError as e:
+                    logger.warning(f"Falha ao gravar cache de respostas: {e}")
+            response.headers['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
+
+# ============ TAREFAS EM SEGUNDO PLANO ============
+# Trabalho derivado e não crítico (avaliação de recompensas, limpeza de cache)
+# roda depois do commit, fora do caminho da resposta. Tarefas enfileiradas em uma
+# transação só são disparadas se ela for confirmada e são descartadas no rollback
+BACKGROUND_TASKS = {}
+background_counters = {'submitted': 0, 'completed': 0, 'failed': 0}
+background_counters_lock = threading.Lock()
+background_executor = ThreadPoolExecutor(
+    max_workers=app.config['BACKGROUND_WORKERS'],
+    thread_name_prefix='background-job'
+)
+
+def background_task(func):
+    BACKGROUND_TASKS[func.__name__] = func
+    return func
+
+def enqueue_after_commit(task_name, durable=True, **payload):
+    # O payload precisa ser serializável em JSON (datas em ISO) por causa da fila durável
+    job = None
+    if durable and app.config['BACKGROUND_JOBS_DURABLE']:
+        job = BackgroundJob(task=task_name, payload=json.dumps(payload))
+        db.session.add(job)
+    db.session.info.setdefault('pending_jobs', []).append((task_name, payload, job))
+
+@event.listens_for(db.session, 'after_commit')
+def dispatch_pending_jobs(session):
+    # Liberar um savepoint (begin_nested) também dispara after_commit; só o commit
+    # da transação externa vale
+    if session.in_nested_transaction():
+        return
+    for task_name, payload, job in session.info.pop('pending_jobs', []):
+        # A identidade continua disponível sem consulta depois do commit
+        job_id = inspect(job).identity[0] if job is not None else None
+        submit_background_job(task_name, payload, job_id)
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_pending_jobs(session):
+    if session.in_nested_transaction():
+        return
+    session.info.pop('pending_jobs', None)
+
+def submit_background_job(task_name, payload, job_id=None):
+    with background_counters_lock:
+        background_counters['submitted'] += 1
+    
+    if app.config['BACKGROUND_JOBS_MODE'] == 'sync':
+        run_background_job(task_name, payload, job_id)
+    else:
+        background_executor.submit(run_background_job, task_name, payload, job_id)
+
+def run_background_job(task_name, payload, job_id=None):
+    # Cada tarefa roda em um contexto de aplicação próprio, com sessão própria
+    with app.app_context():
+        try:
+            BACKGROUND_TASKS[task_name](**payload)
+            if job_id is not None:
+                BackgroundJob.query.filter_by(id=job_id).delete()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            with background_counters_lock:
+                background_counters['failed'] += 1
+            logger.error(f"Erro na tarefa {task_name}: {e}")
+            
+            if job_id is not None:
+                try:
+                    BackgroundJob.query.filter_by(id=job_id).update({
+                        BackgroundJob.attempts: BackgroundJob.attempts + 1,
+                        BackgroundJob.last_error: str(e)[:1000]
+                    }, synchronize_session=False)
+                    db.session.commit()
+                except SQLAlchemyError:
+                    db.session.rollback()
+            return False
+    
+    with background_counters_lock:
+        background_counters['completed'] += 1
+    return True
+
+@app.cli.command('process-background-jobs')
+def process_background_jobs_command():
+    # Reprocessa a fila durável (tarefas que não chegaram a rodar antes de uma queda)
+    jobs = db.session.query(BackgroundJob.id, BackgroundJob.task, BackgroundJob.payload).filter(
+        BackgroundJob.attempts < app.config['BACKGROUND_JOBS_MAX_ATTEMPTS']
+    ).order_by(BackgroundJob.id).all()
+    
+    completed = sum(1 for job in jobs if run_background_job(job.task, json.loads(job.payload), job.id))
+    click.echo(f"{completed} de {len(jobs)} tarefas executadas")
+
+@background_task
+def purge_response_cache(user_id):
+    response_cache.invalidate_user(user_id)
+
+@background_task
+def refresh_user_data_version(user_id):
+    bump_user_data_version(user_id)
+
 # ============ ROTAS DE PÁGINAS ============
 @app.route('/')
 def dashboard():
@@ -306,6 +1222,7 @@ def history():
 # ============ API ROUTES ============
 # ============ CATEGORIAS ============
 @app.route('/api/categories', methods=['GET', 'POST'])
+@conditional_user_response
 def api_categories():
     user_id = get_current_user_id()
     if not user_id:
@@ -352,12 +1269,16 @@ def api_category(category_id):
         return jsonify({'message': 'Categoria atualizada com sucesso'})
     
     elif request.method == 'DELETE':
+        DailyStatsRollup.query.filter_by(user_id=user_id, category_id=category.id).delete()
+        ScheduleTimeRollup.query.filter_by(user_id=user_id, category_id=category.id).delete()
+        detach_activity_rewards(select(Activity.id).where(Activity.category_id == category.id))
         db.session.delete(category)
         db.session.commit()
         return jsonify({'message': 'Categoria excluída com sucesso'})
 
 # ============ ATIVIDADES ============
 @app.route('/api/activities', methods=['GET', 'POST'])
+@conditional_user_response
 def api_activities():
     user_id = get_current_user_id()
     if not user_id:
@@ -403,18 +1324,20 @@ def api_activities():
         return jsonify({'id': activity.id, 'message': 'Atividade criada com sucesso'})
     
     activities = Activity.query.filter_by(user_id=user_id).all()
+    progress_map = build_activity_progress_map(activities)
     result = []
     for act in activities:
-        progress = calculate_activity_progress(act)
-        current_value = get_current_progress_value(act)
+        info = progress_map[act.id]
+        progress = info['progress_percentage']
+        current_value = info['current_value']
         
         result.append({
             'id': act.id,
             'name': act.name,
             'description': act.description,
             'category_id': act.category_id,
-            'category_name': act.category.name if act.category else None,
-            'category_color': act.category.color if act.category else '#3498db',
+            'category_name': info['category_name'],
+            'category_color': info['category_color'],
             'status': act.status,
             'measurement_type': act.measurement_type,
             'target_value': act.target_value,
@@ -423,12 +1346,13 @@ def api_activities():
             'progress': current_value if act.measurement_type == 'units' else progress,
             'progress_percentage': progress,
             'parent_activity_id': act.parent_activity_id,
-            'children_count': len(act.children)  # CORREÇÃO: len() em vez de .count()
+            'children_count': info['children_count']
         })
     
     return jsonify(result)
 
 @app.route('/api/activities/<int:activity_id>', methods=['GET', 'PUT', 'DELETE'])
+@conditional_user_response
 def api_activity(activity_id):
     user_id = get_current_user_id()
     if not user_id:
@@ -437,17 +1361,19 @@ def api_activity(activity_id):
     activity = Activity.query.filter_by(id=activity_id, user_id=user_id).first_or_404()
     
     if request.method == 'GET':
-        progress = calculate_activity_progress(activity)
-        current_value = get_current_progress_value(activity)
+        children = activity.children
+        progress_map = build_activity_progress_map([activity] + children)
+        info = progress_map[activity.id]
+        progress = info['progress_percentage']
+        current_value = info['current_value']
         
         children_list = []
-        for child in activity.children:
-            child_progress = calculate_activity_progress(child)
+        for child in children:
             children_list.append({
                 'id': child.id,
                 'name': child.name,
                 'status': child.status,
-                'progress': child_progress
+                'progress': progress_map[child.id]['progress_percentage']
             })
         
         return jsonify({
@@ -455,8 +1381,8 @@ def api_activity(activity_id):
             'name': activity.name,
             'description': activity.description,
             'category_id': activity.category_id,
-            'category_name': activity.category.name if activity.category else None,
-            'category_color': activity.category.color if activity.category else '#3498db',
+            'category_name': info['category_name'],
+            'category_color': info['category_color'],
             'status': activity.status,
             'measurement_type': activity.measurement_type,
             'target_value': activity.target_value,
@@ -467,7 +1393,7 @@ def api_activity(activity_id):
             'parent_activity_id': activity.parent_activity_id,
             'parent_name': activity.parent.name if activity.parent else None,
             'children': children_list,
-            'children_count': len(activity.children),  # CORREÇÃO: len() em vez de .count()
+            'children_count': info['children_count'],
             'created_at': activity.created_at.isoformat() if activity.created_at else None
         })
     
@@ -496,47 +1422,146 @@ def api_activity(activity_id):
         
         activity.parent_activity_id = data.get('parent_activity_id', activity.parent_activity_id)
         
+        # Status, alvo e porcentagem manual podem satisfazer regras de recompensa
+        enqueue_after_commit('evaluate_reward_rules_task', user_id=user_id, activity_ids=[activity.id])
         db.session.commit()
         return jsonify({'message': 'Atividade atualizada com sucesso'})
     
     elif request.method == 'DELETE':
+        ensure_daily_stats(user_id)
+        remove_activity_daily_stats(activity)
+        detach_activity_rewards([activity.id])
         db.session.delete(activity)
         db.session.commit()
         return jsonify({'message': 'Atividade excluída com sucesso'})
 
 @app.route('/api/activities/hierarchy')
+@conditional_user_response
+@user_cached_response()
 def api_activities_hierarchy():
     try:
         user_id = get_current_user_id()
         if not user_id:
             return jsonify({'error': 'Usuário não autenticado'}), 401
         
-        activities = Activity.query.filter_by(user_id=user_id).all()
-        
-        def build_hierarchy(activity_id=None):
-            children = [a for a in activities if a.parent_activity_id == activity_id]
-            result = []
-            for child in children:
-                progress = calculate_activity_progress(child)
-                activity_data = {
-                    'id': child.id,
-                    'name': child.name,
-                    'status': child.status,
-                    'category_name': child.category.name if child.category else None,
-                    'category_color': child.category.color if child.category else '#3498db',
-                    'progress': progress,
-                    'children_count': len(child.children),  # CORREÇÃO: len() em vez de .count()
-                    'children': build_hierarchy(child.id)
-                }
-                result.append(activity_data)
-            return result
+        root_id = request.args.get('root_id', type=int)
+        max_depth = request.args.get('max_depth', type=int)
+        limit = request.args.get('limit', type=int)
+        offset = request.args.get('offset', 0, type=int)
+        
+        activities = load_activity_subtree(user_id, root_id)
+        progress_map = build_activity_progress_map(activities)
+        
+        hierarchy, total_roots = build_activity_hierarchy(
+            activities, progress_map,
+            root_id=root_id,
+            max_depth=max_depth,
+            limit=limit,
+            offset=offset
+        )
         
-        hierarchy = build_hierarchy()
-        return jsonify(hierarchy)
+        response = jsonify(hierarchy)
+        response.headers['X-Total-Count'] = str(total_roots)
+        return response
     except Exception as e:
         print(f"Erro ao carregar hierarquia: {str(e)}")
+        skip_response_cache()
         return jsonify([])
 
+def load_activity_subtree(user_id, root_id=None):
+    if root_id is None:
+        return Activity.query.filter_by(user_id=user_id).order_by(Activity.id).all()
+    
+    # CTE recursiva (PostgreSQL e SQLite): apenas a subárvore de root_id em uma consulta.
+    # UNION (sem ALL) descarta linhas repetidas e encerra ciclos de parent_activity_id
+    subtree = db.session.query(Activity.id).filter(
+        Activity.user_id == user_id,
+        Activity.parent_activity_id == root_id
+    ).cte('activity_subtree', recursive=True)
+    
+    subtree = subtree.union(
+        db.session.query(Activity.id).filter(Activity.user_id == user_id).join(
+            subtree, Activity.parent_activity_id == subtree.c.id
+        )
+    )
+    
+    return Activity.query.join(subtree, Activity.id == subtree.c.id).order_by(Activity.id).all()
+
+def build_activity_hierarchy(activities, progress_map, root_id=None, max_depth=None, limit=None, offset=0):
+    # Índice de adjacência: cada nó é visitado uma única vez (O(n) em vez de O(n²))
+    children_index = {}
+    for act in activities:
+        children_index.setdefault(act.parent_activity_id, []).append(act)
+    
+    roots = children_index.get(root_id, [])
+    
+    # Progresso agregado em pós-ordem: pais sem conclusão própria herdam a média dos filhos
+    rollup = {}
+    visited = set()
+    stack = [(act, False) for act in reversed(roots)]
+    while stack:
+        act, expanded = stack.pop()
+        if expanded:
+            own_progress = progress_map[act.id]['progress_percentage']
+            child_values = [rollup[c.id] for c in children_index.get(act.id, []) if c.id in rollup]
+            if child_values and act.status != 'completed':
+                rollup[act.id] = round(sum(child_values) / len(child_values), 1)
+            else:
+                rollup[act.id] = own_progress
+            continue
+        
+        if act.id in visited:
+            continue
+        visited.add(act.id)
+        stack.append((act, True))
+        stack.extend((c, False) for c in reversed(children_index.get(act.id, [])) if c.id not in visited)
+    
+    def make_node(act):
+        info = progress_map[act.id]
+        return {
+            'id': act.id,
+            'name': act.name,
+            'status': act.status,
+            'category_name': info['category_name'],
+            'category_color': info['category_color'],
+            'progress': info['progress_percentage'],
+            'rollup_progress': rollup.get(act.id, info['progress_percentage']),
+            'children_count': info['children_count'],
+            'has_more_children': False,
+            'children': []
+        }
+    
+    page = roots[offset:offset + limit] if limit else roots[offset:]
+    
+    result = []
+    emitted = set()
+    queue = deque()
+    for act in page:
+        node = make_node(act)
+        result.append(node)
+        emitted.add(act.id)
+        queue.append((act, node, 1))
+    
+    # Montagem em largura, sem recursão, para suportar árvores profundas
+    while queue:
+        act, node, depth = queue.popleft()
+        children = [c for c in children_index.get(act.id, []) if c.id not in emitted]
+        
+        if max_depth is not None and depth >= max_depth:
+            node['has_more_children'] = bool(children)
+            continue
+        
+        visible = children[:limit] if limit else children
+        node['has_more_children'] = len(visible) < len(children)
+        
+        for child in visible:
+            child_node = make_node(child)
+            node['children'].append(child_node)
+            emitted.add(child.id)
+            queue.append((child, child_node, depth + 1))
+    
+    return result, len(roots)
+
 # ============ PROGRESSO ============
 @app.route('/api/progress', methods=['POST'])
 def api_progress():
@@ -554,156 +1579,99 @@ def api_progress():
         if not activity:
             return jsonify({'message': 'Atividade não encontrada'}), 404
         
-        measurement_type = data.get('measurement_type', activity.measurement_type)
-        value = float(data.get('value', 0))
-        unit = data.get('unit', '')
-        completed = data.get('completed', False)
+        ensure_daily_stats(user_id)
+        
+        try:
+            measurement_type, value, unit, completed = normalize_progress_input(activity, data)
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
         from_schedule = data.get('from_schedule', False)
         
-        if measurement_type == 'units':
-            if not unit:
-                unit = activity.target_unit or 'unidades'
-            if activity.target_value and value > activity.target_value:
-                return jsonify({'message': f'O valor não pode exceder o alvo ({activity.target_value})'}), 400
-        elif measurement_type == 'percentage':
-            unit = '%'
-            if value < 0 or value > 100:
-                return jsonify({'message': 'A porcentagem deve estar entre 0 e 100'}), 400
-            if value >= 100:
-                completed = True
-        elif measurement_type == 'boolean':
-            unit = 'unidades'
-            value = 1
-            completed = True
+        progress_total = get_or_create_progress_total(activity)
         
         if completed and measurement_type == 'units' and activity.target_value:
-            current_total = db.session.query(func.sum(Progress.value)).filter(
-                Progress.activity_id == activity.id
-            ).scalar() or 0
+            current_total = progress_total.total_value or 0
             value = max(activity.target_value - current_total, 0)
         
         progress_date = datetime.strptime(data['date'], '%Y-%m-%d').date() if data.get('date') else date.today()
         
-        # VERIFICAR SE JÁ EXISTE UM REGISTRO DE PROGRESSO PARA ESTA ATIVIDADE NESTE DIA
-        existing_progress = Progress.query.filter_by(
-            activity_id=activity.id,
-            user_id=user_id,
-            date=progress_date
-        ).first()
-        
-        points_earned = 0
+        points_earned = calculate_progress_points(activity, measurement_type, value, completed)
         streak_bonus = 0
         
-        if measurement_type == 'units' and activity.target_value and activity.target_value > 0:
-            progress_ratio = (value / activity.target_value) * 100 if activity.target_value > 0 else 0
-            points_earned = int(progress_ratio / 10)
-            
-            if completed:
-                points_earned += 5
-        elif measurement_type == 'percentage':
-            points_earned = int(value / 10)
-            if completed:
-                points_earned += 5
-        elif measurement_type == 'boolean' and completed:
-            points_earned = 10
-        
         if from_schedule:
-            streak_bonus, _ = calculate_streak_bonus(user_id)
+            streak_bonus, _ = calculate_streak_bonus(user_id, progress_date)
             points_earned += streak_bonus
         
-        if existing_progress:
-            # ATUALIZAR PROGRESSO EXISTENTE
-            old_points = existing_progress.points_earned or 0
-            
-            existing_progress.value = value
-            existing_progress.unit = unit
-            existing_progress.notes = data.get('notes', existing_progress.notes)
-            existing_progress.completed = completed
-            existing_progress.from_schedule = from_schedule
-            existing_progress.points_earned = points_earned
-            existing_progress.streak_bonus = streak_bonus
-            
-            progress = existing_progress
-            
-            # AJUSTAR PONTOS DO USUÁRIO (subtrair pontos antigos, adicionar novos)
-            user_points = UserPoints.query.filter_by(user_id=user_id).first()
-            if not user_points:
-                user_points = UserPoints(user_id=user_id, points=0)
-                db.session.add(user_points)
-            
-            # Remover pontos antigos e adicionar novos
-            user_points.points -= old_points
-            user_points.points += points_earned
-            user_points.last_updated = datetime.utcnow()
+        # UPSERT EM (activity_id, date): CRIA O REGISTRO DO DIA OU SUBSTITUI O EXISTENTE
+        values = {
+            'activity_id': activity.id,
+            'user_id': user_id,
+            'date': progress_date,
+            'value': value,
+            'unit': unit,
+            'notes': data.get('notes', ''),
+            'completed': completed,
+            'from_schedule': from_schedule,
+            'points_earned': points_earned,
+            'streak_bonus': streak_bonus
+        }
+        update_fields = [field for field in PROGRESS_UPSERT_FIELDS if field != 'notes' or 'notes' in data]
+        progress_id, previous = upsert_progress_entry(values, update_fields)
+        
+        if previous:
+            # AJUSTAR TOTAIS, ESTATÍSTICAS E PONTOS PELA DIFERENÇA PARA O REGISTRO ANTERIOR
+            old_points = previous['points_earned'] or 0
+            apply_progress_total_delta(progress_total, value - (previous['value'] or 0))
+            apply_daily_stats_deltas(user_id, {(progress_date, activity.category_id): {
+                'points': points_earned - old_points,
+                'completed_count': int(bool(completed)) - int(bool(previous['completed']))
+            }})
             
-            # Criar transação de ajuste
-            if points_earned != old_points:
-                adjustment = points_earned - old_points
+            adjustment = points_earned - old_points
+            description = None
+            if adjustment != 0:
                 description = f'Ajuste de progresso em {activity.name}'
                 if streak_bonus > 0:
                     description += f' + {streak_bonus} pts (sequência)'
-                
-                transaction = PointTransaction(
-                    user_id=user_id,
-                    points=adjustment,
-                    description=description,
-                    activity_id=activity.id
-                )
-                db.session.add(transaction)
-        else:
-            # CRIAR NOVO REGISTRO DE PROGRESSO
-            progress = Progress(
-                activity_id=activity.id,
-                user_id=user_id,
-                date=progress_date,
-                value=value,
-                unit=unit,
-                notes=data.get('notes', ''),
-                completed=completed,
-                from_schedule=from_schedule,
-                points_earned=points_earned,
-                streak_bonus=streak_bonus
-            )
-            db.session.add(progress)
             
-            user_points = UserPoints.query.filter_by(user_id=user_id).first()
-            if not user_points:
-                user_points = UserPoints(user_id=user_id, points=0)
-                db.session.add(user_points)
-            
-            user_points.points += points_earned
-            user_points.last_updated = datetime.utcnow()
+            if apply_points_delta(user_id, adjustment, description, activity.id) is None:
+                db.session.rollback()
+                return jsonify({'message': 'Saldo de pontos insuficiente para este ajuste'}), 400
+        else:
+            apply_progress_total_delta(progress_total, value, 1)
+            apply_daily_stats_deltas(user_id, {(progress_date, activity.category_id): {
+                'progress_count': 1,
+                'completed_count': int(bool(completed)),
+                'points': points_earned
+            }})
             
+            description = None
             if points_earned > 0:
                 description = f'Progresso em {activity.name}'
                 if streak_bonus > 0:
                     description += f' + {streak_bonus} pts (sequência)'
-                
-                transaction = PointTransaction(
-                    user_id=user_id,
-                    points=points_earned,
-                    description=description,
-                    activity_id=activity.id
-                )
-                db.session.add(transaction)
+            
+            apply_points_delta(user_id, points_earned, description, activity.id)
         
         if completed:
             activity.status = 'completed'
             if measurement_type == 'percentage':
                 activity.manual_percentage = 100
         
+        enqueue_after_commit('evaluate_reward_rules_task', user_id=user_id,
+                             activity_ids=[activity.id], streak=bool(from_schedule))
         db.session.commit()
         
         current_progress = calculate_activity_progress(activity)
         
         return jsonify({
-            'id': progress.id,
+            'id': progress_id,
             'message': 'Progresso registrado com sucesso',
             'points_earned': points_earned,
             'streak_bonus': streak_bonus,
             'current_progress': current_progress,
             'activity_status': activity.status,
-            'is_update': existing_progress is not None
+            'is_update': previous is not None
         })
         
     except Exception as e:
@@ -711,21 +1679,228 @@ def api_progress():
         print(f"Erro ao registrar progresso: {str(e)}")
         return jsonify({'message': f'Erro ao registrar progresso: {str(e)}'}), 500
     
-@app.route('/api/progress/recent')
-def api_recent_progress():
-    user_id = get_current_user_id()
-    if not user_id:
-        return jsonify({'error': 'Usuário não autenticado'}), 401
-    
-    since_date = request.args.get('since')
-    if since_date:
-        since_date = datetime.strptime(since_date, '%Y-%m-%d').date()
-    else:
-        since_date = date.today() - timedelta(days=7)
-    
-    progress_entries = Progress.query.filter(
-        Progress.user_id == user_id,
-        Progress.date >= since_date
+@app.route('/api/progress/batch', methods=['POST'])
+def api_progress_batch():
+    # Importação em lote (clientes offline, histórico de outro rastreador): valida tudo
+    # antes de gravar, faz upsert em (activity_id, date) e um único lançamento de pontos
+    try:
+        user_id = get_current_user_id()
+        if not user_id:
+            return jsonify({'message': 'Usuário não autenticado'}), 401
+        
+        data = request.get_json(silent=True)
+        entries = data.get('entries') if isinstance(data, dict) else data
+        if not isinstance(entries, list) or not entries:
+            return jsonify({'message': 'Envie uma lista de registros em "entries"'}), 400
+        
+        max_entries = app.config['PROGRESS_BATCH_MAX_ENTRIES']
+        if len(entries) > max_entries:
+            return jsonify({'message': f'Máximo de {max_entries} registros por lote'}), 400
+        
+        requested_ids = set()
+        for entry in entries:
+            try:
+                requested_ids.add(int(entry['activity_id']))
+            except (TypeError, KeyError, ValueError):
+                pass
+        
+        activities = {}
+        for ids in chunked(requested_ids):
+            activities.update((act.id, act) for act in Activity.query.filter(
+                Activity.user_id == user_id,
+                Activity.id.in_(ids)
+            ).all())
+        
+        # Validação de todos os registros antes de qualquer escrita; repetições do
+        # mesmo (atividade, dia) no lote valem pela última ocorrência
+        errors = []
+        parsed = {}
+        for index, entry in enumerate(entries):
+            if not isinstance(entry, dict) or not entry.get('activity_id'):
+                errors.append({'index': index, 'message': 'ID da atividade é obrigatório'})
+                continue
+            
+            try:
+                activity = activities.get(int(entry['activity_id']))
+            except (TypeError, ValueError):
+                activity = None
+            if not activity:
+                errors.append({'index': index, 'message': 'Atividade não encontrada'})
+                continue
+            
+            try:
+                measurement_type, value, unit, completed = normalize_progress_input(activity, entry)
+                progress_date = datetime.strptime(entry['date'], '%Y-%m-%d').date() if entry.get('date') else date.today()
+            except (TypeError, ValueError) as e:
+                errors.append({'index': index, 'message': str(e)})
+                continue
+            
+            parsed[(activity.id, progress_date)] = {
+                'activity': activity,
+                'date': progress_date,
+                'measurement_type': measurement_type,
+                'value': value,
+                'unit': unit,
+                'completed': bool(completed),
+                'from_schedule': bool(entry.get('from_schedule', False)),
+                'notes': entry.get('notes')
+            }
+        
+        if errors:
+            return jsonify({'message': 'Nenhum registro foi gravado', 'errors': errors}), 400
+        
+        ensure_daily_stats(user_id)
+        
+        # Registros já existentes e totais materializados, em consultas agrupadas
+        activity_ids = {activity_id for activity_id, _ in parsed}
+        days = [progress_date for _, progress_date in parsed]
+        existing = {}
+        totals = {}
+        for ids in chunked(activity_ids):
+            for row in db.session.query(
+                Progress.activity_id, Progress.date, Progress.value,
+                Progress.completed, Progress.points_earned, Progress.notes
+            ).filter(
+                Progress.activity_id.in_(ids),
+                Progress.date >= min(days),
+                Progress.date <= max(days)
+            ).all():
+                if (row.activity_id, row.date) in parsed:
+                    existing[(row.activity_id, row.date)] = row
+            
+            totals.update((row.activity_id, row) for row in ActivityProgressTotal.query.filter(
+                ActivityProgressTotal.activity_id.in_(ids)
+            ).all())
+        
+        missing_ids = [activity_id for activity_id in activity_ids if activity_id not in totals]
+        if missing_ids:
+            insert_missing_progress_totals(user_id, missing_ids)
+            for ids in chunked(missing_ids):
+                totals.update((row.activity_id, row) for row in ActivityProgressTotal.query.filter(
+                    ActivityProgressTotal.activity_id.in_(ids)
+                ).all())
+        
+        # Sequência atualizada uma vez para todas as datas vindas da agenda
+        streak_counts = record_streak_events(
+            user_id, [item['date'] for item in parsed.values() if item['from_schedule']]
+        )
+        
+        # Uma passada em ordem de data: pontos, deltas de totais, estatísticas e saldo
+        running_totals = {activity_id: row.total_value or 0 for activity_id, row in totals.items()}
+        total_deltas = {}
+        stats_deltas = {}
+        rows = []
+        results = []
+        points_delta = 0
+        streak_points = 0
+        
+        for key in sorted(parsed, key=lambda k: (k[1], k[0])):
+            item = parsed[key]
+            activity = item['activity']
+            old = existing.get(key)
+            old_value = old.value or 0 if old else 0
+            value = item['value']
+            
+            if item['completed'] and item['measurement_type'] == 'units' and activity.target_value:
+                value = max(activity.target_value - (running_totals[activity.id] - old_value), 0)
+            
+            points_earned = calculate_progress_points(activity, item['measurement_type'], value, item['completed'])
+            entry_bonus = streak_bonus_for(streak_counts[item['date']])[0] if item['from_schedule'] else 0
+            points_earned += entry_bonus
+            streak_points += entry_bonus
+            old_points = old.points_earned or 0 if old else 0
+            
+            running_totals[activity.id] += value - old_value
+            value_delta, count_delta = total_deltas.get(activity.id, (0, 0))
+            total_deltas[activity.id] = (value_delta + value - old_value, count_delta + (0 if old else 1))
+            
+            fields = stats_deltas.setdefault((item['date'], activity.category_id), dict.fromkeys(DAILY_STATS_FIELDS, 0))
+            fields['progress_count'] += 0 if old else 1
+            fields['completed_count'] += int(item['completed']) - (int(bool(old.completed)) if old else 0)
+            fields['points'] += points_earned - old_points
+            points_delta += points_earned - old_points
+            
+            notes = item['notes']
+            if notes is None:
+                notes = old.notes if old else ''
+            
+            rows.append({
+                'activity_id': activity.id,
+                'user_id': user_id,
+                'date': item['date'],
+                'value': value,
+                'unit': item['unit'],
+                'notes': notes,
+                'completed': item['completed'],
+                'from_schedule': item['from_schedule'],
+                'points_earned': points_earned,
+                'streak_bonus': entry_bonus
+            })
+            results.append({
+                'activity_id': activity.id,
+                'date': item['date'].isoformat(),
+                'points_earned': points_earned,
+                'is_update': old is not None
+            })
+            
+            if item['completed']:
+                activity.status = 'completed'
+                if item['measurement_type'] == 'percentage':
+                    activity.manual_percentage = 100
+        
+        db.session.execute(progress_upsert_statement(), rows)
+        
+        for activity_id, (value_delta, count_delta) in total_deltas.items():
+            apply_progress_total_delta(totals[activity_id], value_delta, count_delta)
+        apply_daily_stats_deltas(user_id, stats_deltas)
+        
+        description = None
+        if points_delta != 0:
+            description = f'Importação de progresso ({len(rows)} registros)'
+            if streak_points > 0:
+                description += f' + {streak_points} pts (sequência)'
+        
+        balance = apply_points_delta(user_id, points_delta, description)
+        if balance is None:
+            db.session.rollback()
+            return jsonify({'message': 'Saldo de pontos insuficiente para estes ajustes'}), 400
+        
+        enqueue_after_commit('evaluate_reward_rules_task', user_id=user_id,
+                             activity_ids=sorted(activity_ids), streak=bool(streak_counts))
+        db.session.commit()
+        
+        return jsonify({
+            'message': f'{len(rows)} registros de progresso gravados',
+            'created': sum(1 for result in results if not result['is_update']),
+            'updated': sum(1 for result in results if result['is_update']),
+            'points_earned': points_delta,
+            'total_points': balance,
+            'results': results
+        })
+        
+    except Exception as e:
+        db.session.rollback()
+        print(f"Erro ao importar progresso: {str(e)}")
+        return jsonify({'message': f'Erro ao importar progresso: {str(e)}'}), 500
+
+@app.route('/api/progress/recent')
+@conditional_user_response
+def api_recent_progress():
+    user_id = get_current_user_id()
+    if not user_id:
+        return jsonify({'error': 'Usuário não autenticado'}), 401
+    
+    since_date = request.args.get('since')
+    if since_date:
+        since_date = datetime.strptime(since_date, '%Y-%m-%d').date()
+    else:
+        since_date = date.today() - timedelta(days=7)
+    
+    progress_entries = Progress.query.options(
+        joinedload(Progress.activity)
+    ).filter(
+        Progress.user_id == user_id,
+        Progress.date >= since_date
     ).order_by(Progress.date.desc()).all()
     
     return jsonify([{
@@ -744,6 +1919,7 @@ def api_recent_progress():
 
 # ============ AGENDAMENTOS ============
 @app.route('/api/schedules', methods=['GET', 'POST'])
+@conditional_user_response
 def api_schedules():
     user_id = get_current_user_id()
     if not user_id:
@@ -754,6 +1930,14 @@ def api_schedules():
         
         scheduled_date = datetime.strptime(data['scheduled_date'], '%Y-%m-%d').date()
         
+        category_id = db.session.query(Activity.category_id).filter_by(
+            id=data['activity_id'], user_id=user_id
+        ).scalar()
+        if category_id is None:
+            return jsonify({'error': 'Atividade não encontrada'}), 404
+        
+        ensure_daily_stats(user_id)
+        
         schedule = ScheduledActivity(
             activity_id=data['activity_id'],
             user_id=user_id,
@@ -762,6 +1946,7 @@ def api_schedules():
             duration=data['duration']
         )
         db.session.add(schedule)
+        apply_schedule_stats(user_id, added=[(scheduled_date, data['scheduled_time'], category_id, data['duration'])])
         db.session.commit()
         return jsonify({'id': schedule.id, 'message': 'Atividade agendada com sucesso'})
     
@@ -773,13 +1958,15 @@ def api_schedules():
     
     week_end = week_start + timedelta(days=6)
     
-    schedules = ScheduledActivity.query.filter(
+    schedules = ScheduledActivity.query.options(
+        joinedload(ScheduledActivity.activity).joinedload(Activity.category)
+    ).filter(
         ScheduledActivity.user_id == user_id,
         ScheduledActivity.scheduled_date >= week_start,
         ScheduledActivity.scheduled_date <= week_end
     ).all()
     
-    return jsonify([{
+    result = [{
         'id': s.id,
         'activity_id': s.activity_id,
         'activity_name': s.activity.name if s.activity else None,
@@ -787,7 +1974,15 @@ def api_schedules():
         'scheduled_date': s.scheduled_date.isoformat(),
         'scheduled_time': s.scheduled_time,
         'duration': s.duration
-    } for s in schedules])
+    } for s in schedules]
+    
+    # Ocorrências das regras de repetição, expandidas só para a semana pedida
+    result.extend(
+        serialize_recurrence_occurrence(rule, day)
+        for rule, day in expand_recurrence_occurrences(user_id, week_start, week_end)
+    )
+    
+    return jsonify(result)
 
 @app.route('/api/schedules/<int:schedule_id>', methods=['PUT', 'DELETE'])
 def api_schedule(schedule_id):
@@ -796,6 +1991,9 @@ def api_schedule(schedule_id):
         return jsonify({'error': 'Usuário não autenticado'}), 401
     
     schedule = ScheduledActivity.query.filter_by(id=schedule_id, user_id=user_id).first_or_404()
+    ensure_daily_stats(user_id)
+    category_id = schedule.activity.category_id
+    old_schedule = (schedule.scheduled_date, schedule.scheduled_time, category_id, schedule.duration)
     
     if request.method == 'PUT':
         data = request.get_json()
@@ -807,10 +2005,18 @@ def api_schedule(schedule_id):
         if 'duration' in data:
             schedule.duration = data['duration']
         
+        # Move a contagem para o novo dia e horário e ajusta a duração
+        apply_schedule_stats(
+            user_id,
+            added=[(schedule.scheduled_date, schedule.scheduled_time, category_id, schedule.duration)],
+            removed=[old_schedule]
+        )
+        
         db.session.commit()
         return jsonify({'message': 'Agendamento atualizado com sucesso'})
     
     elif request.method == 'DELETE':
+        apply_schedule_stats(user_id, removed=[old_schedule])
         db.session.delete(schedule)
         db.session.commit()
         return jsonify({'message': 'Agendamento excluído com sucesso'})
@@ -826,49 +2032,489 @@ def api_replicate_schedule(schedule_id):
     
     replicate_type = data.get('type', 'weekly')
     until_date = datetime.strptime(data['until_date'], '%Y-%m-%d').date()
-    days_of_week = data.get('days_of_week', [])
-    
-    if days_of_week and isinstance(days_of_week[0], str):
-        days_of_week = [int(day) for day in days_of_week]
-    
-    created_schedules = []
-    current_date = original_schedule.scheduled_date
-    
-    while current_date <= until_date:
-        if should_replicate(current_date, original_schedule.scheduled_date, replicate_type, days_of_week):
-            new_schedule = ScheduledActivity(
-                activity_id=original_schedule.activity_id,
-                user_id=user_id,
-                scheduled_date=current_date,
-                scheduled_time=original_schedule.scheduled_time,
-                duration=original_schedule.duration
-            )
-            db.session.add(new_schedule)
-            created_schedules.append(new_schedule)
+    days_of_week = [int(day) for day in data.get('days_of_week', [])]
+    dry_run = bool(data.get('dry_run', request.args.get('dry_run', type=int)))
+    
+    if replicate_type not in RECURRENCE_TYPES:
+        return jsonify({'message': 'Tipo de replicação inválido'}), 400
+    
+    dates = expand_recurrence(original_schedule.scheduled_date, until_date, replicate_type, days_of_week)
+    
+    # Datas que já têm a mesma atividade no mesmo horário, em uma única consulta por intervalo
+    existing_dates = set()
+    if dates:
+        same_time = ScheduledActivity.scheduled_time.is_(None) if original_schedule.scheduled_time is None \
+            else ScheduledActivity.scheduled_time == original_schedule.scheduled_time
+        existing_dates = {row[0] for row in db.session.query(ScheduledActivity.scheduled_date).filter(
+            ScheduledActivity.user_id == user_id,
+            ScheduledActivity.activity_id == original_schedule.activity_id,
+            ScheduledActivity.scheduled_date >= dates[0],
+            ScheduledActivity.scheduled_date <= dates[-1],
+            same_time
+        ).all()}
+    
+    new_dates = [day for day in dates if day not in existing_dates]
+    skipped_dates = [day for day in dates if day in existing_dates]
+    
+    if data.get('virtual'):
+        # Uma regra no lugar das linhas; as datas já agendadas viram exceções
+        rule = ScheduleRecurrence(
+            activity_id=original_schedule.activity_id,
+            user_id=user_id,
+            frequency='weekly' if replicate_type == 'days_of_week' else replicate_type,
+            weekdays=','.join(str(day) for day in sorted(set(days_of_week))) or None,
+            monthday=original_schedule.scheduled_date.day if replicate_type == 'monthly' else None,
+            start_date=original_schedule.scheduled_date,
+            until_date=until_date,
+            scheduled_time=original_schedule.scheduled_time,
+            duration=original_schedule.duration,
+            exceptions=json.dumps([day.isoformat() for day in skipped_dates])
+        )
+        if dry_run:
+            return jsonify({
+                'dry_run': True,
+                'dates': [day.isoformat() for day in new_dates],
+                'skipped_dates': [day.isoformat() for day in skipped_dates],
+                'created_count': 0
+            })
         
-        current_date += timedelta(days=1)
+        db.session.add(rule)
+        db.session.commit()
+        return jsonify({
+            'message': f'Repetição criada com {len(new_dates)} ocorrências',
+            'recurrence_id': rule.id,
+            'created_count': 0,
+            'occurrence_count': len(new_dates),
+            'skipped_count': len(skipped_dates)
+        })
     
-    db.session.commit()
+    if dry_run:
+        return jsonify({
+            'dry_run': True,
+            'dates': [day.isoformat() for day in new_dates],
+            'skipped_dates': [day.isoformat() for day in skipped_dates],
+            'created_count': 0
+        })
+    
+    if new_dates:
+        ensure_daily_stats(user_id)
+        category_id = original_schedule.activity.category_id
+        
+        db.session.execute(insert(ScheduledActivity), [{
+            'activity_id': original_schedule.activity_id,
+            'user_id': user_id,
+            'scheduled_date': day,
+            'scheduled_time': original_schedule.scheduled_time,
+            'duration': original_schedule.duration
+        } for day in new_dates])
+        
+        apply_schedule_stats(user_id, added=[
+            (day, original_schedule.scheduled_time, category_id, original_schedule.duration)
+            for day in new_dates
+        ])
+        db.session.commit()
     
     return jsonify({
-        'message': f'{len(created_schedules)} agendamentos criados com sucesso',
-        'created_count': len(created_schedules)
+        'message': f'{len(new_dates)} agendamentos criados com sucesso',
+        'created_count': len(new_dates),
+        'skipped_count': len(skipped_dates)
     })
 
-def should_replicate(current_date, original_date, replicate_type, days_of_week):
-    if replicate_type == 'daily':
-        return True
-    elif replicate_type == 'weekly':
-        if days_of_week:
-            return current_date.weekday() in days_of_week
-        else:
-            return current_date.weekday() == original_date.weekday()
-    elif replicate_type == 'monthly':
-        return current_date.day == original_date.day
-    return False
+RECURRENCE_TYPES = ('daily', 'weekly', 'days_of_week', 'monthly')
+
+def expand_recurrence(start_date, until_date, recurrence_type, days_of_week=None, monthday=None):
+    # Datas da recorrência em [start_date, until_date], calculadas aritmeticamente
+    # em vez de testar dia a dia; 'weekly' sem dias usa o dia da semana inicial
+    # e 'monthly' (no dia de start_date, salvo monthday) pula meses sem esse dia
+    if until_date < start_date:
+        return []
+    
+    if recurrence_type == 'daily':
+        return [start_date + timedelta(days=offset) for offset in range((until_date - start_date).days + 1)]
+    
+    if recurrence_type in ('weekly', 'days_of_week'):
+        weekdays = sorted(set(days_of_week or [])) or [start_date.weekday()]
+        dates = []
+        for weekday in weekdays:
+            current = start_date + timedelta(days=(weekday - start_date.weekday()) % 7)
+            while current <= until_date:
+                dates.append(current)
+                current += timedelta(days=7)
+        return sorted(dates)
+    
+    if recurrence_type == 'monthly':
+        monthday = monthday or start_date.day
+        dates = []
+        year, month = start_date.year, start_date.month
+        while date(year, month, 1) <= until_date:
+            try:
+                current = date(year, month, monthday)
+            except ValueError:
+                current = None
+            if current and start_date <= current <= until_date:
+                dates.append(current)
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        return dates
+    
+    return []
+
+# ============ REPETIÇÕES DE AGENDAMENTO ============
+# Ocorrências virtuais têm id 'r<regra>-<AAAA-MM-DD>'; editar uma delas cria um
+# agendamento concreto e marca a data como exceção da regra. O agregado diário
+# guarda só os agendamentos concretos: as leituras de estatísticas e padrões somam
+# as ocorrências virtuais do intervalo pedido, e intervalos sem fim contam as
+# ocorrências até hoje, já que regras sem data final não terminam
+RECURRENCE_FREQUENCIES = ('daily', 'weekly', 'monthly')
+
+def get_recurrence_exceptions(rule):
+    return {date.fromisoformat(day) for day in json.loads(rule.exceptions or '[]')}
+
+def add_recurrence_exception(rule, day):
+    exceptions = get_recurrence_exceptions(rule)
+    exceptions.add(day)
+    rule.exceptions = json.dumps(sorted(exception.isoformat() for exception in exceptions))
+
+def expand_schedule_recurrence(rule, window_start, window_end):
+    start = max(rule.start_date, window_start)
+    end = min(rule.until_date, window_end) if rule.until_date else window_end
+    weekdays = [int(day) for day in rule.weekdays.split(',')] if rule.weekdays else [rule.start_date.weekday()]
+    
+    exceptions = get_recurrence_exceptions(rule)
+    return [
+        day for day in expand_recurrence(start, end, rule.frequency, weekdays, rule.monthday or rule.start_date.day)
+        if day not in exceptions
+    ]
+
+def expand_recurrence_occurrences(user_id, start_date, end_date):
+    # Pares (regra, dia) das ocorrências virtuais em [start_date, end_date];
+    # start_date None começa no início de cada regra
+    query = ScheduleRecurrence.query.options(
+        joinedload(ScheduleRecurrence.activity).joinedload(Activity.category)
+    ).filter(
+        ScheduleRecurrence.user_id == user_id,
+        ScheduleRecurrence.start_date <= end_date
+    )
+    if start_date:
+        query = query.filter(or_(ScheduleRecurrence.until_date.is_(None), ScheduleRecurrence.until_date >= start_date))
+    
+    return [
+        (rule, day)
+        for rule in query.all()
+        for day in expand_schedule_recurrence(rule, start_date or rule.start_date, end_date)
+    ]
+
+def recurrence_daily_stats(user_id, start_date=None, end_date=None):
+    # Contribuição das ocorrências virtuais no formato do agregado diário:
+    # {(dia, category_id): {'scheduled_count': n, 'scheduled_minutes': m}}
+    stats = {}
+    for rule, day in expand_recurrence_occurrences(user_id, start_date, end_date or date.today()):
+        fields = stats.setdefault((day, rule.activity.category_id), dict.fromkeys(RECURRENCE_STATS_FIELDS, 0))
+        fields['scheduled_count'] += 1
+        fields['scheduled_minutes'] += int(rule.duration or 0)
+    return stats
+
+def serialize_recurrence_occurrence(rule, day):
+    return {
+        'id': f'r{rule.id}-{day.isoformat()}',
+        'activity_id': rule.activity_id,
+        'activity_name': rule.activity.name if rule.activity else None,
+        'category_color': rule.activity.category.color if rule.activity and rule.activity.category else '#3498db',
+        'scheduled_date': day.isoformat(),
+        'scheduled_time': rule.scheduled_time,
+        'duration': rule.duration,
+        'recurrence_id': rule.id,
+        'virtual': True
+    }
+
+def serialize_recurrence(rule):
+    return {
+        'id': rule.id,
+        'activity_id': rule.activity_id,
+        'activity_name': rule.activity.name if rule.activity else None,
+        'frequency': rule.frequency,
+        'weekdays': [int(day) for day in rule.weekdays.split(',')] if rule.weekdays else [],
+        'monthday': rule.monthday,
+        'start_date': rule.start_date.isoformat(),
+        'until_date': rule.until_date.isoformat() if rule.until_date else None,
+        'scheduled_time': rule.scheduled_time,
+        'duration': rule.duration,
+        'exceptions': sorted(day.isoformat() for day in get_recurrence_exceptions(rule))
+    }
+
+def parse_recurrence_fields(data, user_id, rule=None):
+    # Valida os campos enviados; lança ValueError com a mensagem para o usuário
+    fields = {}
+    
+    if rule is None or 'activity_id' in data:
+        if not Activity.query.filter_by(id=data.get('activity_id'), user_id=user_id).first():
+            raise ValueError('Atividade não encontrada')
+        fields['activity_id'] = data['activity_id']
+    
+    if rule is None or 'frequency' in data:
+        if data.get('frequency') not in RECURRENCE_FREQUENCIES:
+            raise ValueError('Frequência inválida (use daily, weekly ou monthly)')
+        fields['frequency'] = data['frequency']
+    
+    if 'weekdays' in data:
+        weekdays = sorted({int(day) for day in data['weekdays'] or []})
+        if any(day < 0 or day > 6 for day in weekdays):
+            raise ValueError('Dias da semana devem estar entre 0 (segunda) e 6 (domingo)')
+        fields['weekdays'] = ','.join(str(day) for day in weekdays) or None
+    
+    if 'monthday' in data:
+        monthday = int(data['monthday']) if data['monthday'] else None
+        if monthday is not None and not 1 <= monthday <= 31:
+            raise ValueError('Dia do mês deve estar entre 1 e 31')
+        fields['monthday'] = monthday
+    
+    if rule is None or 'start_date' in data:
+        fields['start_date'] = datetime.strptime(data['start_date'], '%Y-%m-%d').date()
+    
+    if 'until_date' in data:
+        fields['until_date'] = datetime.strptime(data['until_date'], '%Y-%m-%d').date() if data['until_date'] else None
+    
+    start_date = fields.get('start_date', rule.start_date if rule else None)
+    until_date = fields.get('until_date', rule.until_date if rule else None)
+    if until_date and until_date < start_date:
+        raise ValueError('A data final deve ser posterior à inicial')
+    
+    if 'scheduled_time' in data:
+        fields['scheduled_time'] = data['scheduled_time']
+    if 'duration' in data:
+        fields['duration'] = int(data['duration']) if data['duration'] is not None else None
+    if 'exceptions' in data:
+        fields['exceptions'] = json.dumps(sorted({
+            datetime.strptime(day, '%Y-%m-%d').date().isoformat() for day in data['exceptions'] or []
+        }))
+    
+    return fields
+
+@app.route('/api/recurrences', methods=['GET', 'POST'])
+@conditional_user_response
+def api_recurrences():
+    user_id = get_current_user_id()
+    if not user_id:
+        return jsonify({'error': 'Usuário não autenticado'}), 401
+    
+    if request.method == 'POST':
+        try:
+            fields = parse_recurrence_fields(request.get_json() or {}, user_id)
+        except (KeyError, TypeError, ValueError) as e:
+            return jsonify({'message': str(e)}), 400
+        
+        rule = ScheduleRecurrence(user_id=user_id, **fields)
+        db.session.add(rule)
+        db.session.commit()
+        return jsonify({'id': rule.id, 'message': 'Repetição criada com sucesso'})
+    
+    rules = ScheduleRecurrence.query.options(
+        joinedload(ScheduleRecurrence.activity)
+    ).filter_by(user_id=user_id).order_by(ScheduleRecurrence.start_date).all()
+    return jsonify([serialize_recurrence(rule) for rule in rules])
+
+@app.route('/api/recurrences/<int:recurrence_id>', methods=['PUT', 'DELETE'])
+def api_recurrence(recurrence_id):
+    user_id = get_current_user_id()
+    if not user_id:
+        return jsonify({'error': 'Usuário não autenticado'}), 401
+    
+    rule = ScheduleRecurrence.query.filter_by(id=recurrence_id, user_id=user_id).first_or_404()
+    
+    if request.method == 'PUT':
+        try:
+            fields = parse_recurrence_fields(request.get_json() or {}, user_id, rule)
+        except (KeyError, TypeError, ValueError) as e:
+            return jsonify({'message': str(e)}), 400
+        
+        for field, value in fields.items():
+            setattr(rule, field, value)
+        db.session.commit()
+        return jsonify({'message': 'Repetição atualizada com sucesso'})
+    
+    # Ocorrências já convertidas em agendamentos concretos continuam existindo
+    db.session.delete(rule)
+    db.session.commit()
+    return jsonify({'message': 'Repetição excluída com sucesso'})
+
+@app.route('/api/schedules/<occurrence_id>', methods=['PUT', 'DELETE'])
+def api_schedule_occurrence(occurrence_id):
+    user_id = get_current_user_id()
+    if not user_id:
+        return jsonify({'error': 'Usuário não autenticado'}), 401
+    
+    try:
+        rule_part, day_part = occurrence_id.split('-', 1)
+        recurrence_id = int(rule_part[1:]) if rule_part.startswith('r') else None
+        occurrence_date = datetime.strptime(day_part, '%Y-%m-%d').date()
+    except ValueError:
+        recurrence_id = None
+    if recurrence_id is None:
+        return jsonify({'error': 'Agendamento não encontrado'}), 404
+    
+    rule = ScheduleRecurrence.query.filter_by(id=recurrence_id, user_id=user_id).first_or_404()
+    if occurrence_date not in expand_schedule_recurrence(rule, occurrence_date, occurrence_date):
+        return jsonify({'error': 'Agendamento não encontrado'}), 404
+    
+    ensure_daily_stats(user_id)
+    add_recurrence_exception(rule, occurrence_date)
+    
+    if request.method == 'DELETE':
+        db.session.commit()
+        return jsonify({'message': 'Agendamento excluído com sucesso'})
+    
+    # Alterar uma ocorrência a transforma em um agendamento concreto
+    data = request.get_json() or {}
+    activity = rule.activity
+    if data.get('activity_id') and data['activity_id'] != rule.activity_id:
+        activity = Activity.query.filter_by(id=data['activity_id'], user_id=user_id).first()
+        if activity is None:
+            db.session.rollback()
+            return jsonify({'error': 'Atividade não encontrada'}), 404
+    
+    scheduled_date = datetime.strptime(data['scheduled_date'], '%Y-%m-%d').date() if data.get('scheduled_date') else occurrence_date
+    schedule = ScheduledActivity(
+        activity_id=activity.id,
+        user_id=user_id,
+        scheduled_date=scheduled_date,
+        scheduled_time=data.get('scheduled_time', rule.scheduled_time),
+        duration=data.get('duration', rule.duration)
+    )
+    db.session.add(schedule)
+    
+    apply_schedule_stats(user_id, added=[(scheduled_date, schedule.scheduled_time, activity.category_id, schedule.duration)])
+    db.session.commit()
+    return jsonify({'id': schedule.id, 'message': 'Agendamento atualizado com sucesso'})
 
 # ============ RECOMPENSAS ============
+# Condições avaliadas automaticamente. Recompensas 'points' continuam sendo
+# obtidas pelo resgate, que debita os pontos
+REWARD_RULE_TYPES = ('activity', 'streak')
+REWARD_CONDITION_TYPES = ('points',) + REWARD_RULE_TYPES
+
+def build_reward_rule_index(user_id, activity_ids=None, streak_count=None):
+    # Carrega só as regras pendentes que o evento pode satisfazer: 'activity' das
+    # atividades tocadas (activity_ids=None traz todas) e 'streak' com valor exigido
+    # até a sequência atual (streak_count=None não traz nenhuma)
+    index = {'activity': {}, 'streak': []}
+    pending = db.session.query(
+        Reward.id, Reward.condition_value, Reward.condition_activity_id
+    ).filter(
+        Reward.user_id == user_id,
+        Reward.achieved == False
+    )
+    
+    activity_rules = pending.filter(
+        Reward.condition_type == 'activity',
+        Reward.condition_activity_id.isnot(None)
+    )
+    if activity_ids is None:
+        rows = activity_rules.all()
+    else:
+        rows = []
+        for ids in chunked(list(set(activity_ids))):
+            rows.extend(activity_rules.filter(Reward.condition_activity_id.in_(ids)).all())
+    for reward_id, condition_value, activity_id in rows:
+        index['activity'].setdefault(activity_id, []).append((reward_id, condition_value))
+    
+    if streak_count is not None:
+        index['streak'] = [reward_id for reward_id, _, _ in pending.filter(
+            Reward.condition_type == 'streak',
+            Reward.condition_value > 0,
+            Reward.condition_value <= streak_count
+        ).all()]
+    
+    return index
+
+def evaluate_reward_rules(user_id, activity_ids=None, streak=False):
+    # Avalia só as regras afetadas pelo evento (activity_ids=None avalia todas as
+    # de atividade) e marca as conquistas com um único UPDATE; não faz commit
+    streak_count = None
+    if streak:
+        streak_count = db.session.query(WeeklyStreak.streak_count).filter_by(user_id=user_id).scalar() or 0
+    if activity_ids is not None and not activity_ids and streak_count is None:
+        return []
+    
+    index = build_reward_rule_index(user_id, activity_ids, streak_count)
+    achieved_ids = list(index['streak'])
+    
+    if index['activity']:
+        activities = []
+        for ids in chunked(list(index['activity'])):
+            activities.extend(Activity.query.filter(
+                Activity.user_id == user_id,
+                Activity.id.in_(ids)
+            ).all())
+        progress_map = build_activity_progress_map(activities)
+        
+        for activity in activities:
+            percentage = progress_map[activity.id]['progress_percentage']
+            for reward_id, required_percentage in index['activity'][activity.id]:
+                if activity.status == 'completed' or percentage >= (required_percentage or 100):
+                    achieved_ids.append(reward_id)
+    
+    for ids in chunked(achieved_ids):
+        Reward.query.filter(
+            Reward.id.in_(ids),
+            Reward.achieved == False
+        ).update({
+            Reward.achieved: True,
+            Reward.achieved_at: datetime.utcnow()
+        }, synchronize_session=False)
+    
+    return achieved_ids
+
+def detach_activity_rewards(activity_ids):
+    # Recompensas condicionadas a atividades que vão ser excluídas perdem o vínculo
+    # (o SQLite não aplica o ON DELETE SET NULL da chave estrangeira)
+    Reward.query.filter(Reward.condition_activity_id.in_(activity_ids)).update({
+        Reward.condition_activity_id: None
+    }, synchronize_session=False)
+
+@background_task
+def evaluate_reward_rules_task(user_id, activity_ids=None, streak=False):
+    if evaluate_reward_rules(user_id, activity_ids, streak):
+        enqueue_after_commit('refresh_user_data_version', durable=False, user_id=user_id)
+
+@app.cli.command('evaluate-rewards')
+@click.option('--user-id', type=int, default=None, help='Limita a avaliação a um usuário')
+def evaluate_rewards_command(user_id):
+    user_query = db.session.query(Reward.user_id).filter(
+        Reward.achieved == False,
+        Reward.condition_type.in_(REWARD_RULE_TYPES)
+    ).distinct()
+    if user_id is not None:
+        user_query = user_query.filter(Reward.user_id == user_id)
+    
+    total = 0
+    for (owner_id,) in user_query.all():
+        total += len(evaluate_reward_rules(owner_id, streak=True))
+    db.session.commit()
+    click.echo(f"{total} recompensas conquistadas")
+
+def parse_reward_condition(data, user_id, reward=None):
+    # Valida os campos de condição enviados; lança ValueError com a mensagem para o usuário
+    condition_type = data.get('condition_type', reward.condition_type if reward else 'points')
+    if condition_type not in REWARD_CONDITION_TYPES:
+        raise ValueError('Tipo de condição inválido')
+    
+    condition_value = data.get('condition_value', reward.condition_value if reward else None)
+    if condition_value is not None:
+        condition_value = int(condition_value)
+    
+    condition_activity_id = data.get('condition_activity_id', reward.condition_activity_id if reward else None)
+    if condition_type == 'activity':
+        if not condition_activity_id or not Activity.query.filter_by(id=condition_activity_id, user_id=user_id).first():
+            raise ValueError('Atividade da condição não encontrada')
+    else:
+        condition_activity_id = None
+    
+    if condition_type == 'streak' and not condition_value:
+        raise ValueError('Informe a sequência de semanas exigida')
+    
+    return condition_type, condition_value, condition_activity_id
+
 @app.route('/api/rewards', methods=['GET', 'POST'])
+@conditional_user_response
 def api_rewards():
     user_id = get_current_user_id()
     if not user_id:
@@ -883,16 +2529,29 @@ def api_rewards():
         except (ValueError, TypeError):
             points_required = 0
         
+        try:
+            condition_type, condition_value, condition_activity_id = parse_reward_condition(data, user_id)
+        except (TypeError, ValueError) as e:
+            return jsonify({'message': str(e)}), 400
+        if condition_type == 'points':
+            condition_value = points_required
+        
         reward = Reward(
             name=data['name'],
             description=data.get('description', ''),
             reward_type=data.get('reward_type', 'custom'),
             points_required=points_required,
-            condition_type='points',
-            condition_value=points_required,
+            condition_type=condition_type,
+            condition_value=condition_value,
+            condition_activity_id=condition_activity_id,
             user_id=user_id
         )
         db.session.add(reward)
+        if condition_type in REWARD_RULE_TYPES:
+            # A condição pode já estar satisfeita no momento da criação
+            enqueue_after_commit('evaluate_reward_rules_task', user_id=user_id,
+                                 activity_ids=[condition_activity_id] if condition_activity_id else [],
+                                 streak=condition_type == 'streak')
         db.session.commit()
         return jsonify({'id': reward.id, 'message': 'Recompensa criada com sucesso'})
     
@@ -932,6 +2591,16 @@ def api_reward(reward_id):
             reward.name = data['name']
         if 'description' in data:
             reward.description = data.get('description', '')
+        if {'condition_type', 'condition_value', 'condition_activity_id'} & set(data):
+            try:
+                reward.condition_type, reward.condition_value, reward.condition_activity_id = \
+                    parse_reward_condition(data, user_id, reward)
+            except (TypeError, ValueError) as e:
+                return jsonify({'message': str(e)}), 400
+            if reward.condition_type in REWARD_RULE_TYPES:
+                enqueue_after_commit('evaluate_reward_rules_task', user_id=user_id,
+                                     activity_ids=[reward.condition_activity_id] if reward.condition_activity_id else [],
+                                     streak=reward.condition_type == 'streak')
         if 'achieved' in data:
             reward.achieved = data['achieved']
             if data['achieved']:
@@ -954,36 +2623,66 @@ def api_purchase_reward(reward_id):
         return jsonify({'error': 'Usuário não autenticado'}), 401
     
     reward = Reward.query.filter_by(id=reward_id, user_id=user_id).first_or_404()
-    user_points = UserPoints.query.filter_by(user_id=user_id).first()
     
-    if not user_points:
-        user_points = UserPoints(user_id=user_id, points=0)
-        db.session.add(user_points)
-    
-    if user_points.points < reward.points_required:
+    remaining_points = apply_points_delta(user_id, -(reward.points_required or 0), f'Resgate: {reward.name}')
+    if remaining_points is None:
+        db.session.rollback()
         return jsonify({'message': 'Pontos insuficientes para resgatar esta recompensa'}), 400
     
-    user_points.points -= reward.points_required
-    user_points.last_updated = datetime.utcnow()
-    
     reward.achieved = True
     reward.achieved_at = datetime.utcnow()
-    
-    transaction = PointTransaction(
-        user_id=user_id,
-        points=-reward.points_required,
-        description=f'Resgate: {reward.name}'
-    )
-    db.session.add(transaction)
     db.session.commit()
     
     return jsonify({
         'message': 'Recompensa resgatada com sucesso!',
-        'remaining_points': user_points.points
+        'remaining_points': remaining_points
     })
 
 # ============ PONTOS ============
+def apply_points_delta(user_id, delta, description=None, activity_id=None):
+    # Saldo alterado no próprio UPDATE (points = points + delta), sem ler e regravar
+    # em Python. A condição no WHERE impede saldo negativo; devolve o novo saldo ou
+    # None se os pontos forem insuficientes. A transação do extrato entra no mesmo commit
+    now = datetime.utcnow()
+    statement = update(UserPoints).where(
+        UserPoints.user_id == user_id,
+        UserPoints.points + delta >= 0
+    ).values(
+        points=UserPoints.points + delta,
+        last_updated=now
+    ).execution_options(synchronize_session=False)
+    
+    if db.engine.dialect.update_returning:
+        new_balance = db.session.execute(statement.returning(UserPoints.points)).scalar()
+    else:
+        result = db.session.execute(statement)
+        new_balance = db.session.query(UserPoints.points).filter_by(user_id=user_id).scalar() if result.rowcount else None
+    
+    if new_balance is None:
+        if delta < 0 or db.session.query(UserPoints.id).filter_by(user_id=user_id).first():
+            return None
+        
+        try:
+            with db.session.begin_nested():
+                db.session.add(UserPoints(user_id=user_id, points=delta, last_updated=now))
+        except IntegrityError:
+            # Outra requisição criou o saldo ao mesmo tempo; aplica sobre ele
+            return apply_points_delta(user_id, delta, description, activity_id)
+        new_balance = delta
+    
+    if description is not None:
+        db.session.add(PointTransaction(
+            user_id=user_id,
+            points=delta,
+            description=description,
+            activity_id=activity_id
+        ))
+        enqueue_after_commit('compact_point_balances_task', durable=False, user_id=user_id)
+    
+    return new_balance
+
 @app.route('/api/points')
+@conditional_user_response
 def api_points():
     user_id = get_current_user_id()
     if not user_id:
@@ -1000,23 +2699,127 @@ def api_points():
         'last_updated': user_points.last_updated.isoformat() if user_points.last_updated else None
     })
 
+TRANSACTIONS_PAGE_SIZE = 50
+TRANSACTIONS_MAX_PAGE_SIZE = 500
+TRANSACTIONS_EXPORT_BATCH_SIZE = 1000
+TRANSACTION_EXPORT_FIELDS = ('id', 'points', 'description', 'activity_name', 'created_at')
+
+def encode_transaction_cursor(transaction):
+    raw = f"{transaction.created_at.isoformat()}|{transaction.id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_transaction_cursor(cursor):
+    # Lança ValueError para cursores malformados
+    raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+    created_at, transaction_id = raw.split('|')
+    return datetime.fromisoformat(created_at), int(transaction_id)
+
 @app.route('/api/points/transactions')
+@conditional_user_response
 def api_point_transactions():
+    # Paginação por chave (created_at, id) sobre idx_transaction_user_date: cada página
+    # custa o mesmo independentemente da profundidade. A próxima página vem em X-Next-Cursor
     user_id = get_current_user_id()
     if not user_id:
         return jsonify({'error': 'Usuário não autenticado'}), 401
     
-    transactions = PointTransaction.query.filter_by(
-        user_id=user_id
-    ).order_by(PointTransaction.created_at.desc()).limit(50).all()
+    limit = min(max(request.args.get('limit', TRANSACTIONS_PAGE_SIZE, type=int), 1), TRANSACTIONS_MAX_PAGE_SIZE)
     
-    return jsonify([{
+    query = PointTransaction.query.options(
+        joinedload(PointTransaction.activity)
+    ).filter_by(user_id=user_id)
+    
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            created_at, transaction_id = decode_transaction_cursor(cursor)
+        except ValueError:
+            return jsonify({'error': 'Cursor inválido'}), 400
+        query = query.filter(or_(
+            PointTransaction.created_at < created_at,
+            and_(PointTransaction.created_at == created_at, PointTransaction.id < transaction_id)
+        ))
+    
+    transactions = query.order_by(
+        PointTransaction.created_at.desc(),
+        PointTransaction.id.desc()
+    ).limit(limit + 1).all()
+    
+    has_more = len(transactions) > limit
+    transactions = transactions[:limit]
+    
+    response = jsonify([{
         'id': t.id,
         'points': t.points,
         'description': t.description,
         'activity_name': t.activity.name if t.activity else None,
         'created_at': t.created_at.isoformat()
     } for t in transactions])
+    if has_more:
+        response.headers['X-Next-Cursor'] = encode_transaction_cursor(transactions[-1])
+    return response
+
+@app.route('/api/points/transactions/export')
+def api_export_point_transactions():
+    # Extrato completo em ordem cronológica, gerado em streaming (NDJSON ou CSV):
+    # as linhas são lidas em lotes com yield_per e escritas à medida que chegam
+    user_id = get_current_user_id()
+    if not user_id:
+        return jsonify({'error': 'Usuário não autenticado'}), 401
+    
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in ('ndjson', 'csv'):
+        return jsonify({'error': 'Formato inválido (use ndjson ou csv)'}), 400
+    
+    statement = select(
+        PointTransaction.id,
+        PointTransaction.points,
+        PointTransaction.description,
+        Activity.name.label('activity_name'),
+        PointTransaction.created_at
+    ).outerjoin(
+        Activity, PointTransaction.activity_id == Activity.id
+    ).where(
+        PointTransaction.user_id == user_id
+    ).order_by(
+        PointTransaction.created_at,
+        PointTransaction.id
+    ).execution_options(yield_per=TRANSACTIONS_EXPORT_BATCH_SIZE)
+    
+    # O gerador roda depois que a requisição termina e não usa o contexto dela:
+    # tudo de que precisa é capturado aqui e a leitura usa uma sessão própria,
+    # fechada quando o streaming termina ou é interrompido
+    engine = db.engine
+    
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if export_format == 'csv':
+            writer.writerow(TRANSACTION_EXPORT_FIELDS)
+        
+        with Session(engine) as export_session:
+            for rows in export_session.execute(statement).partitions():
+                for row in rows:
+                    record = dict(row._mapping)
+                    record['created_at'] = record['created_at'].isoformat() if record['created_at'] else None
+                    if export_format == 'csv':
+                        writer.writerow([record[field] for field in TRANSACTION_EXPORT_FIELDS])
+                    else:
+                        buffer.write(json.dumps(record, ensure_ascii=False) + '\n')
+                
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        
+        if buffer.tell():
+            yield buffer.getvalue()
+    
+    mimetype = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+    return Response(
+        generate(),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename=extrato-pontos.{export_format}'}
+    )
 
 @app.route('/api/points/add', methods=['POST'])
 def api_add_points():
@@ -1024,75 +2827,348 @@ def api_add_points():
     if not user_id:
         return jsonify({'error': 'Usuário não autenticado'}), 401
     
-    data = request.get_json()
+    data = request.get_json() or {}
     points = data.get('points', 0)
     description = data.get('description', 'Pontos adicionados')
     
-    user_points = UserPoints.query.filter_by(user_id=user_id).first()
-    if not user_points:
-        user_points = UserPoints(user_id=user_id, points=0)
-        db.session.add(user_points)
+    # bool também é int em Python
+    if isinstance(points, bool) or not isinstance(points, int):
+        return jsonify({'message': 'O campo points deve ser um número inteiro'}), 400
     
-    user_points.points += points
-    user_points.last_updated = datetime.utcnow()
+    total_points = apply_points_delta(user_id, points, description)
+    if total_points is None:
+        db.session.rollback()
+        return jsonify({'message': 'Pontos insuficientes'}), 400
     
-    transaction = PointTransaction(
-        user_id=user_id,
-        points=points,
-        description=description
-    )
-    db.session.add(transaction)
     db.session.commit()
     
     return jsonify({
         'message': f'{points} pontos adicionados com sucesso!',
-        'total_points': user_points.points
+        'total_points': total_points
+    })
+
+# ============ SNAPSHOTS DE SALDO ============
+# O saldo em uma data é o snapshot mais próximo anterior a ela mais a cauda de
+# transações depois dele (no máximo um período se a compactação estiver em dia),
+# em vez da soma de todo o extrato
+def snapshot_period_end(day):
+    if app.config['POINT_SNAPSHOT_GRANULARITY'] == 'month':
+        next_month = (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+        return next_month - timedelta(days=1)
+    return day
+
+def day_start(day):
+    return datetime.combine(day, datetime.min.time())
+
+def get_daily_transaction_sums(user_id, start=None, end=None):
+    # {dia: soma dos pontos} para transações em [start, end], datas inclusivas
+    transaction_day = func.date(PointTransaction.created_at)
+    query = db.session.query(transaction_day, func.sum(PointTransaction.points)).filter(
+        PointTransaction.user_id == user_id
+    )
+    if start:
+        query = query.filter(PointTransaction.created_at >= day_start(start))
+    if end:
+        query = query.filter(PointTransaction.created_at < day_start(end + timedelta(days=1)))
+    
+    # SQLite devolve a data como texto
+    return {
+        day if isinstance(day, date) else date.fromisoformat(day): total or 0
+        for day, total in query.group_by(transaction_day).all()
+    }
+
+def get_balance_checkpoint(user_id, before):
+    # Último snapshot encerrado antes de `before`; devolve (fim do período, saldo)
+    snapshot = db.session.query(
+        PointBalanceSnapshot.period_end, PointBalanceSnapshot.balance
+    ).filter(
+        PointBalanceSnapshot.user_id == user_id,
+        PointBalanceSnapshot.period_end < before
+    ).order_by(PointBalanceSnapshot.period_end.desc()).first()
+    
+    if snapshot:
+        return snapshot.period_end, snapshot.balance
+    return None, 0
+
+def get_point_balance_series(user_id, start, end):
+    checkpoint_end, balance = get_balance_checkpoint(user_id, start)
+    tail_start = checkpoint_end + timedelta(days=1) if checkpoint_end else None
+    daily_sums = get_daily_transaction_sums(user_id, tail_start, end)
+    
+    # Dias entre o snapshot e o início da série entram no saldo inicial
+    balance += sum(total for day, total in daily_sums.items() if day < start)
+    
+    series = []
+    current = start
+    while current <= end:
+        balance += daily_sums.get(current, 0)
+        series.append({'date': current.isoformat(), 'balance': balance})
+        current += timedelta(days=1)
+    
+    return series, checkpoint_end
+
+def get_ledger_balance(user_id):
+    series, _ = get_point_balance_series(user_id, datetime.utcnow().date(), datetime.utcnow().date())
+    return series[-1]['balance']
+
+def compact_point_balances(user_id):
+    # Grava snapshots dos períodos encerrados desde o último; não faz commit
+    closed_until = datetime.utcnow().date() - timedelta(days=1)
+    checkpoint_end, balance = get_balance_checkpoint(user_id, closed_until + timedelta(days=1))
+    if checkpoint_end is not None and snapshot_period_end(checkpoint_end + timedelta(days=1)) > closed_until:
+        return 0
+    
+    start = checkpoint_end + timedelta(days=1) if checkpoint_end else None
+    periods = {}
+    for day, total in get_daily_transaction_sums(user_id, start, closed_until).items():
+        period_end = snapshot_period_end(day)
+        if period_end <= closed_until:
+            periods[period_end] = periods.get(period_end, 0) + total
+    
+    for period_end in sorted(periods):
+        balance += periods[period_end]
+        db.session.add(PointBalanceSnapshot(user_id=user_id, period_end=period_end, balance=balance))
+    
+    return len(periods)
+
+@background_task
+def compact_point_balances_task(user_id):
+    try:
+        compact_point_balances(user_id)
+        db.session.flush()
+    except IntegrityError:
+        # Outra tarefa compactou o mesmo período
+        db.session.rollback()
+
+def reconcile_point_balances(user_id=None):
+    # Compara UserPoints.points com a soma completa do extrato e com o saldo
+    # derivado dos snapshots; devolve as divergências encontradas
+    ledger_query = db.session.query(
+        PointTransaction.user_id, func.sum(PointTransaction.points)
+    ).group_by(PointTransaction.user_id)
+    points_query = db.session.query(UserPoints.user_id, UserPoints.points)
+    
+    if user_id is not None:
+        ledger_query = ledger_query.filter(PointTransaction.user_id == user_id)
+        points_query = points_query.filter(UserPoints.user_id == user_id)
+    
+    ledger = {owner_id: total or 0 for owner_id, total in ledger_query.all()}
+    stored = dict(points_query.all())
+    
+    mismatches = []
+    for owner_id in sorted(set(ledger) | set(stored)):
+        ledger_total = ledger.get(owner_id, 0)
+        snapshot_total = get_ledger_balance(owner_id)
+        if stored.get(owner_id, 0) == ledger_total == snapshot_total:
+            continue
+        mismatches.append({
+            'user_id': owner_id,
+            'user_points': stored.get(owner_id),
+            'ledger_total': ledger_total,
+            'snapshot_total': snapshot_total
+        })
+    
+    return mismatches
+
+@app.cli.command('compact-point-balances')
+@click.option('--user-id', type=int, default=None, help='Limita a compactação a um usuário')
+def compact_point_balances_command(user_id):
+    user_query = db.session.query(PointTransaction.user_id).distinct()
+    if user_id is not None:
+        user_query = user_query.filter(PointTransaction.user_id == user_id)
+    
+    total = sum(compact_point_balances(owner_id) for (owner_id,) in user_query.all())
+    db.session.commit()
+    click.echo(f"{total} snapshots de saldo gravados")
+
+@app.cli.command('reconcile-points')
+@click.option('--user-id', type=int, default=None, help='Limita a verificação a um usuário')
+def reconcile_points_command(user_id):
+    mismatches = reconcile_point_balances(user_id)
+    
+    for item in mismatches:
+        click.echo(
+            f"Usuário {item['user_id']}: saldo={item['user_points']}, "
+            f"extrato={item['ledger_total']}, snapshots={item['snapshot_total']}"
+        )
+    click.echo(f"{len(mismatches)} divergências encontradas")
+
+@app.route('/api/points/history')
+@conditional_user_response
+def api_points_history():
+    user_id = get_current_user_id()
+    if not user_id:
+        return jsonify({'error': 'Usuário não autenticado'}), 401
+    
+    days = min(max(request.args.get('days', 90, type=int), 1), 3660)
+    end = datetime.utcnow().date()
+    start = end - timedelta(days=days - 1)
+    
+    series, checkpoint_end = get_point_balance_series(user_id, start, end)
+    user_points = db.session.query(UserPoints.points).filter_by(user_id=user_id).scalar() or 0
+    ledger_balance = series[-1]['balance']
+    
+    return jsonify({
+        'series': series,
+        'checkpoint': checkpoint_end.isoformat() if checkpoint_end else None,
+        'current_balance': user_points,
+        'ledger_balance': ledger_balance,
+        'reconciled': user_points == ledger_balance
     })
 
 # ============ STREAK ============
-def calculate_streak_bonus(user_id):
+# A sequência é função determinística das datas de progresso vindas da agenda
+# (Progress.from_schedule): registros até 7 dias após o anterior somam uma semana,
+# lacunas maiores recomeçam a contagem. WeeklyStreak guarda o resultado, mantido
+# na transação de quem grava o progresso e reconstruível com `flask rebuild-streaks`
+STREAK_MAX_GAP_DAYS = 7
+
+def replay_streak(event_dates, count=0, last_date=None):
+    # Devolve {data: contagem após a data}, a contagem final e a última data,
+    # partindo opcionalmente de um estado já gravado
+    counts = {}
+    for event_date in sorted(set(event_dates)):
+        if last_date is None or (event_date - last_date).days > STREAK_MAX_GAP_DAYS:
+            count = 1
+        else:
+            count += 1
+        counts[event_date] = count
+        last_date = event_date
+    return counts, count, last_date
+
+def get_streak_event_dates(user_id):
+    return [row[0] for row in db.session.query(Progress.date).filter(
+        Progress.user_id == user_id,
+        Progress.from_schedule.is_(True)
+    ).distinct().all()]
+
+def get_or_create_weekly_streak(user_id):
     streak = WeeklyStreak.query.filter_by(user_id=user_id).first()
     if not streak:
         streak = WeeklyStreak(user_id=user_id, streak_count=0)
         db.session.add(streak)
+    return streak
+
+def record_streak_events(user_id, event_dates):
+    # Aplica novas datas da agenda à sequência sem commit; devolve {data: contagem}.
+    # Datas posteriores à última avançam o contador direto; datas retroativas
+    # (importações, correções) refazem a sequência a partir do histórico
+    event_dates = sorted(set(event_dates))
+    if not event_dates:
+        return {}
     
-    today = date.today()
-    last_activity = streak.last_activity_date
-    
-    if not last_activity or (today - last_activity).days > 7:
-        streak.streak_count = 1
-    elif (today - last_activity).days <= 7 and (today - last_activity).days >= 1:
-        streak.streak_count += 1
+    streak = get_or_create_weekly_streak(user_id)
+    last_date = streak.last_activity_date
     
-    streak.last_activity_date = today
-    db.session.commit()
+    if last_date is None or event_dates[0] > last_date:
+        counts, count, last_date = replay_streak(event_dates, streak.streak_count or 0, last_date)
+    elif event_dates == [last_date]:
+        return {last_date: streak.streak_count or 0}
+    else:
+        counts, count, last_date = replay_streak(get_streak_event_dates(user_id) + event_dates)
     
-    if streak.streak_count == 1:
+    streak.streak_count = count
+    streak.last_activity_date = last_date
+    return counts
+
+def streak_bonus_for(streak_count):
+    if streak_count == 1:
         return 1, "É um bom começo!"
-    elif streak.streak_count == 2:
+    elif streak_count == 2:
         return 2, "Você está indo bem!"
-    elif streak.streak_count == 3:
+    elif streak_count == 3:
         return 3, "Continue assim!"
-    elif streak.streak_count == 4:
+    elif streak_count == 4:
         return 4, "1 mês! Crescimento muito consistente!"
-    elif streak.streak_count >= 8:
+    elif streak_count >= 8:
         return 8, "Ninguém para você, sai da frente!"
-    elif streak.streak_count >= 5:
-        return streak.streak_count, f"{streak.streak_count} semanas! Impressionante!"
+    elif streak_count >= 5:
+        return streak_count, f"{streak_count} semanas! Impressionante!"
     else:
-        return streak.streak_count, f"{streak.streak_count} semanas consecutivas!"
+        return streak_count, f"{streak_count} semanas consecutivas!"
+
+def calculate_streak_bonus(user_id, event_date=None):
+    # Não faz commit: a sequência é gravada junto com o progresso que a originou
+    event_date = event_date or date.today()
+    counts = record_streak_events(user_id, [event_date])
+    return streak_bonus_for(counts[event_date])
+
+def rebuild_streaks(user_id=None, fix=True):
+    # Recalcula WeeklyStreak a partir de Progress e devolve as divergências encontradas
+    dates_query = db.session.query(Progress.user_id, Progress.date).filter(
+        Progress.from_schedule.is_(True)
+    ).distinct()
+    users_query = db.session.query(User.id)
+    streaks_query = WeeklyStreak.query
+    
+    if user_id is not None:
+        dates_query = dates_query.filter(Progress.user_id == user_id)
+        users_query = users_query.filter(User.id == user_id)
+        streaks_query = streaks_query.filter(WeeklyStreak.user_id == user_id)
+    
+    dates_by_user = {}
+    for owner_id, event_date in dates_query.all():
+        dates_by_user.setdefault(owner_id, []).append(event_date)
+    stored = {row.user_id: row for row in streaks_query.all()}
+    
+    mismatches = []
+    for (owner_id,) in users_query.all():
+        _, count, last_date = replay_streak(dates_by_user.get(owner_id, []))
+        row = stored.get(owner_id)
+        
+        if row and (row.streak_count or 0) == count and row.last_activity_date == last_date:
+            continue
+        if not row and count == 0:
+            continue
+        
+        mismatches.append({
+            'user_id': owner_id,
+            'stored_count': row.streak_count if row else None,
+            'expected_count': count,
+            'stored_last_date': row.last_activity_date.isoformat() if row and row.last_activity_date else None,
+            'expected_last_date': last_date.isoformat() if last_date else None
+        })
+        
+        if fix:
+            if not row:
+                row = WeeklyStreak(user_id=owner_id)
+                db.session.add(row)
+            row.streak_count = count
+            row.last_activity_date = last_date
+    
+    if fix:
+        db.session.commit()
+    
+    return mismatches
+
+@app.cli.command('rebuild-streaks')
+@click.option('--user-id', type=int, default=None, help='Limita a verificação a um usuário')
+@click.option('--verify-only', is_flag=True, help='Apenas relata divergências, sem corrigir')
+def rebuild_streaks_command(user_id, verify_only):
+    mismatches = rebuild_streaks(user_id=user_id, fix=not verify_only)
+    
+    for item in mismatches:
+        click.echo(
+            f"Usuário {item['user_id']}: armazenado={item['stored_count']} ({item['stored_last_date']}), "
+            f"esperado={item['expected_count']} ({item['expected_last_date']})"
+        )
+    
+    if verify_only:
+        click.echo(f"{len(mismatches)} divergências encontradas")
+    else:
+        click.echo(f"{len(mismatches)} sequências reconstruídas")
 
 @app.route('/api/streak')
+@conditional_user_response
 def api_streak():
     user_id = get_current_user_id()
     if not user_id:
         return jsonify({'error': 'Usuário não autenticado'}), 401
     
+    # Leitura pura do valor mantido na escrita do progresso
     streak = WeeklyStreak.query.filter_by(user_id=user_id).first()
-    if not streak:
-        streak = WeeklyStreak(user_id=user_id, streak_count=0)
-        db.session.add(streak)
-        db.session.commit()
+    streak_count = streak.streak_count if streak else 0
+    last_activity_date = streak.last_activity_date if streak else None
     
     messages = {
         1: "É um bom começo!",
@@ -1105,14 +3181,15 @@ def api_streak():
         8: "2 meses! Ninguém para você!"
     }
     
-    streak_message = messages.get(streak.streak_count, f"{streak.streak_count} semanas consecutivas!")
+    streak_message = messages.get(streak_count, f"{streak_count} semanas consecutivas!")
     
     return jsonify({
-        'streak_count': streak.streak_count,
-        'last_activity_date': streak.last_activity_date.isoformat() if streak.last_activity_date else None,
+        'streak_count': streak_count,
+        'last_activity_date': last_activity_date.isoformat() if last_activity_date else None,
         'message': streak_message
     })
 
+@request_memoized
 def get_current_streak(user_id):
     try:
         streak_record = WeeklyStreak.query.filter_by(user_id=user_id).first()
@@ -1138,10 +3215,523 @@ def get_current_streak(user_id):
             
     except Exception as e:
         print(f"Erro em get_current_streak: {str(e)}")
+        skip_response_cache()
         return 0
 
+# ============ ESTATÍSTICAS DIÁRIAS ============
+DAILY_STATS_FIELDS = ('progress_count', 'completed_count', 'points', 'scheduled_count', 'scheduled_minutes')
+# Campos do agregado para os quais as ocorrências virtuais das repetições contam
+RECURRENCE_STATS_FIELDS = ('scheduled_count', 'scheduled_minutes')
+
+def daily_stats_rows(user_id, deltas):
+    return [
+        {'user_id': user_id, 'day': day, 'category_id': category_id,
+         **{field: int(fields.get(field, 0)) for field in DAILY_STATS_FIELDS}}
+        for (day, category_id), fields in deltas.items()
+        if any(fields.values())
+    ]
+
+def apply_daily_stats_deltas(user_id, deltas):
+    # deltas: {(dia, category_id): {'progress_count': 1, 'points': 10, ...}}
+    # INSERT ... ON CONFLICT DO UPDATE SET campo = campo + excluded.campo: duas escritas
+    # no mesmo dia novo não colidem na restrição única e nenhum incremento se perde
+    rows = daily_stats_rows(user_id, deltas)
+    if not rows:
+        return
+    
+    statement = dialect_insert(DailyStatsRollup)
+    statement = statement.on_conflict_do_update(
+        index_elements=[DailyStatsRollup.user_id, DailyStatsRollup.day, DailyStatsRollup.category_id],
+        set_={
+            field: getattr(DailyStatsRollup, field) + getattr(statement.excluded, field)
+            for field in DAILY_STATS_FIELDS
+        }
+    )
+    db.session.execute(statement, rows)
+
+# Campos do agregado por dia da semana e hora dos agendamentos
+SCHEDULE_TIME_FIELDS = ('scheduled_count', 'scheduled_minutes')
+
+def schedule_hour(scheduled_time):
+    # Hora antes do primeiro ':' de scheduled_time; -1 quando ausente ou mal formada
+    try:
+        hour = int((scheduled_time or '').split(':', 1)[0])
+    except ValueError:
+        return -1
+    return hour if 0 <= hour < 24 else -1
+
+def schedule_time_rows(user_id, deltas):
+    return [
+        {'user_id': user_id, 'category_id': category_id, 'weekday': weekday, 'hour': hour,
+         **{field: int(fields.get(field, 0)) for field in SCHEDULE_TIME_FIELDS}}
+        for (category_id, weekday, hour), fields in deltas.items()
+        if any(fields.values())
+    ]
+
+def apply_schedule_time_deltas(user_id, deltas):
+    # deltas: {(category_id, dia da semana, hora): {'scheduled_count': 1, 'scheduled_minutes': 30}}
+    # Mesmo upsert com soma do agregado diário
+    rows = schedule_time_rows(user_id, deltas)
+    if not rows:
+        return
+    
+    statement = dialect_insert(ScheduleTimeRollup)
+    statement = statement.on_conflict_do_update(
+        index_elements=[ScheduleTimeRollup.user_id, ScheduleTimeRollup.category_id,
+                        ScheduleTimeRollup.weekday, ScheduleTimeRollup.hour],
+        set_={
+            field: getattr(ScheduleTimeRollup, field) + getattr(statement.excluded, field)
+            for field in SCHEDULE_TIME_FIELDS
+        }
+    )
+    db.session.execute(statement, rows)
+
+def apply_schedule_stats(user_id, added=(), removed=()):
+    # Agendamentos criados e removidos, como (dia, horário, category_id, duração): o agregado
+    # diário e o de horários mudam na mesma transação que grava os agendamentos
+    daily_deltas, time_deltas = {}, {}
+    for sign, schedules in ((1, added), (-1, removed)):
+        for day, scheduled_time, category_id, duration in schedules:
+            for deltas, key in ((daily_deltas, (day, category_id)),
+                                (time_deltas, (category_id, day.weekday(), schedule_hour(scheduled_time)))):
+                fields = deltas.setdefault(key, dict.fromkeys(SCHEDULE_TIME_FIELDS, 0))
+                fields['scheduled_count'] += sign
+                fields['scheduled_minutes'] += sign * int(duration or 0)
+    
+    apply_daily_stats_deltas(user_id, daily_deltas)
+    apply_schedule_time_deltas(user_id, time_deltas)
+
+def compute_schedule_time_stats(user_id, activity_id=None):
+    # Agrupado por horário em texto; a hora é extraída no Python como em schedule_hour
+    weekday = sql_weekday(ScheduledActivity.scheduled_date)
+    query = db.session.query(
+        Activity.category_id,
+        weekday,
+        ScheduledActivity.scheduled_time,
+        func.count(ScheduledActivity.id),
+        func.coalesce(func.sum(ScheduledActivity.duration), 0)
+    ).join(Activity, Activity.id == ScheduledActivity.activity_id
+    ).filter(ScheduledActivity.user_id == user_id)
+    
+    if activity_id:
+        query = query.filter(ScheduledActivity.activity_id == activity_id)
+    
+    stats = {}
+    for category_id, day, scheduled_time, count, minutes in query.group_by(
+        Activity.category_id, weekday, ScheduledActivity.scheduled_time
+    ).all():
+        fields = stats.setdefault((category_id, int(day), schedule_hour(scheduled_time)), dict.fromkeys(SCHEDULE_TIME_FIELDS, 0))
+        fields['scheduled_count'] += count
+        fields['scheduled_minutes'] += int(minutes or 0)
+    
+    return stats
+
+def compute_daily_stats(user_id):
+    expected = {}
+    
+    def bucket(day, category_id):
+        return expected.setdefault((day, category_id), dict.fromkeys(DAILY_STATS_FIELDS, 0))
+    
+    progress_rows = db.session.query(
+        Progress.date,
+        Activity.category_id,
+        func.count(Progress.id),
+        func.sum(case((Progress.completed == True, 1), else_=0)),
+        func.coalesce(func.sum(Progress.points_earned), 0)
+    ).join(Activity, Activity.id == Progress.activity_id
+    ).filter(Progress.user_id == user_id
+    ).group_by(Progress.date, Activity.category_id).all()
+    
+    for day, category_id, count, completed, points in progress_rows:
+        fields = bucket(day, category_id)
+        fields['progress_count'] = count
+        fields['completed_count'] = int(completed or 0)
+        fields['points'] = int(points or 0)
+    
+    schedule_rows = db.session.query(
+        ScheduledActivity.scheduled_date,
+        Activity.category_id,
+        func.count(ScheduledActivity.id),
+        func.coalesce(func.sum(ScheduledActivity.duration), 0)
+    ).join(Activity, Activity.id == ScheduledActivity.activity_id
+    ).filter(ScheduledActivity.user_id == user_id
+    ).group_by(ScheduledActivity.scheduled_date, Activity.category_id).all()
+    
+    for day, category_id, count, minutes in schedule_rows:
+        fields = bucket(day, category_id)
+        fields['scheduled_count'] = count
+        fields['scheduled_minutes'] = int(minutes or 0)
+    
+    return expected
+
+def rebuild_daily_stats(user_id, fix=True):
+    # Recalcula o agregado do usuário a partir de Progress e ScheduledActivity.
+    # Não faz commit: quem chama decide o fim da transação
+    expected = compute_daily_stats(user_id)
+    stored = {
+        (row.day, row.category_id): row
+        for row in DailyStatsRollup.query.filter_by(user_id=user_id).all()
+    }
+    
+    mismatches = []
+    for key in set(expected) | set(stored):
+        fields = expected.get(key, dict.fromkeys(DAILY_STATS_FIELDS, 0))
+        row = stored.get(key)
+        current = {field: getattr(row, field) for field in DAILY_STATS_FIELDS} if row else dict.fromkeys(DAILY_STATS_FIELDS, 0)
+        
+        if current == fields and (row or not any(fields.values())):
+            continue
+        
+        mismatches.append({
+            'day': key[0].isoformat(),
+            'category_id': key[1],
+            'stored': current if row else None,
+            'expected': fields
+        })
+        
+        if fix:
+            if not row:
+                row = DailyStatsRollup(user_id=user_id, day=key[0], category_id=key[1])
+                db.session.add(row)
+            for field, value in fields.items():
+                setattr(row, field, value)
+    
+    return mismatches
+
+def rebuild_schedule_time_stats(user_id, fix=True):
+    # Recalcula o agregado de horários a partir de ScheduledActivity. Não faz commit
+    expected = compute_schedule_time_stats(user_id)
+    stored = {
+        (row.category_id, row.weekday, row.hour): row
+        for row in ScheduleTimeRollup.query.filter_by(user_id=user_id).all()
+    }
+    
+    mismatches = []
+    for key in set(expected) | set(stored):
+        fields = expected.get(key, dict.fromkeys(SCHEDULE_TIME_FIELDS, 0))
+        row = stored.get(key)
+        current = {field: getattr(row, field) for field in SCHEDULE_TIME_FIELDS} if row else dict.fromkeys(SCHEDULE_TIME_FIELDS, 0)
+        
+        if current == fields:
+            continue
+        
+        mismatches.append({
+            'category_id': key[0],
+            'weekday': key[1],
+            'hour': key[2],
+            'stored': current if row else None,
+            'expected': fields
+        })
+        
+        if fix:
+            if not row:
+                row = ScheduleTimeRollup(user_id=user_id, category_id=key[0], weekday=key[1], hour=key[2])
+                db.session.add(row)
+            for field, value in fields.items():
+                setattr(row, field, value)
+    
+    return mismatches
+
+def backfill_daily_stats(user_id):
+    # Carga inicial do agregado em sessão própria, confirmada à parte: a sessão da
+    # requisição não é confirmada no meio de uma leitura. Linhas já criadas por outra
+    # requisição ao mesmo tempo são mantidas
+    rows = daily_stats_rows(user_id, compute_daily_stats(user_id))
+    if not rows:
+        return
+    
+    statement = dialect_insert(DailyStatsRollup).on_conflict_do_nothing(
+        index_elements=[DailyStatsRollup.user_id, DailyStatsRollup.day, DailyStatsRollup.category_id]
+    )
+    with Session(db.engine) as backfill_session:
+        backfill_session.execute(statement, rows)
+        backfill_session.commit()
+
+def backfill_schedule_time_stats(user_id):
+    # Carga inicial do agregado de horários, nos mesmos moldes de backfill_daily_stats
+    rows = schedule_time_rows(user_id, compute_schedule_time_stats(user_id))
+    if not rows:
+        return
+    
+    statement = dialect_insert(ScheduleTimeRollup).on_conflict_do_nothing(
+        index_elements=[ScheduleTimeRollup.user_id, ScheduleTimeRollup.category_id,
+                        ScheduleTimeRollup.weekday, ScheduleTimeRollup.hour]
+    )
+    with Session(db.engine) as backfill_session:
+        backfill_session.execute(statement, rows)
+        backfill_session.commit()
+
+def ensure_daily_stats(user_id):
+    # Usuários com histórico anterior aos agregados (diário e de horários) recebem a
+    # carga inicial antes da primeira escrita incremental ou leitura
+    if g.get('daily_stats_ready') == user_id:
+        return
+    
+    has_rollup = db.session.query(DailyStatsRollup.id).filter_by(user_id=user_id).first()
+    if not has_rollup:
+        has_history = (
+            db.session.query(Progress.id).filter_by(user_id=user_id).first() or
+            db.session.query(ScheduledActivity.id).filter_by(user_id=user_id).first()
+        )
+        if has_history:
+            backfill_daily_stats(user_id)
+    
+    has_time_rollup = db.session.query(ScheduleTimeRollup.id).filter_by(user_id=user_id).first()
+    if not has_time_rollup and db.session.query(ScheduledActivity.id).filter_by(user_id=user_id).first():
+        backfill_schedule_time_stats(user_id)
+    
+    g.daily_stats_ready = user_id
+
+def remove_activity_daily_stats(activity):
+    # Subtrai do agregado tudo o que a atividade contribuiu antes de excluí-la
+    deltas = {}
+    
+    for day, count, completed, points in db.session.query(
+        Progress.date,
+        func.count(Progress.id),
+        func.sum(case((Progress.completed == True, 1), else_=0)),
+        func.coalesce(func.sum(Progress.points_earned), 0)
+    ).filter(Progress.activity_id == activity.id).group_by(Progress.date).all():
+        fields = deltas.setdefault((day, activity.category_id), {})
+        fields['progress_count'] = -count
+        fields['completed_count'] = -int(completed or 0)
+        fields['points'] = -int(points or 0)
+    
+    for day, count, minutes in db.session.query(
+        ScheduledActivity.scheduled_date,
+        func.count(ScheduledActivity.id),
+        func.coalesce(func.sum(ScheduledActivity.duration), 0)
+    ).filter(ScheduledActivity.activity_id == activity.id).group_by(ScheduledActivity.scheduled_date).all():
+        fields = deltas.setdefault((day, activity.category_id), {})
+        fields['scheduled_count'] = -count
+        fields['scheduled_minutes'] = -int(minutes or 0)
+    
+    apply_daily_stats_deltas(activity.user_id, deltas)
+    apply_schedule_time_deltas(activity.user_id, {
+        key: {field: -value for field, value in fields.items()}
+        for key, fields in compute_schedule_time_stats(activity.user_id, activity.id).items()
+    })
+
+def sum_daily_stats(user_id, start_date=None, end_date=None):
+    query = db.session.query(
+        *[func.coalesce(func.sum(getattr(DailyStatsRollup, field)), 0) for field in DAILY_STATS_FIELDS]
+    ).filter(DailyStatsRollup.user_id == user_id)
+    
+    if start_date:
+        query = query.filter(DailyStatsRollup.day >= start_date)
+    if end_date:
+        query = query.filter(DailyStatsRollup.day <= end_date)
+    
+    totals = dict(zip(DAILY_STATS_FIELDS, (int(value or 0) for value in query.one())))
+    for fields in recurrence_daily_stats(user_id, start_date, end_date).values():
+        for field, value in fields.items():
+            totals[field] += value
+    return totals
+
+def get_daily_stats_series(user_id, start_date, end_date=None):
+    # Totais por dia (somando categorias) no intervalo, em uma consulta
+    query = db.session.query(
+        DailyStatsRollup.day,
+        *[func.sum(getattr(DailyStatsRollup, field)) for field in DAILY_STATS_FIELDS]
+    ).filter(
+        DailyStatsRollup.user_id == user_id,
+        DailyStatsRollup.day >= start_date
+    )
+    
+    if end_date:
+        query = query.filter(DailyStatsRollup.day <= end_date)
+    
+    rows = query.group_by(DailyStatsRollup.day).all()
+    
+    series = {row[0]: dict(zip(DAILY_STATS_FIELDS, (int(value or 0) for value in row[1:]))) for row in rows}
+    for (day, _), fields in recurrence_daily_stats(user_id, start_date, end_date).items():
+        totals = series.setdefault(day, dict.fromkeys(DAILY_STATS_FIELDS, 0))
+        for field, value in fields.items():
+            totals[field] += value
+    return series
+
+def count_active_days(user_id, field, start_date=None, end_date=None):
+    query = db.session.query(func.count(func.distinct(DailyStatsRollup.day))).filter(
+        DailyStatsRollup.user_id == user_id,
+        getattr(DailyStatsRollup, field) > 0
+    )
+    
+    if start_date:
+        query = query.filter(DailyStatsRollup.day >= start_date)
+    if end_date:
+        query = query.filter(DailyStatsRollup.day <= end_date)
+    
+    if field not in RECURRENCE_STATS_FIELDS:
+        return query.scalar() or 0
+    
+    days = {day for (day,) in query.with_entities(DailyStatsRollup.day).distinct().all()}
+    days.update(day for (day, _), fields in recurrence_daily_stats(user_id, start_date, end_date).items() if fields[field] > 0)
+    return len(days)
+
+# Medidas do rollup por categoria: coluna somada e coluna que indica presença no período
+CATEGORY_ROLLUP_MEASURES = {
+    'minutes': ('scheduled_minutes', 'scheduled_count'),
+    'schedules': ('scheduled_count', 'scheduled_count'),
+    'progress': ('progress_count', 'progress_count'),
+    'activities': None
+}
+
+def period_condition(column, start_date, end_date):
+    conditions = []
+    if start_date:
+        conditions.append(column >= start_date)
+    if end_date:
+        conditions.append(column <= end_date)
+    return and_(*conditions) if conditions else None
+
+def period_sum(condition, value):
+    return func.coalesce(func.sum(case((condition, value), else_=0) if condition is not None else value), 0)
+
+def get_category_rollup(user_id, periods, measure='minutes'):
+    # Totais por categoria em vários intervalos de uma vez: um SUM condicional por período
+    # no mesmo GROUP BY. periods: {nome: (início, fim)}, com None para limite aberto.
+    # 'activities' conta atividades pela data de criação; as demais medidas vêm do
+    # agregado diário. Cada item traz {nome: {'value', 'count'}} com count > 0 em
+    # pelo menos um período; a ordem é a do id da categoria, ou da primeira atividade
+    if measure not in CATEGORY_ROLLUP_MEASURES:
+        raise ValueError(f'Medida inválida: {measure}')
+    
+    columns = []
+    if measure == 'activities':
+        for start_date, end_date in periods.values():
+            condition = period_condition(
+                Activity.created_at,
+                datetime.combine(start_date, datetime.min.time()) if start_date else None,
+                datetime.combine(end_date, datetime.max.time()) if end_date else None
+            )
+            count = period_sum(condition, 1)
+            columns += [count, count]
+        
+        rows = db.session.query(
+            Category.id, Category.name, Category.color, *columns
+        ).join(Activity, Activity.category_id == Category.id
+        ).filter(Activity.user_id == user_id
+        ).group_by(Category.id, Category.name, Category.color
+        ).order_by(func.min(Activity.id)).all()
+    else:
+        value_field, count_field = CATEGORY_ROLLUP_MEASURES[measure]
+        for start_date, end_date in periods.values():
+            condition = period_condition(DailyStatsRollup.day, start_date, end_date)
+            columns += [period_sum(condition, getattr(DailyStatsRollup, value_field)),
+                        period_sum(condition, getattr(DailyStatsRollup, count_field))]
+        
+        query = db.session.query(
+            Category.id, Category.name, Category.color, *columns
+        ).join(DailyStatsRollup, Category.id == DailyStatsRollup.category_id
+        ).filter(DailyStatsRollup.user_id == user_id)
+        
+        # Só as linhas que caem em algum dos períodos
+        starts = [start_date for start_date, _ in periods.values()]
+        ends = [end_date for _, end_date in periods.values()]
+        if all(starts):
+            query = query.filter(DailyStatsRollup.day >= min(starts))
+        if all(ends):
+            query = query.filter(DailyStatsRollup.day <= max(ends))
+        
+        rows = query.group_by(Category.id, Category.name, Category.color).order_by(Category.id).all()
+        rows = merge_recurrence_category_rollup(user_id, rows, periods, value_field, count_field)
+    
+    rollup = []
+    for row in rows:
+        totals = {
+            name: {'value': int(row[3 + 2 * index] or 0), 'count': int(row[4 + 2 * index] or 0)}
+            for index, name in enumerate(periods)
+        }
+        if any(total['count'] > 0 for total in totals.values()):
+            rollup.append({'category_id': row[0], 'name': row[1], 'color': row[2], 'periods': totals})
+    
+    return rollup
+
+def merge_recurrence_category_rollup(user_id, rows, periods, value_field, count_field):
+    # Soma as ocorrências virtuais às linhas (id, nome, cor, valor, contagem, ...) do
+    # rollup por categoria; categorias que só têm ocorrências virtuais entram também
+    starts = [start_date for start_date, _ in periods.values()]
+    ends = [end_date for _, end_date in periods.values()]
+    virtual = recurrence_daily_stats(user_id, min(starts) if all(starts) else None, max(ends) if all(ends) else None)
+    if not virtual:
+        return rows
+    
+    merged = {row[0]: list(row) for row in rows}
+    missing = {category_id for _, category_id in virtual} - set(merged)
+    if missing:
+        for category in Category.query.filter(Category.id.in_(missing)).all():
+            merged[category.id] = [category.id, category.name, category.color] + [0] * (2 * len(periods))
+    
+    for (day, category_id), fields in virtual.items():
+        row = merged.get(category_id)
+        if row is None:
+            continue
+        for index, (start_date, end_date) in enumerate(periods.values()):
+            if (start_date is None or day >= start_date) and (end_date is None or day <= end_date):
+                row[3 + 2 * index] = (row[3 + 2 * index] or 0) + fields[value_field]
+                row[4 + 2 * index] = (row[4 + 2 * index] or 0) + fields[count_field]
+    
+    return [merged[category_id] for category_id in sorted(merged)]
+
+def get_category_time(user_id):
+    # Minutos agendados por categoria em todo o histórico
+    return [
+        {'name': item['name'], 'color': item['color'], 'total_minutes': item['periods']['all']['value']}
+        for item in get_category_rollup(user_id, {'all': (None, None)})
+    ]
+
+def get_schedule_priority_metrics(user_id, today=None):
+    today = today or date.today()
+    week_start = today - timedelta(days=today.weekday())
+    month_start = date(today.year, today.month, 1)
+    
+    today_count, week_count, month_count = db.session.query(
+        func.sum(case((DailyStatsRollup.day == today, DailyStatsRollup.scheduled_count), else_=0)),
+        func.sum(case((DailyStatsRollup.day >= week_start, DailyStatsRollup.scheduled_count), else_=0)),
+        func.sum(case((DailyStatsRollup.day >= month_start, DailyStatsRollup.scheduled_count), else_=0))
+    ).filter(
+        DailyStatsRollup.user_id == user_id,
+        DailyStatsRollup.day >= min(week_start, month_start),
+        DailyStatsRollup.day <= today
+    ).one()
+    
+    counts = {'today': int(today_count or 0), 'week': int(week_count or 0), 'month': int(month_count or 0)}
+    for (day, _), fields in recurrence_daily_stats(user_id, min(week_start, month_start), today).items():
+        counts['today'] += fields['scheduled_count'] if day == today else 0
+        counts['week'] += fields['scheduled_count'] if day >= week_start else 0
+        counts['month'] += fields['scheduled_count'] if day >= month_start else 0
+    return counts
+
+@app.cli.command('rebuild-daily-stats')
+@click.option('--user-id', type=int, default=None, help='Limita a reconstrução a um usuário')
+@click.option('--verify-only', is_flag=True, help='Apenas relata divergências, sem corrigir')
+def rebuild_daily_stats_command(user_id, verify_only):
+    user_ids = [user_id] if user_id is not None else [uid for (uid,) in db.session.query(User.id).all()]
+    
+    total = 0
+    for uid in user_ids:
+        mismatches = rebuild_daily_stats(uid, fix=not verify_only)
+        for item in mismatches:
+            click.echo(f"Usuário {uid} {item['day']} categoria {item['category_id']}: "
+                       f"armazenado={item['stored']}, esperado={item['expected']}")
+        total += len(mismatches)
+        
+        mismatches = rebuild_schedule_time_stats(uid, fix=not verify_only)
+        for item in mismatches:
+            click.echo(f"Usuário {uid} horários {WEEKDAY_NAMES[item['weekday']]} {item['hour']}h categoria {item['category_id']}: "
+                       f"armazenado={item['stored']}, esperado={item['expected']}")
+        total += len(mismatches)
+    
+    if verify_only:
+        click.echo(f"{total} divergências encontradas")
+    else:
+        db.session.commit()
+        click.echo(f"{total} linhas reconstruídas")
+
 # ============ DASHBOARD ============
 @app.route('/api/dashboard/stats')
+@conditional_user_response
+@user_cached_response()
 def api_dashboard_stats():
     user_id = get_current_user_id()
     if not user_id:
@@ -1166,67 +3756,30 @@ def api_dashboard_stats():
 
 # ============ PERFIL ============
 @app.route('/api/profile/stats')
+@conditional_user_response
+@user_cached_response()
 def api_profile_stats():
     try:
         user_id = get_current_user_id()
         if not user_id:
             return jsonify({'error': 'Usuário não autenticado'}), 401
         
-        category_hours = db.session.query(
-            Category.name,
-            Category.color,
-            func.sum(ScheduledActivity.duration).label('total_minutes')
-        ).join(Activity, Category.id == Activity.category_id
-        ).join(ScheduledActivity, Activity.id == ScheduledActivity.activity_id
-        ).filter(ScheduledActivity.user_id == user_id
-        ).group_by(Category.id).all()
+        ensure_daily_stats(user_id)
+        
+        category_hours = get_category_time(user_id)
         
         category_time = [{
-            'category': cat.name,
-            'color': cat.color,
-            'hours': round(cat.total_minutes / 60, 1) if cat.total_minutes else 0
+            'category': cat['name'],
+            'color': cat['color'],
+            'hours': round(cat['total_minutes'] / 60, 1) if cat['total_minutes'] else 0
         } for cat in category_hours]
         
-        completed_activities = Activity.query.filter_by(
-            user_id=user_id, 
-            status='completed'
-        ).all()
-        
-        avg_completion_times = []
-        for activity in completed_activities:
-            progress_entries = Progress.query.filter_by(
-                activity_id=activity.id
-            ).order_by(Progress.date.asc()).all()
-            
-            if len(progress_entries) >= 2:
-                start_date = progress_entries[0].date
-                end_date = progress_entries[-1].date
-                days_to_complete = (end_date - start_date).days
-                if days_to_complete > 0:
-                    avg_completion_times.append(days_to_complete)
-        
-        avg_days = sum(avg_completion_times) / len(avg_completion_times) if avg_completion_times else 0
+        completion_days = get_completion_days(user_id)
+        completion_times = completion_durations(completion_days)
+        avg_days = analytics.mean(completion_times) if len(completion_times) else 0
         
         today = date.today()
-        week_start = today - timedelta(days=today.weekday())
-        month_start = date(today.year, today.month, 1)
-        
-        today_schedules = ScheduledActivity.query.filter(
-            ScheduledActivity.user_id == user_id,
-            ScheduledActivity.scheduled_date == today
-        ).count()
-        
-        week_schedules = ScheduledActivity.query.filter(
-            ScheduledActivity.user_id == user_id,
-            ScheduledActivity.scheduled_date >= week_start,
-            ScheduledActivity.scheduled_date <= today
-        ).count()
-        
-        month_schedules = ScheduledActivity.query.filter(
-            ScheduledActivity.user_id == user_id,
-            ScheduledActivity.scheduled_date >= month_start,
-            ScheduledActivity.scheduled_date <= today
-        ).count()
+        priority_metrics = get_schedule_priority_metrics(user_id, today)
         
         status_counts = db.session.query(
             Activity.status,
@@ -1237,13 +3790,9 @@ def api_profile_stats():
         
         return jsonify({
             'category_time': category_time,
-            'total_completed': len(completed_activities),
+            'total_completed': len(completion_days),
             'avg_completion_days': round(avg_days, 1),
-            'priority_metrics': {
-                'today': today_schedules,
-                'week': week_schedules,
-                'month': month_schedules
-            },
+            'priority_metrics': priority_metrics,
             'status_distribution': status_distribution,
             'total_activities': sum(status_distribution.values()),
             'productivity_score': calculate_productivity_score(user_id)
@@ -1253,6 +3802,63 @@ def api_profile_stats():
         print(f"Erro ao carregar estatísticas do perfil: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@request_memoized
+def get_completion_days(user_id):
+    # Um grupo por atividade concluída com a primeira e a última data de progresso,
+    # em uma consulta só, qualquer que seja o número de atividades concluídas.
+    # Retorna [(categoria, dias)], com dias = None quando não houve intervalo
+    rows = db.session.query(
+        Category.name,
+        func.min(Progress.date),
+        func.max(Progress.date)
+    ).select_from(Activity
+    ).outerjoin(Progress, Progress.activity_id == Activity.id
+    ).outerjoin(Category, Category.id == Activity.category_id
+    ).filter(
+        Activity.user_id == user_id,
+        Activity.status == 'completed'
+    ).group_by(Activity.id, Category.name).order_by(Activity.id).all()
+    
+    completion_days = []
+    for category_name, first_date, last_date in rows:
+        days = (last_date - first_date).days if first_date and last_date else 0
+        completion_days.append((category_name, days if days > 0 else None))
+    
+    return completion_days
+
+def completion_durations(completion_days):
+    return analytics.as_series((days for _, days in completion_days if days is not None), integer=True)
+
+@app.route('/api/profile/completion_times')
+@conditional_user_response
+@user_cached_response()
+def api_profile_completion_times():
+    try:
+        user_id = get_current_user_id()
+        if not user_id:
+            return jsonify({'error': 'Usuário não autenticado'}), 401
+        
+        completion_days = get_completion_days(user_id)
+        
+        by_category = {}
+        for category_name, days in completion_days:
+            if days is not None:
+                by_category.setdefault(category_name, []).append(days)
+        
+        return jsonify({
+            'total_completed': len(completion_days),
+            'overall': analytics.distribution(completion_durations(completion_days)),
+            'by_category': [
+                {'category': category_name, **analytics.distribution(analytics.as_series(days, integer=True))}
+                for category_name, days in by_category.items()
+            ]
+        })
+        
+    except Exception as e:
+        print(f"Erro em api_profile_completion_times: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@request_memoized
 def calculate_productivity_score(user_id):
     try:
         total_activities = Activity.query.filter_by(user_id=user_id).count()
@@ -1265,10 +3871,7 @@ def calculate_productivity_score(user_id):
         completion_score = min(completion_ratio, 100) * 0.4
         
         thirty_days_ago = date.today() - timedelta(days=30)
-        recent_activities = Progress.query.filter(
-            Progress.user_id == user_id,
-            Progress.date >= thirty_days_ago
-        ).count()
+        recent_activities = sum_daily_stats(user_id, start_date=thirty_days_ago)['progress_count']
         
         consistency_ratio = min(recent_activities / 20, 1)
         consistency_score = consistency_ratio * 100 * 0.3
@@ -1285,28 +3888,27 @@ def calculate_productivity_score(user_id):
         
     except Exception as e:
         print(f"Erro em calculate_productivity_score: {str(e)}")
+        skip_response_cache()
         return 0
 
+@request_memoized
 def calculate_consistency_score(user_id):
     try:
         thirty_days_ago = date.today() - timedelta(days=30)
         
-        active_days = db.session.query(
-            func.count(func.distinct(Progress.date))
-        ).filter(
-            Progress.user_id == user_id,
-            Progress.date >= thirty_days_ago
-        ).scalar() or 0
+        # Uma série diária do rollup para as duas contagens de dias ativos
+        daily_series = list(get_daily_stats_series(user_id, thirty_days_ago).values())
+        
+        active_days = analytics.count_positive(
+            analytics.as_series((day['progress_count'] for day in daily_series), integer=True)
+        )
         
         total_days = 30
         activity_consistency = (active_days / total_days) * 100 * 0.7
         
-        scheduled_days = db.session.query(
-            func.count(func.distinct(ScheduledActivity.scheduled_date))
-        ).filter(
-            ScheduledActivity.user_id == user_id,
-            ScheduledActivity.scheduled_date >= thirty_days_ago
-        ).scalar() or 0
+        scheduled_days = analytics.count_positive(
+            analytics.as_series((day['scheduled_count'] for day in daily_series), integer=True)
+        )
         
         schedule_consistency = (scheduled_days / total_days) * 100 * 0.3
         
@@ -1316,6 +3918,7 @@ def calculate_consistency_score(user_id):
         
     except Exception as e:
         print(f"Erro em calculate_consistency_score: {str(e)}")
+        skip_response_cache()
         return 0
 
 def get_fallback_profile_data(user_id):
@@ -1357,63 +3960,22 @@ def get_fallback_profile_data(user_id):
 
 def get_profile_stats(user_id):
     try:
-        category_hours = db.session.query(
-            Category.name,
-            Category.color,
-            func.sum(ScheduledActivity.duration).label('total_minutes')
-        ).join(Activity, Category.id == Activity.category_id
-        ).join(ScheduledActivity, Activity.id == ScheduledActivity.activity_id
-        ).filter(ScheduledActivity.user_id == user_id
-        ).group_by(Category.id).all()
+        category_hours = get_category_time(user_id)
         
         category_time = [{
-            'category': cat.name,
-            'color': cat.color,
-            'hours': round(cat.total_minutes / 60, 1) if cat.total_minutes else 0
+            'category': cat['name'],
+            'color': cat['color'],
+            'hours': round(cat['total_minutes'] / 60, 1) if cat['total_minutes'] else 0
         } for cat in category_hours]
         
-        completed_activities = Activity.query.filter_by(
-            user_id=user_id, 
-            status='completed'
-        ).all()
-        
-        total_completed = len(completed_activities)
-        
-        avg_completion_times = []
-        for activity in completed_activities:
-            progress_entries = Progress.query.filter_by(
-                activity_id=activity.id
-            ).order_by(Progress.date.asc()).all()
-            
-            if len(progress_entries) >= 2:
-                start_date = progress_entries[0].date
-                end_date = progress_entries[-1].date
-                days_to_complete = (end_date - start_date).days
-                if days_to_complete > 0:
-                    avg_completion_times.append(days_to_complete)
+        completion_days = get_completion_days(user_id)
+        total_completed = len(completion_days)
         
-        avg_completion_days = round(sum(avg_completion_times) / len(avg_completion_times), 1) if avg_completion_times else 0
+        completion_times = completion_durations(completion_days)
+        avg_completion_days = round(analytics.mean(completion_times), 1) if len(completion_times) else 0
         
         today = date.today()
-        week_start = today - timedelta(days=today.weekday())
-        month_start = date(today.year, today.month, 1)
-        
-        today_schedules = ScheduledActivity.query.filter(
-            ScheduledActivity.user_id == user_id,
-            ScheduledActivity.scheduled_date == today
-        ).count()
-        
-        week_schedules = ScheduledActivity.query.filter(
-            ScheduledActivity.user_id == user_id,
-            ScheduledActivity.scheduled_date >= week_start,
-            ScheduledActivity.scheduled_date <= today
-        ).count()
-        
-        month_schedules = ScheduledActivity.query.filter(
-            ScheduledActivity.user_id == user_id,
-            ScheduledActivity.scheduled_date >= month_start,
-            ScheduledActivity.scheduled_date <= today
-        ).count()
+        priority_metrics = get_schedule_priority_metrics(user_id, today)
         
         status_counts = db.session.query(
             Activity.status,
@@ -1427,26 +3989,24 @@ def get_profile_stats(user_id):
         consistency_score = calculate_consistency_score(user_id)
         current_streak = get_current_streak(user_id)
         
+        current_week_start = today - timedelta(days=today.weekday())
+        daily_series = get_daily_stats_series(
+            user_id,
+            current_week_start - timedelta(days=21),
+            current_week_start + timedelta(days=6)
+        )
+        
         weekly_progress = []
         for i in range(4):
-            week_start_date = today - timedelta(days=today.weekday() + (7 * i))
-            week_end_date = week_start_date + timedelta(days=6)
-            
-            week_activities = Progress.query.filter(
-                Progress.user_id == user_id,
-                Progress.date >= week_start_date,
-                Progress.date <= week_end_date
-            ).count()
+            week_start_date = current_week_start - timedelta(days=7 * i)
+            week_days = [daily_series.get(week_start_date + timedelta(days=d), {}) for d in range(7)]
+            week_activities = sum(day.get('progress_count', 0) for day in week_days)
             
             weekly_progress.append({
                 'week_start': week_start_date.isoformat(),
                 'day_name': week_start_date.strftime('%A')[:3],
                 'score': min(week_activities * 10, 100),
-                'scheduled': ScheduledActivity.query.filter(
-                    ScheduledActivity.user_id == user_id,
-                    ScheduledActivity.scheduled_date >= week_start_date,
-                    ScheduledActivity.scheduled_date <= week_end_date
-                ).count(),
+                'scheduled': sum(day.get('scheduled_count', 0) for day in week_days),
                 'completed': week_activities
             })
         
@@ -1484,11 +4044,7 @@ def get_profile_stats(user_id):
             'category_time': category_time,
             'total_completed': total_completed,
             'avg_completion_days': avg_completion_days,
-            'priority_metrics': {
-                'today': today_schedules,
-                'week': week_schedules,
-                'month': month_schedules
-            },
+            'priority_metrics': priority_metrics,
             'status_distribution': status_distribution,
             'total_activities': total_activities,
             'productivity_score': productivity_score,
@@ -1509,68 +4065,192 @@ def get_profile_stats(user_id):
         
     except Exception as e:
         print(f"Erro crítico em get_profile_stats: {str(e)}")
+        skip_response_cache()
         return get_fallback_profile_data(user_id)
 
+WEEKDAY_NAMES = ('segunda', 'terça', 'quarta', 'quinta', 'sexta', 'sábado', 'domingo')
+
+def sql_weekday(column):
+    # Dia da semana calculado no banco, 0 = segunda ... 6 = domingo (como date.weekday())
+    if db.engine.dialect.name == 'postgresql':
+        return cast(func.extract('isodow', column), Integer) - 1
+    return (cast(func.strftime('%w', column), Integer) + 6) % 7
+
+def sql_hour_text(column):
+    # Texto antes do primeiro ':' de scheduled_time; a conversão para inteiro fica no
+    # Python para ignorar horários mal formados sem derrubar a consulta
+    if db.engine.dialect.name == 'postgresql':
+        return func.split_part(column, ':', 1)
+    return func.substr(column, 1, func.instr(column + ':', ':') - 1)
+
+def empty_time_pattern_aggregate():
+    return {
+        'count': 0,
+        'duration': 0,
+        'first_date': None,
+        'last_date': None,
+        'weekdays': [[0, None] for _ in range(7)],
+        'hours': [[0, None] for _ in range(24)]
+    }
+
+def aggregate_schedule_patterns(user_id, since=None):
+    # Contagens por dia da semana e por hora agrupadas no SQL. O menor id de cada
+    # grupo preserva a ordem de primeira ocorrência das chaves no resultado; as
+    # ocorrências virtuais das repetições (até hoje) somam às contagens sem id
+    filters = [ScheduledActivity.user_id == user_id]
+    if since:
+        filters.append(ScheduledActivity.scheduled_date >= since)
+    
+    aggregate = empty_time_pattern_aggregate()
+    occurrences = expand_recurrence_occurrences(user_id, since, date.today())
+    
+    weekday = sql_weekday(ScheduledActivity.scheduled_date)
+    weekday_rows = db.session.query(
+        weekday,
+        func.count(ScheduledActivity.id),
+        func.min(ScheduledActivity.id),
+        func.sum(ScheduledActivity.duration),
+        func.min(ScheduledActivity.scheduled_date),
+        func.max(ScheduledActivity.scheduled_date)
+    ).filter(*filters).group_by(weekday).all()
+    
+    if not weekday_rows and not occurrences:
+        return aggregate
+    
+    for day, count, first_id, duration, first_date, last_date in weekday_rows:
+        aggregate['weekdays'][int(day)] = [count, first_id]
+        aggregate['count'] += count
+        aggregate['duration'] += int(duration or 0)
+        aggregate['first_date'] = min(filter(None, (aggregate['first_date'], first_date)))
+        aggregate['last_date'] = max(filter(None, (aggregate['last_date'], last_date)))
+    
+    hour = sql_hour_text(ScheduledActivity.scheduled_time)
+    hour_rows = db.session.query(
+        hour,
+        func.count(ScheduledActivity.id),
+        func.min(ScheduledActivity.id)
+    ).filter(
+        *filters,
+        ScheduledActivity.scheduled_time.isnot(None),
+        ScheduledActivity.scheduled_time != ''
+    ).group_by(hour).all()
+    
+    hours, hour_counts, hour_ids = [], [], []
+    for hour_text, count, first_id in hour_rows:
+        try:
+            value = int(hour_text)
+        except (TypeError, ValueError):
+            continue
+        if 0 <= value < 24:
+            hours.append(value)
+            hour_counts.append(count)
+            hour_ids.append(first_id)
+    
+    # '8' e '08' caem na mesma hora
+    if hours:
+        hour_totals = analytics.histogram(hours, hour_counts, 24)
+        hour_first_ids = analytics.first_occurrence(hours, hour_ids, 24)
+        aggregate['hours'] = [
+            [int(hour_totals[value]), int(hour_first_ids[value]) if hour_totals[value] else None]
+            for value in range(24)
+        ]
+    
+    add_recurrence_patterns(aggregate, occurrences)
+    return aggregate
+
+def add_recurrence_patterns(aggregate, occurrences):
+    # Ocorrências virtuais não têm id: somam às contagens sem mudar a ordem de primeira ocorrência
+    for rule, day in occurrences:
+        aggregate['weekdays'][day.weekday()][0] += 1
+        aggregate['count'] += 1
+        aggregate['duration'] += int(rule.duration or 0)
+        aggregate['first_date'] = min(filter(None, (aggregate['first_date'], day)))
+        aggregate['last_date'] = max(filter(None, (aggregate['last_date'], day)))
+        hour = schedule_hour(rule.scheduled_time)
+        if hour >= 0:
+            aggregate['hours'][hour][0] += 1
+
+def load_schedule_time_patterns(user_id):
+    # Modo incremental: contadores por dia da semana e hora já somados na escrita e
+    # primeira e última datas do agregado diário; nenhuma linha de agendamento é lida.
+    # Sem ids, empates ficam na ordem dos dias da semana e das horas
+    ensure_daily_stats(user_id)
+    aggregate = empty_time_pattern_aggregate()
+    
+    for weekday, hour, count, minutes in db.session.query(
+        ScheduleTimeRollup.weekday,
+        ScheduleTimeRollup.hour,
+        func.sum(ScheduleTimeRollup.scheduled_count),
+        func.sum(ScheduleTimeRollup.scheduled_minutes)
+    ).filter(ScheduleTimeRollup.user_id == user_id).group_by(ScheduleTimeRollup.weekday, ScheduleTimeRollup.hour).all():
+        count = int(count or 0)
+        aggregate['weekdays'][weekday][0] += count
+        if hour >= 0:
+            aggregate['hours'][hour][0] += count
+        aggregate['count'] += count
+        aggregate['duration'] += int(minutes or 0)
+    
+    if aggregate['count']:
+        aggregate['first_date'], aggregate['last_date'] = db.session.query(
+            func.min(DailyStatsRollup.day),
+            func.max(DailyStatsRollup.day)
+        ).filter(DailyStatsRollup.user_id == user_id, DailyStatsRollup.scheduled_count > 0).one()
+    
+    add_recurrence_patterns(aggregate, expand_recurrence_occurrences(user_id, None, date.today()))
+    return aggregate
+
+@request_memoized
 def analyze_time_patterns(user_id):
     try:
-        schedules = ScheduledActivity.query.filter_by(user_id=user_id).all()
+        if app.config['TIME_PATTERNS_MODE'] == 'incremental':
+            aggregate = load_schedule_time_patterns(user_id)
+        else:
+            # Recalculado a cada leitura sobre a janela: edições e exclusões de agendamentos
+            # entram sem nenhum estado gravado a invalidar
+            window_days = app.config['TIME_PATTERNS_WINDOW_DAYS']
+            since = date.today() - timedelta(days=window_days) if window_days > 0 else None
+            aggregate = aggregate_schedule_patterns(user_id, since=since)
         
-        if not schedules:
+        if not aggregate['count']:
             return {'busiest_days': {}, 'preferred_times': {}}
         
         patterns = {
             'busiest_days': {},
             'preferred_times': {},
-            'average_session_length': 0,
+            'average_session_length': round(aggregate['duration'] / aggregate['count'], 1),
             'consistency_score': 0
         }
         
-        days_map = {
-            0: 'segunda',
-            1: 'terça', 
-            2: 'quarta',
-            3: 'quinta',
-            4: 'sexta',
-            5: 'sábado',
-            6: 'domingo'
-        }
-        
-        for schedule in schedules:
-            weekday = schedule.scheduled_date.weekday()
-            day_name = days_map.get(weekday, str(weekday))
-            patterns['busiest_days'][day_name] = patterns['busiest_days'].get(day_name, 0) + 1
-        
-        for schedule in schedules:
-            try:
-                if schedule.scheduled_time:
-                    hour = int(schedule.scheduled_time.split(':')[0])
-                    time_slot = f"{hour:02d}:00"
-                    patterns['preferred_times'][time_slot] = patterns['preferred_times'].get(time_slot, 0) + 1
-            except:
-                continue
+        weekday_totals = [count for count, _ in aggregate['weekdays']]
+        weekday_first_ids = [first_id or float('inf') for _, first_id in aggregate['weekdays']]
+        for weekday in analytics.ordered_buckets(weekday_totals, weekday_first_ids):
+            patterns['busiest_days'][WEEKDAY_NAMES[weekday]] = weekday_totals[weekday]
         
-        total_duration = sum(s.duration for s in schedules if s.duration)
-        patterns['average_session_length'] = round(total_duration / len(schedules), 1) if schedules else 0
+        hour_totals = [count for count, _ in aggregate['hours']]
+        hour_first_ids = [first_id or float('inf') for _, first_id in aggregate['hours']]
+        for hour in analytics.ordered_buckets(hour_totals, hour_first_ids):
+            patterns['preferred_times'][f"{hour:02d}:00"] = hour_totals[hour]
         
-        if len(schedules) > 1:
-            dates = sorted([s.scheduled_date for s in schedules])
-            intervals = [(dates[i+1] - dates[i]).days for i in range(len(dates)-1)]
-            
-            if intervals:
-                avg_interval = sum(intervals) / len(intervals)
-                patterns['consistency_score'] = min(100, max(0, 100 - (avg_interval * 10)))
+        # A média dos intervalos entre datas consecutivas (ordenadas, com repetições)
+        # é a distância entre a primeira e a última dividida por n - 1
+        if aggregate['count'] > 1:
+            avg_interval = (aggregate['last_date'] - aggregate['first_date']).days / (aggregate['count'] - 1)
+            patterns['consistency_score'] = min(100, max(0, 100 - (avg_interval * 10)))
         
         return patterns
         
     except Exception as e:
         print(f"Erro em analyze_time_patterns: {str(e)}")
+        skip_response_cache()
         return {'busiest_days': {}, 'preferred_times': {}}
 
 def get_recent_activities(user_id, limit=50):
     try:
         since_date = date.today() - timedelta(days=7)
         
-        progress_entries = Progress.query.filter(
+        progress_entries = Progress.query.options(
+            joinedload(Progress.activity).joinedload(Activity.category)
+        ).filter(
             Progress.user_id == user_id,
             Progress.date >= since_date
         ).order_by(Progress.date.desc()).limit(limit).all()
@@ -1599,6 +4279,7 @@ def get_recent_activities(user_id, limit=50):
         
     except Exception as e:
         print(f"Erro em get_recent_activities: {str(e)}")
+        skip_response_cache()
         return []
 
 def get_time_patterns(user_id):
@@ -1622,16 +4303,33 @@ def get_time_patterns(user_id):
             ScheduledActivity.scheduled_date >= thirty_days_ago
         ).group_by('day_of_week').order_by('day_of_week').all()
         
+        hourly_counts = {str(h.scheduled_time): h.count for h in hourly_patterns if h.scheduled_time}
+        daily_counts = {str(int(d.day_of_week)): d.count for d in daily_patterns}
+        
+        # Ocorrências virtuais das repetições até hoje; 'dow' conta 0 = domingo
+        recurrence_occurrences = expand_recurrence_occurrences(user_id, thirty_days_ago, date.today())
+        for rule, day in recurrence_occurrences:
+            if rule.scheduled_time:
+                hourly_counts[rule.scheduled_time] = hourly_counts.get(rule.scheduled_time, 0) + 1
+            day_key = str((day.weekday() + 1) % 7)
+            daily_counts[day_key] = daily_counts.get(day_key, 0) + 1
+        if recurrence_occurrences:
+            hourly_counts = dict(sorted(hourly_counts.items()))
+            daily_counts = dict(sorted(daily_counts.items(), key=lambda item: int(item[0])))
+        
+        daily_series = get_daily_stats_series(
+            user_id,
+            date.today() - timedelta(days=28),
+            date.today() - timedelta(days=1)
+        )
+        
         weekly_data = []
         for i in range(4):
             week_start = date.today() - timedelta(days=(7 * (i + 1)))
-            week_end = week_start + timedelta(days=6)
-            
-            week_progress = Progress.query.filter(
-                Progress.user_id == user_id,
-                Progress.date >= week_start,
-                Progress.date <= week_end
-            ).count()
+            week_progress = sum(
+                daily_series.get(week_start + timedelta(days=d), {}).get('progress_count', 0)
+                for d in range(7)
+            )
             
             weekly_data.append({
                 'week_start': week_start.isoformat(),
@@ -1641,8 +4339,8 @@ def get_time_patterns(user_id):
             })
         
         return {
-            'hourly_patterns': {str(h.scheduled_time): h.count for h in hourly_patterns if h.scheduled_time},
-            'daily_patterns': {str(int(d.day_of_week)): d.count for d in daily_patterns},
+            'hourly_patterns': hourly_counts,
+            'daily_patterns': daily_counts,
             'weekly_progress': weekly_data,
             'recent_trends': {
                 'productivity_trend': 'up' if len(weekly_data) >= 2 and weekly_data[0]['activities_completed'] > weekly_data[1]['activities_completed'] else 'stable',
@@ -1652,6 +4350,7 @@ def get_time_patterns(user_id):
         
     except Exception as e:
         print(f"Erro em get_time_patterns: {str(e)}")
+        skip_response_cache()
         return {}
 
 def get_recent_activities_for_ai(user_id, limit=50):
@@ -1660,10 +4359,12 @@ def get_recent_activities_for_ai(user_id, limit=50):
             user_id=user_id
         ).order_by(Activity.created_at.desc()).limit(limit).all()
         
+        progress_map = build_activity_progress_map(activities)
         result = []
         for act in activities:
-            progress_percentage = calculate_activity_progress(act)
-            current_value = get_current_progress_value(act)
+            info = progress_map[act.id]
+            progress_percentage = info['progress_percentage']
+            current_value = info['current_value']
             
             if act.measurement_type == 'units' and act.target_value:
                 duration = act.target_value
@@ -1673,7 +4374,7 @@ def get_recent_activities_for_ai(user_id, limit=50):
             result.append({
                 'id': act.id,
                 'name': act.name,
-                'category_name': act.category.name if act.category else 'Geral',
+                'category_name': info['category_name'] or 'Geral',
                 'created_at': act.created_at.isoformat() if act.created_at else datetime.utcnow().isoformat(),
                 'duration': duration,
                 'estimated_duration': duration,
@@ -1691,15 +4392,20 @@ def get_recent_activities_for_ai(user_id, limit=50):
         
     except Exception as e:
         print(f"Erro em get_recent_activities_for_ai: {str(e)}")
+        skip_response_cache()
         return []
 
 @app.route('/api/profile/complete')
+@conditional_user_response
+@user_cached_response()
 def api_profile_complete():
     try:
         user_id = get_current_user_id()
         if not user_id:
             return jsonify({'error': 'Usuário não autenticado'}), 401
         
+        ensure_daily_stats(user_id)
+        
         basic_stats = get_profile_stats(user_id)
         activities = get_recent_activities_for_ai(user_id, limit=50)
         time_patterns = get_time_patterns(user_id)
@@ -1717,6 +4423,7 @@ def api_profile_complete():
             }
         except Exception as enhanced_error:
             print(f"Aviso em enhanced_stats: {enhanced_error}")
+            skip_response_cache()
             enhanced_stats = {
                 'weekly': {},
                 'monthly': {},
@@ -1763,6 +4470,7 @@ def api_profile_complete():
         
     except Exception as e:
         print(f"Erro em api_profile_complete: {str(e)}")
+        skip_response_cache()
         return jsonify({
             'basic': {
                 'category_time': [],
@@ -1787,9 +4495,9 @@ def api_profile_complete():
             'error': str(e)
         }), 200
 
-def get_time_period_analysis(user_id, period='week'):
-    today = date.today()
-    
+ANALYSIS_PERIODS = ('week', 'month', 'year')
+
+def analysis_period_bounds(period, today):
     if period == 'week':
         start_date = today - timedelta(days=today.weekday())
         end_date = start_date + timedelta(days=6)
@@ -1802,21 +4510,29 @@ def get_time_period_analysis(user_id, period='week'):
     else:
         start_date = today - timedelta(days=7)
         end_date = today
+    return start_date, end_date
+
+@request_memoized
+def get_period_category_minutes(user_id):
+    # Semana, mês e ano correntes saem da mesma consulta ao rollup por categoria
+    today = date.today()
+    periods = {period: analysis_period_bounds(period, today) for period in ANALYSIS_PERIODS}
+    return periods, get_category_rollup(user_id, periods)
+
+def get_time_period_analysis(user_id, period='week'):
+    if period in ANALYSIS_PERIODS:
+        periods, rollup = get_period_category_minutes(user_id)
+    else:
+        periods = {period: analysis_period_bounds(period, date.today())}
+        rollup = get_category_rollup(user_id, periods)
     
-    schedules = ScheduledActivity.query.filter(
-        ScheduledActivity.user_id == user_id,
-        ScheduledActivity.scheduled_date >= start_date,
-        ScheduledActivity.scheduled_date <= end_date
-    ).all()
+    start_date, end_date = periods[period]
     
     category_hours = {}
-    for schedule in schedules:
-        activity = Activity.query.get(schedule.activity_id)
-        if activity:
-            category = Category.query.get(activity.category_id)
-            if category:
-                hours = schedule.duration / 60 if schedule.duration else 0
-                category_hours[category.name] = category_hours.get(category.name, 0) + hours
+    for item in rollup:
+        totals = item['periods'][period]
+        if totals['count'] > 0:
+            category_hours[item['name']] = category_hours.get(item['name'], 0) + totals['value'] / 60
     
     analysis = {
         'period': period,
@@ -1835,6 +4551,7 @@ def get_time_period_analysis(user_id, period='week'):
     
     return analysis
 
+@request_memoized
 def get_activity_profile(user_id):
     activities = Activity.query.filter_by(user_id=user_id).all()
     
@@ -1866,19 +4583,18 @@ def get_activity_profile(user_id):
             'strengths': ['Curiosidade', 'Aprendizado contínuo']
         }
 
+@request_memoized
 def identify_focus_areas(user_id):
-    activities = Activity.query.filter_by(user_id=user_id).all()
+    rollup = get_category_rollup(user_id, {'all': (None, None)}, measure='activities')
     
-    if not activities:
+    if not rollup:
         return []
     
     category_activities = {}
-    for activity in activities:
-        category = Category.query.get(activity.category_id)
-        if category:
-            category_activities[category.name] = category_activities.get(category.name, 0) + 1
+    for item in rollup:
+        category_activities[item['name']] = category_activities.get(item['name'], 0) + item['periods']['all']['count']
     
-    total_activities = len(activities)
+    total_activities = sum(category_activities.values())
     focus_areas = []
     
     for category, count in category_activities.items():
@@ -1901,17 +4617,14 @@ def identify_focus_areas(user_id):
 def analyze_growth_trend(user_id):
     thirty_days_ago = date.today() - timedelta(days=30)
     
-    recent_progress = Progress.query.filter(
-        Progress.user_id == user_id,
-        Progress.date >= thirty_days_ago
-    ).count()
+    recent_progress = sum_daily_stats(user_id, start_date=thirty_days_ago)['progress_count']
     
     previous_period_start = thirty_days_ago - timedelta(days=30)
-    previous_progress = Progress.query.filter(
-        Progress.user_id == user_id,
-        Progress.date >= previous_period_start,
-        Progress.date < thirty_days_ago
-    ).count()
+    previous_progress = sum_daily_stats(
+        user_id,
+        start_date=previous_period_start,
+        end_date=thirty_days_ago - timedelta(days=1)
+    )['progress_count']
     
     if previous_progress == 0:
         return 'stable'
@@ -1927,12 +4640,16 @@ def analyze_growth_trend(user_id):
 
 # ============ ROTAS DE ANÁLISE DE IA ============
 @app.route('/api/ai/profile_analysis')
+@conditional_user_response
+@user_cached_response()
 def api_ai_profile_analysis():
     try:
         user_id = get_current_user_id()
         if not user_id:
             return jsonify({'error': 'Usuário não autenticado'}), 401
         
+        ensure_daily_stats(user_id)
+        
         ai_data = {
             'user_profile': get_profile_stats(user_id),
             'activities_data': get_recent_activities(user_id, limit=100),
@@ -1951,12 +4668,16 @@ def api_ai_profile_analysis():
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/profile/enhanced_stats')
+@conditional_user_response
+@user_cached_response()
 def api_profile_enhanced_stats():
     try:
         user_id = get_current_user_id()
         if not user_id:
             return jsonify({'error': 'Usuário não autenticado'}), 401
         
+        ensure_daily_stats(user_id)
+        
         today = date.today()
         
         basic_stats = get_profile_stats(user_id)
@@ -1987,12 +4708,16 @@ def api_profile_enhanced_stats():
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/profile/time_analysis')
+@conditional_user_response
+@user_cached_response()
 def api_time_analysis():
     try:
         user_id = get_current_user_id()
         if not user_id:
             return jsonify({'error': 'Usuário não autenticado'}), 401
         
+        ensure_daily_stats(user_id)
+        
         patterns = get_time_patterns(user_id)
         return jsonify(patterns)
     except Exception as e:
@@ -2000,6 +4725,8 @@ def api_time_analysis():
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/profile/historical')
+@conditional_user_response
+@user_cached_response()
 def api_profile_historical():
     try:
         user_id = get_current_user_id()
@@ -2009,20 +4736,12 @@ def api_profile_historical():
         days = request.args.get('days', 90, type=int)
         start_date = date.today() - timedelta(days=days)
         
-        progress_entries = Progress.query.filter(
-            Progress.user_id == user_id,
-            Progress.date >= start_date
-        ).order_by(Progress.date.asc()).all()
-        
-        scheduled_entries = ScheduledActivity.query.filter(
-            ScheduledActivity.user_id == user_id,
-            ScheduledActivity.scheduled_date >= start_date
-        ).order_by(ScheduledActivity.scheduled_date.asc()).all()
-        
+        # Linha do tempo montada por duas agregações no banco (progresso por dia e
+        # agendamentos por dia e categoria), sem carregar as linhas como objetos ORM
         daily_data = {}
         
-        for progress in progress_entries:
-            date_key = progress.date.isoformat()
+        def day_bucket(day):
+            date_key = day.isoformat()
             if date_key not in daily_data:
                 daily_data[date_key] = {
                     'date': date_key,
@@ -2032,31 +4751,48 @@ def api_profile_historical():
                     'time_spent': 0,
                     'categories': {}
                 }
-            
-            daily_data[date_key]['activities_completed'] += 1
-            daily_data[date_key]['points_earned'] += progress.points_earned
+            return daily_data[date_key]
         
-        for schedule in scheduled_entries:
-            date_key = schedule.scheduled_date.isoformat()
-            if date_key not in daily_data:
-                daily_data[date_key] = {
-                    'date': date_key,
-                    'activities_completed': 0,
-                    'points_earned': 0,
-                    'scheduled_activities': 0,
-                    'time_spent': 0,
-                    'categories': {}
-                }
-            
-            daily_data[date_key]['scheduled_activities'] += 1
-            daily_data[date_key]['time_spent'] += schedule.duration if schedule.duration else 0
-            
-            activity = Activity.query.get(schedule.activity_id)
-            if activity:
-                category = Category.query.get(activity.category_id)
-                if category:
-                    cat_name = category.name
-                    daily_data[date_key]['categories'][cat_name] = daily_data[date_key]['categories'].get(cat_name, 0) + (schedule.duration if schedule.duration else 0)
+        for day, completed_count, points in db.session.query(
+            Progress.date,
+            func.count(Progress.id),
+            func.coalesce(func.sum(Progress.points_earned), 0)
+        ).filter(
+            Progress.user_id == user_id,
+            Progress.date >= start_date
+        ).group_by(Progress.date).all():
+            bucket = day_bucket(day)
+            bucket['activities_completed'] = completed_count
+            bucket['points_earned'] = int(points)
+        
+        for day, category_name, scheduled_count, minutes in db.session.query(
+            ScheduledActivity.scheduled_date,
+            Category.name,
+            func.count(ScheduledActivity.id),
+            func.coalesce(func.sum(ScheduledActivity.duration), 0)
+        ).outerjoin(
+            Activity, ScheduledActivity.activity_id == Activity.id
+        ).outerjoin(
+            Category, Activity.category_id == Category.id
+        ).filter(
+            ScheduledActivity.user_id == user_id,
+            ScheduledActivity.scheduled_date >= start_date
+        ).group_by(ScheduledActivity.scheduled_date, Category.name).all():
+            bucket = day_bucket(day)
+            bucket['scheduled_activities'] += scheduled_count
+            bucket['time_spent'] += int(minutes)
+            if category_name is not None:
+                bucket['categories'][category_name] = int(minutes)
+        
+        # Ocorrências virtuais das repetições até hoje
+        for rule, day in expand_recurrence_occurrences(user_id, start_date, date.today()):
+            bucket = day_bucket(day)
+            minutes = int(rule.duration or 0)
+            bucket['scheduled_activities'] += 1
+            bucket['time_spent'] += minutes
+            if rule.activity.category:
+                category_name = rule.activity.category.name
+                bucket['categories'][category_name] = bucket['categories'].get(category_name, 0) + minutes
         
         historical_data = sorted(daily_data.values(), key=lambda x: x['date'])
         
@@ -2085,6 +4821,7 @@ def api_profile_historical():
         
     except Exception as e:
         print(f"Erro em api_profile_historical: {str(e)}")
+        skip_response_cache()
         return jsonify(get_simulated_historical_data(days))
 
 def get_simulated_historical_data(days=90):
@@ -2136,40 +4873,10 @@ def analyze_historical_patterns(historical_data):
     if not historical_data:
         return {}
     
-    avg_daily = sum(day['activities_completed'] for day in historical_data) / len(historical_data)
-    best_day = max(historical_data, key=lambda x: x['activities_completed'])
-    
-    values = [day['activities_completed'] for day in historical_data]
-    if values:
-        mean = sum(values) / len(values)
-        variance = sum((x - mean) ** 2 for x in values) / len(values)
-        std_dev = variance ** 0.5
-        consistency = max(0, 100 - (std_dev / mean * 100)) if mean > 0 else 0
-    else:
-        consistency = 0
-    
-    if len(historical_data) >= 14:
-        first_week = historical_data[:7]
-        last_week = historical_data[-7:]
-        avg_first = sum(day['activities_completed'] for day in first_week) / 7
-        avg_last = sum(day['activities_completed'] for day in last_week) / 7
-        
-        if avg_last > avg_first * 1.2:
-            trend = 'up'
-        elif avg_last < avg_first * 0.8:
-            trend = 'down'
-        else:
-            trend = 'stable'
-    else:
-        trend = 'stable'
-    
-    return {
-        'average_daily_activities': round(avg_daily, 1),
-        'best_day': best_day['date'],
-        'best_day_count': best_day['activities_completed'],
-        'consistency_score': round(consistency, 1),
-        'trend': trend
-    }
+    return analytics.historical_patterns(
+        [day['date'] for day in historical_data],
+        [day['activities_completed'] for day in historical_data]
+    )
 
 # ============ ROTAS DE SAÚDE ============
 @app.route('/api/health')
@@ -2185,6 +4892,8 @@ def api_health():
                 'user_exists': user_count > 0,
                 'activity_count': activity_count
             },
+            'memoization': dict(memo_counters),
+            'background_jobs': dict(background_counters),
             'endpoints': {
                 'profile': True,
                 'activities': True,
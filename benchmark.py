@@ -0,0 +1,240 @@
+# Benchmark dos endpoints /api/* contra um usuário sintético grande.
+#
+#   python benchmark.py                                   # SQLite temporário
+#   python benchmark.py --postgres-url postgresql://...   # SQLite + PostgreSQL local
+#   python benchmark.py --update-baseline                 # grava a linha de base
+#
+# Cada banco roda em um subprocesso (o app lê DATABASE_URL na importação).
+# Para cada endpoint são registrados p50/p95 de latência, número de consultas SQL
+# e pico de memória; o resultado é comparado com benchmark_baseline.json e o
+# processo termina com código 1 se alguma métrica piorar além do limite.
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date
+
+BENCH_USER_ID = 900
+
+# Fora da medição: status de sessão, contagens globais e o auto-teste que chama outras rotas
+SKIPPED_ENDPOINTS = {'api_auth_status', 'api_health_check', 'api_database_info'}
+
+EXTRA_READS = [
+    '/api/activities/hierarchy?max_depth=2&limit=20',
+    '/api/profile/historical?days=365',
+    '/api/profile/historical?days=730',
+]
+
+# Limites mínimos de piora absoluta, para não acusar ruído de medição
+MIN_LATENCY_REGRESSION_MS = 5.0
+MIN_MEMORY_REGRESSION_KB = 256.0
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def run_worker(args):
+    os.environ['DATABASE_URL'] = args.database_url
+    if not args.warm_cache:
+        # TTL zero: mede o custo real das views, não o cache de respostas
+        os.environ['RESPONSE_CACHE_TTL'] = '0'
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from sqlalchemy import event
+    from app import app, db, create_synthetic_data_for_user, delete_user_data
+    from models import User, Activity
+
+    with app.app_context():
+        if not db.session.get(User, BENCH_USER_ID):
+            db.session.add(User(id=BENCH_USER_ID, username='benchmark', email='benchmark@exemplo.com'))
+            db.session.commit()
+        delete_user_data(BENCH_USER_ID)
+        db.session.commit()
+
+        started = time.perf_counter()
+        dataset = create_synthetic_data_for_user(
+            BENCH_USER_ID,
+            activities=args.activities,
+            max_depth=args.max_depth,
+            days=args.days,
+            progress_per_day=args.progress_per_day,
+            schedules_per_day=args.schedules_per_day
+        )
+        dataset['seed_seconds'] = round(time.perf_counter() - started, 2)
+
+        sample_activity = db.session.query(Activity.id, Activity.category_id).filter_by(
+            user_id=BENCH_USER_ID, measurement_type='units'
+        ).order_by(Activity.id).first()
+        dialect = db.engine.dialect.name
+
+        query_count = [0]
+        event.listen(db.engine, 'before_cursor_execute',
+                     lambda *_: query_count.__setitem__(0, query_count[0] + 1))
+
+    url_values = {'activity_id': sample_activity.id}
+    requests_to_run = []
+    for rule in sorted(app.url_map.iter_rules(), key=lambda r: r.rule):
+        if not rule.rule.startswith('/api/') or 'GET' not in rule.methods or rule.endpoint in SKIPPED_ENDPOINTS:
+            continue
+        path = rule.rule
+        for name in rule.arguments:
+            path = path.replace(f'<int:{name}>', str(url_values[name]))
+        requests_to_run.append(('GET', path, None))
+
+    requests_to_run += [('GET', path, None) for path in EXTRA_READS]
+    requests_to_run += [
+        ('POST', '/api/progress', {'activity_id': sample_activity.id, 'value': 1, 'date': date.today().isoformat()}),
+        ('POST', '/api/schedules', {'activity_id': sample_activity.id, 'scheduled_date': date.today().isoformat(),
+                                    'scheduled_time': '08:00', 'duration': 30}),
+        ('POST', '/api/points/add', {'points': 1, 'description': 'benchmark'}),
+    ]
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = BENCH_USER_ID
+
+    def call(method, path, body):
+        return client.open(path, method=method, json=body)
+
+    results = {}
+    for method, path, body in requests_to_run:
+        name = f'{method} {path}'
+        call(method, path, body)
+
+        tracemalloc.start()
+        call(method, path, body)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        timings = []
+        queries = []
+        status = None
+        for _ in range(args.iterations):
+            query_count[0] = 0
+            started = time.perf_counter()
+            response = call(method, path, body)
+            timings.append((time.perf_counter() - started) * 1000)
+            queries.append(query_count[0])
+            status = response.status_code
+
+        results[name] = {
+            'status': status,
+            'p50_ms': round(percentile(timings, 50), 2),
+            'p95_ms': round(percentile(timings, 95), 2),
+            'queries': max(queries),
+            'peak_kb': round(peak / 1024, 1)
+        }
+        print(f"  {name:60s} {results[name]['p50_ms']:9.2f}ms p50 {results[name]['p95_ms']:9.2f}ms p95 "
+              f"{results[name]['queries']:5d} SQL {results[name]['peak_kb']:10.1f}KB", file=sys.stderr)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({'dialect': dialect, 'dataset': dataset, 'endpoints': results}, f, indent=2)
+
+
+def compare_with_baseline(results, baseline, threshold):
+    regressions = []
+    for target, target_results in results['targets'].items():
+        base_endpoints = baseline.get('targets', {}).get(target, {}).get('endpoints', {})
+        for name, current in target_results['endpoints'].items():
+            base = base_endpoints.get(name)
+            if not base:
+                continue
+
+            if current['p95_ms'] > base['p95_ms'] * (1 + threshold) and \
+                    current['p95_ms'] - base['p95_ms'] > MIN_LATENCY_REGRESSION_MS:
+                regressions.append(f"{target} {name}: p95 {base['p95_ms']}ms -> {current['p95_ms']}ms")
+
+            if current['queries'] > math.ceil(base['queries'] * (1 + threshold)):
+                regressions.append(f"{target} {name}: consultas {base['queries']} -> {current['queries']}")
+
+            if current['peak_kb'] > base['peak_kb'] * (1 + threshold) and \
+                    current['peak_kb'] - base['peak_kb'] > MIN_MEMORY_REGRESSION_KB:
+                regressions.append(f"{target} {name}: memória {base['peak_kb']}KB -> {current['peak_kb']}KB")
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark dos endpoints /api/*')
+    parser.add_argument('--postgres-url', default=os.environ.get('BENCHMARK_POSTGRES_URL'),
+                        help='PostgreSQL local descartável para medir também nesse banco')
+    parser.add_argument('--skip-sqlite', action='store_true')
+    parser.add_argument('--baseline', default='benchmark_baseline.json')
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--threshold', type=float, default=0.25, help='Piora relativa tolerada (0.25 = 25%%)')
+    parser.add_argument('--iterations', type=int, default=10)
+    parser.add_argument('--warm-cache', action='store_true', help='Mantém o cache de respostas ligado')
+    parser.add_argument('--activities', type=int, default=2000)
+    parser.add_argument('--max-depth', type=int, default=6)
+    parser.add_argument('--days', type=int, default=730)
+    parser.add_argument('--progress-per-day', type=int, default=10)
+    parser.add_argument('--schedules-per-day', type=int, default=8)
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--database-url', help=argparse.SUPPRESS)
+    parser.add_argument('--output', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return 0
+
+    workdir = tempfile.mkdtemp(prefix='organizador-bench-')
+    targets = {}
+    if not args.skip_sqlite:
+        targets['sqlite'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    if args.postgres_url:
+        targets['postgresql'] = args.postgres_url
+
+    results = {
+        'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'parameters': {key: getattr(args, key) for key in
+                       ('iterations', 'warm_cache', 'activities', 'max_depth', 'days',
+                        'progress_per_day', 'schedules_per_day')},
+        'targets': {}
+    }
+
+    for label, url in targets.items():
+        print(f'== {label}', file=sys.stderr)
+        output = os.path.join(workdir, f'{label}.json')
+        command = [sys.executable, os.path.abspath(__file__), '--worker', '--database-url', url, '--output', output,
+                   '--iterations', str(args.iterations), '--activities', str(args.activities),
+                   '--max-depth', str(args.max_depth), '--days', str(args.days),
+                   '--progress-per-day', str(args.progress_per_day),
+                   '--schedules-per-day', str(args.schedules_per_day)]
+        if args.warm_cache:
+            command.append('--warm-cache')
+
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+        with open(output, encoding='utf-8') as f:
+            results['targets'][label] = json.load(f)
+
+    if args.update_baseline or not os.path.exists(args.baseline):
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f'Linha de base gravada em {args.baseline}', file=sys.stderr)
+        return 0
+
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+
+    regressions = compare_with_baseline(results, baseline, args.threshold)
+    if regressions:
+        print('Regressões acima do limite:', file=sys.stderr)
+        for line in regressions:
+            print(f'  {line}', file=sys.stderr)
+        return 1
+
+    print('Sem regressões em relação à linha de base', file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
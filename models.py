@@ -79,6 +79,8 @@ class Activity(db.Model):
     progress = relationship('Progress', backref='activity', lazy=True, cascade='all, delete-orphan')
     scheduled_activities = relationship('ScheduledActivity', backref='activity', lazy=True, cascade='all, delete-orphan')
     point_transactions = relationship('PointTransaction', backref='activity', lazy=True)
+    progress_total = relationship('ActivityProgressTotal', backref='activity', uselist=False, cascade='all, delete-orphan')
+    schedule_recurrences = relationship('ScheduleRecurrence', backref='activity', lazy=True, cascade='all, delete-orphan')
     
     __table_args__ = (
         CheckConstraint("measurement_type IN ('boolean', 'units', 'percentage')", name='check_measurement_type'),
@@ -110,6 +112,20 @@ class Progress(db.Model):
         db.UniqueConstraint('activity_id', 'date', name='unique_progress_per_day'),
     )
 
+class ActivityProgressTotal(db.Model):
+    __tablename__ = 'activity_progress_totals'
+    
+    # Soma acumulada de Progress.value por atividade, mantida na escrita
+    activity_id = db.Column(db.Integer, db.ForeignKey('activities.id'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    total_value = db.Column(db.Float, nullable=False, default=0.0)
+    entry_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        Index('idx_progress_total_user', 'user_id'),
+    )
+
 class ScheduledActivity(db.Model):
     __tablename__ = 'scheduled_activities'
     
@@ -126,6 +142,67 @@ class ScheduledActivity(db.Model):
         Index('idx_schedule_activity', 'activity_id'),
     )
 
+class ScheduleRecurrence(db.Model):
+    __tablename__ = 'schedule_recurrences'
+    
+    # Regra de repetição (no estilo RRULE) expandida na leitura da agenda; só as
+    # ocorrências alteradas viram linhas em scheduled_activities
+    id = db.Column(db.Integer, primary_key=True)
+    activity_id = db.Column(db.Integer, db.ForeignKey('activities.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    frequency = db.Column(db.String(20), nullable=False)
+    weekdays = db.Column(db.String(20))  # '0,2,4' (0 = segunda-feira)
+    monthday = db.Column(db.Integer)
+    start_date = db.Column(db.Date, nullable=False)
+    until_date = db.Column(db.Date, nullable=True)
+    scheduled_time = db.Column(db.String(8))  # HH:MM format
+    duration = db.Column(db.Integer)  # em minutos
+    exceptions = db.Column(db.Text)  # lista JSON de datas ISO sem ocorrência
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        CheckConstraint("frequency IN ('daily', 'weekly', 'monthly')", name='check_recurrence_frequency'),
+        Index('idx_recurrence_user', 'user_id', 'start_date'),
+        Index('idx_recurrence_activity', 'activity_id'),
+    )
+
+class DailyStatsRollup(db.Model):
+    __tablename__ = 'daily_stats_rollups'
+    
+    # Agregado diário por usuário e categoria, atualizado incrementalmente na escrita
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=False)
+    progress_count = db.Column(db.Integer, nullable=False, default=0)
+    completed_count = db.Column(db.Integer, nullable=False, default=0)
+    points = db.Column(db.Integer, nullable=False, default=0)
+    scheduled_count = db.Column(db.Integer, nullable=False, default=0)
+    scheduled_minutes = db.Column(db.Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        Index('idx_daily_stats_category', 'category_id'),
+        db.UniqueConstraint('user_id', 'day', 'category_id', name='unique_daily_stats_per_category'),
+    )
+
+class ScheduleTimeRollup(db.Model):
+    __tablename__ = 'schedule_time_rollups'
+    
+    # Agendamentos por usuário, categoria, dia da semana (0 = segunda) e hora do
+    # scheduled_time (-1 = sem horário válido), atualizado incrementalmente na escrita
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=False)
+    weekday = db.Column(db.Integer, nullable=False)
+    hour = db.Column(db.Integer, nullable=False)
+    scheduled_count = db.Column(db.Integer, nullable=False, default=0)
+    scheduled_minutes = db.Column(db.Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        Index('idx_schedule_time_category', 'category_id'),
+        db.UniqueConstraint('user_id', 'category_id', 'weekday', 'hour', name='unique_schedule_time_per_category'),
+    )
+
 class Reward(db.Model):
     __tablename__ = 'rewards'
     
@@ -136,7 +213,7 @@ class Reward(db.Model):
     points_required = db.Column(db.Integer, default=0)
     condition_type = db.Column(db.String(50), default='points')  # 'points', 'activity', 'streak'
     condition_value = db.Column(db.Integer, nullable=True)
-    condition_activity_id = db.Column(db.Integer, db.ForeignKey('activities.id'), nullable=True)
+    condition_activity_id = db.Column(db.Integer, db.ForeignKey('activities.id', ondelete='SET NULL'), nullable=True)
     achieved = db.Column(db.Boolean, default=False)
     achieved_at = db.Column(db.DateTime, nullable=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -183,4 +260,55 @@ class WeeklyStreak(db.Model):
     
     __table_args__ = (
         CheckConstraint('streak_count >= 0', name='check_streak_non_negative'),
-    )
\ No newline at end of file
+    )
+
+class UserDataVersion(db.Model):
+    __tablename__ = 'user_data_versions'
+    
+    # Incrementada a cada escrita do usuário; invalida caches e ETags
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class ResponseCacheEntry(db.Model):
+    __tablename__ = 'response_cache_entries'
+    
+    cache_key = db.Column(db.String(64), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    
+    __table_args__ = (
+        Index('idx_response_cache_user', 'user_id'),
+    )
+
+class BackgroundJob(db.Model):
+    __tablename__ = 'background_jobs'
+    
+    # Fila durável opcional: a tarefa é gravada na mesma transação da escrita que a
+    # originou e apagada depois de executada; o que sobrar após uma queda é reprocessado
+    id = db.Column(db.Integer, primary_key=True)
+    task = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index('idx_background_job_attempts', 'attempts', 'id'),
+    )
+
+class PointBalanceSnapshot(db.Model):
+    __tablename__ = 'point_balance_snapshots'
+    
+    # Saldo do extrato de pontos ao fim de period_end, gravado pela compactação
+    # apenas para períodos já encerrados (o extrato desses dias não muda mais)
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    period_end = db.Column(db.Date, nullable=False)
+    balance = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'period_end', name='unique_balance_snapshot_per_period'),
+    )
@@ -334,7 +334,8 @@ function handleDrop(e) {
     e.preventDefault();
     
     if (e.target.classList.contains('day-slot') && draggedElement) {
-        const scheduleId = parseInt(e.dataTransfer.getData('text/plain'));
+        // Ocorrências de repetições têm id textual ('r<regra>-<data>'); não converter para número
+        const scheduleId = e.dataTransfer.getData('text/plain');
         const targetDay = parseInt(e.target.dataset.day);
         const targetHour = parseInt(e.target.dataset.hour);
         
@@ -361,9 +362,15 @@ function handleDragEnd(e) {
     }
 }
 
+// Buscar agendamento pelo id: numérico nos agendamentos concretos, 'r<regra>-<data>'
+// nas ocorrências de repetições (que chegam como texto do DOM ou dos botões)
+function findSchedule(scheduleId) {
+    return scheduledActivities.find(s => String(s.id) === String(scheduleId));
+}
+
 // Atualizar horário do agendamento - VERSÃO MELHORADA
 async function updateScheduleTime(scheduleId, newDay, newHour) {
-    const schedule = scheduledActivities.find(s => s.id === scheduleId);
+    const schedule = findSchedule(scheduleId);
     if (!schedule) return;
 
     const weekStart = getWeekStart(currentWeek);
@@ -448,7 +455,7 @@ function openScheduleModal(day, hour) {
 
 // Abrir modal de replicação
 function openReplicateModal(scheduleId) {
-    const schedule = scheduledActivities.find(s => s.id === scheduleId);
+    const schedule = findSchedule(scheduleId);
     if (!schedule) return;
 
     document.getElementById('replicate-schedule-id').value = scheduleId;
@@ -625,7 +632,7 @@ async function handleScheduleSubmit(e) {
 
 // Função para confirmar atividade realizada
 async function confirmActivity(scheduleId) {
-    const schedule = scheduledActivities.find(s => s.id === scheduleId);
+    const schedule = findSchedule(scheduleId);
     if (!schedule) return;
 
     if (!confirm(`Confirmar que você realizou "${schedule.activity_name}"?`)) {
@@ -699,7 +706,7 @@ function showModal(modalId) {
 }
 
 async function logPartialProgress(scheduleId) {
-    const schedule = scheduledActivities.find(s => s.id === scheduleId);
+    const schedule = findSchedule(scheduleId);
     if (!schedule) return;
 
     // Abrir modal de progresso com a atividade pré-selecionada
@@ -765,7 +772,7 @@ function darkenColor(color, percent) {
 
 // FUNÇÃO PARA EDITAR AGENDAMENTO
 function editSchedule(scheduleId) {
-    const schedule = scheduledActivities.find(s => s.id === scheduleId);
+    const schedule = findSchedule(scheduleId);
     if (!schedule) return;
 
     // Preencher o modal de agendamento com os dados existentes
@@ -804,7 +811,7 @@ function editSchedule(scheduleId) {
 
 // FUNÇÃO PARA MUDAR DURAÇÃO DO AGENDAMENTO
 function changeScheduleDuration(scheduleId) {
-    const schedule = scheduledActivities.find(s => s.id === scheduleId);
+    const schedule = findSchedule(scheduleId);
     if (!schedule) return;
 
     const newDuration = prompt(`Alterar duração para (minutos):`, schedule.duration);
@@ -818,7 +825,7 @@ function changeScheduleDuration(scheduleId) {
 
 // ATUALIZAR DURAÇÃO DO AGENDAMENTO
 async function updateScheduleDuration(scheduleId, newDuration) {
-    const schedule = scheduledActivities.find(s => s.id === scheduleId);
+    const schedule = findSchedule(scheduleId);
     if (!schedule) return;
 
     try {
@@ -848,7 +855,7 @@ async function updateScheduleDuration(scheduleId, newDuration) {
 
 // FUNÇÃO PARA MOVER AGENDAMENTO PARA OUTRO DIA
 function moveScheduleToDay(scheduleId) {
-    const schedule = scheduledActivities.find(s => s.id === scheduleId);
+    const schedule = findSchedule(scheduleId);
     if (!schedule) return;
 
     const newDate = prompt(`Mover para nova data (YYYY-MM-DD):`, schedule.scheduled_date);
@@ -868,7 +875,7 @@ function moveScheduleToDay(scheduleId) {
 
 // ATUALIZAR DATA DO AGENDAMENTO
 async function updateScheduleDate(scheduleId, newDate) {
-    const schedule = scheduledActivities.find(s => s.id === scheduleId);
+    const schedule = findSchedule(scheduleId);
     if (!schedule) return;
 
     try {
@@ -1945,7 +1952,7 @@ function renderScheduledActivities() {
 
 // ATUALIZAR A FUNÇÃO openActivityOptions PARA INCLUIR TODAS AS OPÇÕES
 function openActivityOptions(scheduleId) {
-    const schedule = scheduledActivities.find(s => s.id === scheduleId);
+    const schedule = findSchedule(scheduleId);
     if (!schedule) return;
 
     // Criar ou atualizar menu de opções
@@ -1966,28 +1973,29 @@ function openActivityOptions(scheduleId) {
             <div class="options-section">
                 <h5>Gerenciar Agendamento</h5>
                 <div class="options-buttons">
-                    <button class="btn btn-outline btn-sm" onclick="editSchedule(${scheduleId})">
+                    <button class="btn btn-outline btn-sm" onclick="editSchedule('${scheduleId}')">
                         <i class="fas fa-edit"></i> Editar
                     </button>
-                    <button class="btn btn-outline btn-sm" onclick="changeScheduleDuration(${scheduleId})">
+                    <button class="btn btn-outline btn-sm" onclick="changeScheduleDuration('${scheduleId}')">
                         <i class="fas fa-clock"></i> Alterar Duração
                     </button>
-                    <button class="btn btn-outline btn-sm" onclick="moveScheduleToDay(${scheduleId})">
+                    <button class="btn btn-outline btn-sm" onclick="moveScheduleToDay('${scheduleId}')">
                         <i class="fas fa-calendar-day"></i> Mudar Data
                     </button>
-                    <button class="btn btn-outline btn-sm" onclick="openReplicateModal(${scheduleId})">
+                    ${schedule.virtual ? '' : `
+                    <button class="btn btn-outline btn-sm" onclick="openReplicateModal('${scheduleId}')">
                         <i class="fas fa-copy"></i> Replicar
-                    </button>
+                    </button>`}
                 </div>
             </div>
             
             <div class="options-section">
                 <h5>Registrar Progresso</h5>
                 <div class="options-buttons">
-                    <button class="btn btn-success btn-sm" onclick="confirmActivity(${scheduleId})">
+                    <button class="btn btn-success btn-sm" onclick="confirmActivity('${scheduleId}')">
                         <i class="fas fa-check-circle"></i> Confirmar Realização
                     </button>
-                    <button class="btn btn-primary btn-sm" onclick="logPartialProgress(${scheduleId})">
+                    <button class="btn btn-primary btn-sm" onclick="logPartialProgress('${scheduleId}')">
                         <i class="fas fa-tasks"></i> Registrar Progresso
                     </button>
                 </div>
@@ -1996,7 +2004,7 @@ function openActivityOptions(scheduleId) {
             <div class="options-section">
                 <h5>Ações</h5>
                 <div class="options-buttons">
-                    <button class="btn btn-danger btn-sm" onclick="deleteSchedule(${scheduleId})">
+                    <button class="btn btn-danger btn-sm" onclick="deleteSchedule('${scheduleId}')">
                         <i class="fas fa-trash"></i> Excluir
                     </button>
                     <button class="btn btn-outline btn-sm" onclick="closeActivityOptions()">
@@ -0,0 +1,86 @@
+# Configuração compartilhada dos testes.
+#
+# O app lê DATABASE_URL na importação, então o banco é definido antes do import:
+# SQLite temporário por padrão ou o banco de TEST_DATABASE_URL (use um PostgreSQL
+# descartável para rodar também os testes de concorrência desse banco).
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+from itertools import count
+
+import pytest
+
+TEST_DIR = tempfile.mkdtemp(prefix='organizador-tests-')
+os.environ['DATABASE_URL'] = os.environ.get('TEST_DATABASE_URL', f"sqlite:///{os.path.join(TEST_DIR, 'test.db')}")
+os.environ['BACKGROUND_JOBS_MODE'] = 'sync'
+os.environ['RESPONSE_CACHE_TTL'] = '0'
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event  # noqa: E402
+from app import app as flask_app, db, delete_user_data  # noqa: E402
+from models import User  # noqa: E402
+
+user_ids = count(1000)
+
+
+@pytest.fixture
+def app():
+    with flask_app.app_context():
+        yield flask_app
+        db.session.rollback()
+
+
+@pytest.fixture
+def make_user(app):
+    created = []
+    
+    def factory():
+        user_id = next(user_ids)
+        while db.session.get(User, user_id):
+            user_id = next(user_ids)
+        db.session.add(User(id=user_id, username=f'teste{user_id}', email=f'teste{user_id}@exemplo.com'))
+        db.session.commit()
+        created.append(user_id)
+        return user_id
+    
+    yield factory
+    
+    db.session.rollback()
+    for user_id in created:
+        delete_user_data(user_id, remove_account=True)
+        User.query.filter_by(id=user_id).delete()
+    db.session.commit()
+
+
+@pytest.fixture
+def user_id(make_user):
+    return make_user()
+
+
+def client_for(user_id):
+    client = flask_app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+    return client
+
+
+@pytest.fixture
+def client(user_id):
+    return client_for(user_id)
+
+
+@contextmanager
+def count_queries():
+    # Mesmo contador de benchmark.py: um incremento por comando enviado ao banco
+    counter = {'count': 0}
+    
+    def increment(*_):
+        counter['count'] += 1
+    
+    event.listen(db.engine, 'before_cursor_execute', increment)
+    try:
+        yield counter
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', increment)
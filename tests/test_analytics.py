@@ -0,0 +1,179 @@
+# analytics.py: valores conhecidos pelo caminho em Python puro (roda sem NumPy) e,
+# quando o NumPy está instalado, os mesmos resultados pelo caminho vetorizado.
+import math
+import random
+from array import array
+
+import pytest
+
+import analytics
+
+SERIES = [
+    [],
+    [7],
+    [0, 0, 0],
+    [3, 1, 4, 1, 5, 9, 2, 6, 5, 3, 5],
+    [random.Random(seed).randint(0, 12) for seed in range(60)],
+]
+
+
+def both_paths(monkeypatch, compute):
+    # Resultado com NumPy e sem ele; vetores viram listas de float para comparar
+    results = []
+    for has_numpy in (True, False):
+        monkeypatch.setattr(analytics, 'HAS_NUMPY', has_numpy)
+        result = compute()
+        if not isinstance(result, (dict, str)) and hasattr(result, '__len__'):
+            result = [float(value) for value in result]
+        results.append(result)
+    return results
+
+
+def assert_close(numpy_result, python_result):
+    if isinstance(numpy_result, dict):
+        assert numpy_result.keys() == python_result.keys()
+        for key in numpy_result:
+            assert_close(numpy_result[key], python_result[key])
+    elif isinstance(numpy_result, list):
+        assert len(numpy_result) == len(python_result)
+        for left, right in zip(numpy_result, python_result):
+            assert_close(left, right)
+    elif isinstance(numpy_result, float):
+        assert math.isclose(numpy_result, python_result, rel_tol=1e-9, abs_tol=1e-9) or numpy_result == python_result
+    else:
+        assert numpy_result == python_result
+
+
+@pytest.fixture
+def pure_python(monkeypatch):
+    monkeypatch.setattr(analytics, 'HAS_NUMPY', False)
+
+
+@pytest.fixture
+def numpy_required():
+    pytest.importorskip('numpy')
+
+
+def series(values):
+    return analytics.as_series(values)
+
+
+def test_series_are_stdlib_arrays(pure_python):
+    assert isinstance(series([1, 2]), array)
+    assert isinstance(analytics.as_series([1, 2], integer=True), array)
+
+
+def test_mean_and_population_std(pure_python):
+    values = series([3, 1, 4, 1, 5, 9, 2, 6, 5, 3, 5])
+    
+    assert analytics.mean(values) == 4.0
+    assert math.isclose(analytics.std(values), math.sqrt(56 / 11))
+    assert analytics.std(series([2, 4, 4, 4, 5, 5, 7, 9])) == 2.0
+    assert analytics.mean(series([])) == 0.0
+    assert analytics.std(series([])) == 0.0
+
+
+@pytest.mark.parametrize('pct, expected', [(0, 2.0), (25, 3.5), (50, 5.0), (90, 8.8), (100, 10.0)])
+def test_percentile_interpolates_linearly(pure_python, pct, expected):
+    assert math.isclose(analytics.percentile(series([10, 2, 6, 4]), pct), expected)
+
+
+def test_percentile_of_short_series(pure_python):
+    assert analytics.percentile(series([]), 50) == 0.0
+    assert analytics.percentile(series([7]), 90) == 7.0
+
+
+def test_trend_slope(pure_python):
+    assert analytics.trend_slope(series([1, 3, 5, 7])) == 2.0
+    assert analytics.trend_slope(series([9, 6, 3])) == -3.0
+    assert analytics.trend_slope(series([5, 5, 5])) == 0.0
+    assert analytics.trend_slope(series([4])) == 0.0
+
+
+def test_rolling_mean_over_full_windows(pure_python):
+    assert list(analytics.rolling_mean(series([1, 2, 3, 4, 5]), 3)) == [2.0, 3.0, 4.0]
+    assert list(analytics.rolling_mean(series([1, 2, 3]), 1)) == [1.0, 2.0, 3.0]
+    assert list(analytics.rolling_mean(series([1, 2]), 3)) == []
+    assert list(analytics.rolling_mean(series([1, 2]), 0)) == []
+
+
+def test_histogram_and_first_occurrence(pure_python):
+    assert list(analytics.histogram([3, 1, 3, 0], [2, 5, 1, 4], 5)) == [4.0, 5.0, 0.0, 3.0, 0.0]
+    assert list(analytics.first_occurrence([3, 1, 3], [30, 10, 20], 4)) == [math.inf, 10.0, math.inf, 20.0]
+    assert analytics.ordered_buckets([4, 5, 0, 3], [40, 10, math.inf, 20]) == [1, 3, 0]
+
+
+def test_distribution(pure_python):
+    assert analytics.distribution(series([2, 4, 6, 10])) == {
+        'count': 4, 'average': 5.5, 'median': 5.0, 'p90': 8.8, 'min': 2, 'max': 10
+    }
+
+
+@pytest.mark.parametrize('counts, trend, consistency, slope', [
+    ([1] * 7 + [3] * 7, 'up', 50.0, 0.215),
+    ([3] * 7 + [1] * 7, 'down', 50.0, -0.215),
+    ([2] * 14, 'stable', 100.0, 0.0),
+])
+def test_historical_patterns(pure_python, counts, trend, consistency, slope):
+    dates = [f'2026-03-{day + 1:02d}' for day in range(len(counts))]
+    
+    result = analytics.historical_patterns(dates, counts)
+    
+    assert result == {
+        'average_daily_activities': 2.0,
+        'best_day': dates[counts.index(max(counts))],
+        'best_day_count': max(counts),
+        'consistency_score': consistency,
+        'trend': trend,
+        'trend_slope': slope
+    }
+
+
+def test_historical_patterns_of_short_and_empty_series(pure_python):
+    # Menos de 14 dias não têm duas semanas completas para comparar
+    assert analytics.historical_patterns(['2026-03-01', '2026-03-02'], [1, 5])['trend'] == 'stable'
+    assert analytics.historical_patterns([], []) == {}
+
+
+@pytest.mark.usefixtures('numpy_required')
+@pytest.mark.parametrize('values', SERIES)
+def test_scalar_metrics_match(monkeypatch, values):
+    for func in (analytics.mean, analytics.std, analytics.trend_slope, analytics.argmax,
+                 analytics.count_positive, analytics.distribution):
+        numpy_result, python_result = both_paths(monkeypatch, lambda: func(analytics.as_series(values)))
+        assert_close(numpy_result, python_result)
+
+
+@pytest.mark.usefixtures('numpy_required')
+@pytest.mark.parametrize('values', SERIES)
+@pytest.mark.parametrize('pct', [0, 25, 50, 90, 100])
+def test_percentile_matches(monkeypatch, values, pct):
+    assert_close(*both_paths(monkeypatch, lambda: analytics.percentile(analytics.as_series(values), pct)))
+
+
+@pytest.mark.usefixtures('numpy_required')
+@pytest.mark.parametrize('values', SERIES)
+@pytest.mark.parametrize('window', [0, 1, 3, 7])
+def test_rolling_mean_matches(monkeypatch, values, window):
+    assert_close(*both_paths(monkeypatch, lambda: analytics.rolling_mean(analytics.as_series(values), window)))
+
+
+@pytest.mark.usefixtures('numpy_required')
+def test_histogram_and_first_occurrence_match(monkeypatch):
+    rng = random.Random(3)
+    keys = [rng.randrange(24) for _ in range(200)]
+    weights = [rng.randint(1, 5) for _ in keys]
+    positions = [rng.randint(1, 10000) for _ in keys]
+    
+    assert_close(*both_paths(monkeypatch, lambda: analytics.histogram(keys, weights, 24)))
+    assert_close(*both_paths(monkeypatch, lambda: analytics.first_occurrence(keys, positions, 24)))
+
+
+@pytest.mark.usefixtures('numpy_required')
+@pytest.mark.parametrize('days', [0, 1, 13, 14, 45])
+def test_historical_patterns_match(monkeypatch, days):
+    rng = random.Random(days)
+    dates = [f'2026-01-{day + 1:02d}' if day < 31 else f'2026-02-{day - 30:02d}' for day in range(days)]
+    counts = [rng.randint(0, 8) for _ in range(days)]
+    
+    assert_close(*both_paths(monkeypatch, lambda: analytics.historical_patterns(dates, counts)))
@@ -0,0 +1,65 @@
+# Tempo até a conclusão: dias entre o primeiro e o último progresso de cada
+# atividade concluída, resumidos em média, mediana, p90, mínimo e máximo.
+from datetime import date, timedelta
+
+import pytest
+
+from app import db, get_completion_days
+from models import Activity, Category, Progress
+
+START = date(2026, 3, 2)
+
+
+@pytest.fixture
+def completed_activities(user_id):
+    # (categoria, status, dias entre o primeiro e o último progresso, ou None sem progresso)
+    plan = [
+        ('Estudos', 'completed', 2),
+        ('Estudos', 'completed', 10),
+        ('Saúde', 'completed', 6),
+        ('Estudos', 'completed', 4),
+        ('Estudos', 'completed', 0),
+        ('Saúde', 'completed', None),
+        ('Saúde', 'in_progress', 30),
+    ]
+    categories = {}
+    for index, (category_name, status, days) in enumerate(plan):
+        if category_name not in categories:
+            categories[category_name] = Category(name=category_name, user_id=user_id)
+            db.session.add(categories[category_name])
+            db.session.flush()
+        activity = Activity(name=f'Atividade {index}', user_id=user_id, category_id=categories[category_name].id,
+                            measurement_type='boolean', status=status)
+        db.session.add(activity)
+        db.session.flush()
+        if days is not None:
+            for offset in sorted({0, days // 2, days}):
+                db.session.add(Progress(activity_id=activity.id, user_id=user_id,
+                                        date=START + timedelta(days=offset), value=1))
+    db.session.commit()
+
+
+def test_completion_days_per_completed_activity(user_id, completed_activities):
+    assert get_completion_days(user_id) == [
+        ('Estudos', 2), ('Estudos', 10), ('Saúde', 6), ('Estudos', 4), ('Estudos', None), ('Saúde', None)
+    ]
+
+
+def test_completion_times_distribution(client, completed_activities):
+    data = client.get('/api/profile/completion_times').get_json()
+    
+    assert data['total_completed'] == 6
+    # Durações [2, 4, 6, 10]: p90 interpola entre 6 e 10 na posição 2,7
+    assert data['overall'] == {'count': 4, 'average': 5.5, 'median': 5.0, 'p90': 8.8, 'min': 2, 'max': 10}
+    assert data['by_category'] == [
+        {'category': 'Estudos', 'count': 3, 'average': 5.3, 'median': 4.0, 'p90': 8.8, 'min': 2, 'max': 10},
+        {'category': 'Saúde', 'count': 1, 'average': 6.0, 'median': 6.0, 'p90': 6.0, 'min': 6, 'max': 6},
+    ]
+
+
+def test_completion_times_without_completed_activities(client):
+    data = client.get('/api/profile/completion_times').get_json()
+    
+    assert data['total_completed'] == 0
+    assert data['overall'] == {'count': 0, 'average': 0.0, 'median': 0.0, 'p90': 0.0, 'min': 0, 'max': 0}
+    assert data['by_category'] == []
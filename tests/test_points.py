@@ -0,0 +1,116 @@
+# Saldo de pontos: o débito é um UPDATE condicional, então resgates concorrentes
+# nunca deixam o saldo negativo e débitos maiores que o saldo são recusados.
+from concurrent.futures import ThreadPoolExecutor
+import csv
+import io
+import json
+
+import pytest
+
+import app as app_module
+from app import db
+from models import PointTransaction, Reward, UserPoints
+from conftest import client_for
+
+
+def balance(user_id):
+    db.session.expire_all()
+    return db.session.query(UserPoints.points).filter_by(user_id=user_id).scalar()
+
+
+def ledger_total(user_id):
+    return db.session.query(db.func.coalesce(db.func.sum(PointTransaction.points), 0)).filter_by(user_id=user_id).scalar()
+
+
+def test_add_points_credits_balance_and_ledger(client, user_id):
+    response = client.post('/api/points/add', json={'points': 40, 'description': 'bônus'})
+    
+    assert response.status_code == 200
+    assert response.get_json()['total_points'] == 40
+    assert balance(user_id) == 40
+    assert ledger_total(user_id) == 40
+
+
+def test_negative_adjustment_larger_than_balance_is_rejected(client, user_id):
+    client.post('/api/points/add', json={'points': 10})
+    
+    response = client.post('/api/points/add', json={'points': -11})
+    
+    assert response.status_code == 400
+    assert balance(user_id) == 10
+    assert ledger_total(user_id) == 10
+
+
+@pytest.mark.parametrize('points', ['10', 1.5, True, None, [10]])
+def test_add_points_rejects_non_integers(client, user_id, points):
+    response = client.post('/api/points/add', json={'points': points})
+    
+    assert response.status_code == 400
+    assert balance(user_id) is None
+
+
+def test_purchase_without_enough_points_is_rejected(client, user_id):
+    client.post('/api/points/add', json={'points': 20})
+    reward = Reward(name='Cara', user_id=user_id, points_required=30, reward_type='custom')
+    db.session.add(reward)
+    db.session.commit()
+    
+    response = client.post(f'/api/rewards/{reward.id}/purchase')
+    
+    assert response.status_code == 400
+    assert balance(user_id) == 20
+    db.session.refresh(reward)
+    assert not reward.achieved
+
+
+def test_concurrent_purchases_never_overdraw(user_id):
+    client_for(user_id).post('/api/points/add', json={'points': 100})
+    rewards = [Reward(name=f'Recompensa {i}', user_id=user_id, points_required=30, reward_type='custom')
+               for i in range(6)]
+    db.session.add_all(rewards)
+    db.session.commit()
+    reward_ids = [reward.id for reward in rewards]
+    
+    def purchase(reward_id):
+        return client_for(user_id).post(f'/api/rewards/{reward_id}/purchase').status_code
+    
+    with ThreadPoolExecutor(max_workers=len(reward_ids)) as executor:
+        statuses = list(executor.map(purchase, reward_ids))
+    
+    assert sorted(statuses) == [200] * 3 + [400] * 3
+    assert balance(user_id) == 10
+    assert ledger_total(user_id) == 10
+    assert Reward.query.filter_by(user_id=user_id, achieved=True).count() == 3
+
+
+def test_export_streams_the_whole_ledger_in_order(client, user_id, monkeypatch):
+    monkeypatch.setattr(app_module, 'TRANSACTIONS_EXPORT_BATCH_SIZE', 2)
+    for points in (5, 7, -3, 11, 2):
+        client.post('/api/points/add', json={'points': points})
+    
+    ndjson = client.get('/api/points/transactions/export')
+    records = [json.loads(line) for line in ndjson.get_data(as_text=True).splitlines()]
+    rows = list(csv.reader(io.StringIO(client.get('/api/points/transactions/export?format=csv').get_data(as_text=True))))
+    
+    assert ndjson.status_code == 200
+    assert [record['points'] for record in records] == [5, 7, -3, 11, 2]
+    assert rows[0] == list(app_module.TRANSACTION_EXPORT_FIELDS)
+    assert [int(row[1]) for row in rows[1:]] == [5, 7, -3, 11, 2]
+
+
+def test_exports_closed_before_the_end_release_cleanly(client, user_id, monkeypatch):
+    # O cliente pode desistir no meio do download, em qualquer ordem; o gerador
+    # não depende do contexto da requisição, que já foi encerrado
+    monkeypatch.setattr(app_module, 'TRANSACTIONS_EXPORT_BATCH_SIZE', 2)
+    for points in range(1, 7):
+        client.post('/api/points/add', json={'points': points})
+    
+    first = client.get('/api/points/transactions/export', buffered=False)
+    second = client.get('/api/points/transactions/export?format=csv', buffered=False)
+    first_chunk = next(first.iter_encoded())
+    next(second.iter_encoded())
+    first.close()
+    second.close()
+    
+    assert [json.loads(line)['points'] for line in first_chunk.decode().splitlines()] == [1, 2]
+    assert client.post('/api/points/add', json={'points': 1}).status_code == 200
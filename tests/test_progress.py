@@ -0,0 +1,193 @@
+# Registro de progresso: o upsert em (activity_id, date) distingue criação de
+# substituição e os totais incrementais batem com o recálculo completo.
+import threading
+from datetime import date, timedelta
+
+import pytest
+
+import app as app_module
+from app import (app as flask_app, db, apply_progress_total_delta, get_or_create_progress_total, rebuild_daily_stats,
+                 rebuild_progress_totals, upsert_progress_entry)
+from models import Activity, ActivityProgressTotal, Category, PointTransaction, Progress, UserPoints
+from conftest import client_for
+
+
+@pytest.fixture
+def activities(user_id):
+    category = Category(name='Saúde', user_id=user_id)
+    db.session.add(category)
+    db.session.flush()
+    rows = [
+        Activity(name='Leitura', user_id=user_id, category_id=category.id, measurement_type='units',
+                 target_value=100, target_unit='páginas'),
+        Activity(name='Corrida', user_id=user_id, category_id=category.id, measurement_type='percentage'),
+        Activity(name='Meditação', user_id=user_id, category_id=category.id, measurement_type='boolean'),
+    ]
+    db.session.add_all(rows)
+    db.session.commit()
+    return [activity.id for activity in rows]
+
+
+def assert_aggregates_consistent(user_id):
+    db.session.expire_all()
+    # Atividades sem nenhum registro não têm linha de total, o que a reconstrução relata
+    mismatches = rebuild_progress_totals(user_id=user_id, fix=False)
+    assert [item for item in mismatches if item['stored_count'] is not None or item['expected_count']] == []
+    assert rebuild_daily_stats(user_id, fix=False) == []
+    ledger = db.session.query(db.func.coalesce(db.func.sum(PointTransaction.points), 0)).filter_by(user_id=user_id).scalar()
+    earned = db.session.query(db.func.coalesce(db.func.sum(Progress.points_earned), 0)).filter_by(user_id=user_id).scalar()
+    assert ledger == earned
+    assert (db.session.query(UserPoints.points).filter_by(user_id=user_id).scalar() or 0) == ledger
+
+
+def test_resubmission_replaces_the_day_entry(client, user_id, activities):
+    reading = activities[0]
+    
+    first = client.post('/api/progress', json={'activity_id': reading, 'value': 20}).get_json()
+    second = client.post('/api/progress', json={'activity_id': reading, 'value': 30}).get_json()
+    
+    assert first['is_update'] is False
+    assert second['is_update'] is True
+    assert second['id'] == first['id']
+    
+    total = ActivityProgressTotal.query.filter_by(activity_id=reading).one()
+    assert (total.total_value, total.entry_count) == (30, 1)
+    assert_aggregates_consistent(user_id)
+
+
+def test_batch_totals_match_full_rebuild(client, user_id, activities):
+    reading, running, meditation = activities
+    today = date.today()
+    client.post('/api/progress', json={'activity_id': reading, 'value': 10, 'date': today.isoformat()})
+    
+    entries = [
+        {'activity_id': reading, 'value': 15, 'date': today.isoformat()},
+        {'activity_id': reading, 'value': 5, 'date': (today - timedelta(days=1)).isoformat()},
+        {'activity_id': running, 'value': 40, 'date': today.isoformat()},
+        {'activity_id': running, 'value': 100, 'date': (today - timedelta(days=2)).isoformat()},
+        {'activity_id': meditation, 'date': today.isoformat()},
+        {'activity_id': meditation, 'date': today.isoformat()},
+    ]
+    response = client.post('/api/progress/batch', json={'entries': entries})
+    
+    assert response.status_code == 200
+    assert Progress.query.filter_by(user_id=user_id).count() == 5
+    assert_aggregates_consistent(user_id)
+
+
+def test_daily_stats_are_written_with_the_progress(client, user_id, activities, monkeypatch):
+    # O agregado diário não depende de tarefas em segundo plano: mesmo que nenhuma
+    # rode, ele já está correto quando a escrita é confirmada
+    monkeypatch.setattr(app_module, 'submit_background_job', lambda *args, **kwargs: None)
+    reading, running, meditation = activities
+    
+    client.post('/api/progress', json={'activity_id': reading, 'value': 100})
+    client.post('/api/progress', json={'activity_id': reading, 'value': 40})
+    client.post('/api/progress/batch', json={'entries': [
+        {'activity_id': running, 'value': 100},
+        {'activity_id': meditation},
+    ]})
+    
+    assert_aggregates_consistent(user_id)
+
+
+def test_invalid_batch_writes_nothing(client, user_id, activities):
+    response = client.post('/api/progress/batch', json={'entries': [
+        {'activity_id': activities[0], 'value': 10},
+        {'activity_id': activities[1], 'value': 150},
+    ]})
+    
+    assert response.status_code == 400
+    assert Progress.query.filter_by(user_id=user_id).count() == 0
+
+
+def test_concurrent_first_submissions_create_one_entry(user_id, activities):
+    # A primeira transação insere e segura o commit; a segunda tenta a mesma chave
+    # enquanto isso e precisa esperar e enxergar o registro como anterior. No
+    # PostgreSQL (TEST_DATABASE_URL) exercita o ON CONFLICT DO NOTHING + FOR UPDATE;
+    # no SQLite o bloqueio do banco serializa as duas
+    values = {
+        'activity_id': activities[0], 'user_id': user_id, 'date': date.today(), 'value': 10.0,
+        'unit': 'páginas', 'notes': '', 'completed': False, 'from_schedule': False,
+        'points_earned': 1, 'streak_bonus': 0
+    }
+    first_inserted = threading.Event()
+    release_first = threading.Event()
+    results = {}
+    
+    def submit(name, value, before_commit=None):
+        with flask_app.app_context():
+            try:
+                results[name] = upsert_progress_entry(dict(values, value=value))
+                if before_commit:
+                    before_commit()
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                results[name] = e
+    
+    def hold_first():
+        first_inserted.set()
+        release_first.wait(timeout=10)
+    
+    first = threading.Thread(target=submit, args=('first', 10.0, hold_first))
+    second = threading.Thread(target=submit, args=('second', 25.0))
+    first.start()
+    assert first_inserted.wait(timeout=10)
+    second.start()
+    second.join(timeout=0.5)
+    # A segunda submissão continua esperando o commit da primeira
+    assert second.is_alive()
+    release_first.set()
+    first.join(timeout=10)
+    second.join(timeout=10)
+    
+    first_id, first_previous = results['first']
+    second_id, second_previous = results['second']
+    assert first_previous is None
+    assert second_id == first_id
+    assert second_previous == {'value': 10.0, 'completed': False, 'points_earned': 1}
+    
+    db.session.expire_all()
+    assert Progress.query.filter_by(activity_id=activities[0]).one().value == 25.0
+
+
+def test_concurrent_first_totals_create_one_row(user_id, activities):
+    # As duas transações não encontram a linha de total; a segunda tenta inseri-la
+    # enquanto a primeira segura o commit e, depois dele, usa a linha já criada
+    first_inserted = threading.Event()
+    release_first = threading.Event()
+    results = {}
+    
+    def submit(name, before_commit=None):
+        with flask_app.app_context():
+            try:
+                activity = db.session.get(Activity, activities[0])
+                total_row = get_or_create_progress_total(activity)
+                apply_progress_total_delta(total_row, 5.0, 1)
+                if before_commit:
+                    before_commit()
+                db.session.commit()
+                results[name] = 'ok'
+            except Exception as e:
+                db.session.rollback()
+                results[name] = e
+    
+    def hold_first():
+        first_inserted.set()
+        release_first.wait(timeout=10)
+    
+    first = threading.Thread(target=submit, args=('first', hold_first))
+    second = threading.Thread(target=submit, args=('second',))
+    first.start()
+    assert first_inserted.wait(timeout=10)
+    second.start()
+    second.join(timeout=0.5)
+    release_first.set()
+    first.join(timeout=10)
+    second.join(timeout=10)
+    
+    assert results == {'first': 'ok', 'second': 'ok'}
+    db.session.expire_all()
+    total_row = db.session.get(ActivityProgressTotal, activities[0])
+    assert (total_row.total_value, total_row.entry_count) == (10.0, 2)
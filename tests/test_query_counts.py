@@ -0,0 +1,63 @@
+# As listagens que antes faziam N+1 (carregamento preguiçoso por linha) devem
+# rodar o mesmo número de consultas para um usuário pequeno e para um grande.
+from datetime import date, timedelta
+
+import pytest
+
+from app import db, create_synthetic_data_for_user, get_recent_activities
+from conftest import client_for, count_queries
+
+SMALL = {'activities': 5, 'days': 10, 'progress_per_day': 2, 'schedules_per_day': 1}
+LARGE = {'activities': 60, 'days': 10, 'progress_per_day': 20, 'schedules_per_day': 12}
+
+week_start = date.today() - timedelta(days=date.today().weekday())
+
+ENDPOINTS = [
+    f'/api/schedules?week_start={week_start.isoformat()}',
+    '/api/progress/recent',
+    '/api/points/transactions',
+]
+
+
+@pytest.fixture
+def small_and_large_users(make_user):
+    users = []
+    for size in (SMALL, LARGE):
+        user_id = make_user()
+        create_synthetic_data_for_user(user_id, categories=4, max_depth=2, **size)
+        users.append(user_id)
+    return users
+
+
+def measure(user_id, path):
+    client = client_for(user_id)
+    # Primeira chamada fora da medição: carga inicial dos agregados do usuário
+    client.get(path)
+    with count_queries() as counter:
+        response = client.get(path)
+    assert response.status_code == 200
+    return counter['count'], len(response.get_json())
+
+
+@pytest.mark.parametrize('path', ENDPOINTS)
+def test_listing_query_count_does_not_grow_with_rows(small_and_large_users, path):
+    small_user, large_user = small_and_large_users
+    
+    small_queries, small_rows = measure(small_user, path)
+    large_queries, large_rows = measure(large_user, path)
+    
+    assert large_rows > small_rows
+    assert large_queries == small_queries
+
+
+def test_recent_activities_query_count_does_not_grow_with_rows(app, small_and_large_users):
+    counts = []
+    for user_id in small_and_large_users:
+        db.session.expunge_all()
+        with app.test_request_context(), count_queries() as counter:
+            rows = get_recent_activities(user_id, limit=500)
+        counts.append((counter['count'], len(rows)))
+    
+    (small_queries, small_rows), (large_queries, large_rows) = counts
+    assert large_rows > small_rows
+    assert large_queries == small_queries
@@ -0,0 +1,97 @@
+# Repetições de agendamento: ocorrências virtuais expandidas na leitura entram nas
+# estatísticas e nos padrões de horário como os agendamentos concretos.
+from datetime import date, timedelta
+
+import pytest
+
+from app import (app as flask_app, db, analyze_time_patterns, get_category_rollup, get_daily_stats_series,
+                 get_schedule_priority_metrics, get_time_patterns, rebuild_daily_stats, sum_daily_stats)
+from models import Activity, Category, ScheduledActivity
+from conftest import client_for
+
+TODAY = date.today()
+START = TODAY - timedelta(days=6)
+
+
+@pytest.fixture
+def rule(client, user_id):
+    category = Category(name='Saúde', user_id=user_id)
+    db.session.add(category)
+    db.session.flush()
+    activity = Activity(name='Alongamento', user_id=user_id, category_id=category.id, measurement_type='boolean')
+    db.session.add(activity)
+    db.session.commit()
+    
+    response = client.post('/api/recurrences', json={
+        'activity_id': activity.id, 'frequency': 'daily', 'start_date': START.isoformat(),
+        'until_date': (TODAY + timedelta(days=10)).isoformat(), 'scheduled_time': '07:30', 'duration': 20
+    })
+    assert response.status_code == 200
+    return {'id': response.get_json()['id'], 'activity_id': activity.id, 'category_id': category.id}
+
+
+def read(func, *args, **kwargs):
+    # Contexto novo a cada leitura: a memoização por requisição não reaproveita resultados
+    with flask_app.app_context():
+        return func(*args, **kwargs)
+
+
+def test_week_lists_virtual_occurrences_with_text_ids(client, rule):
+    week_start = START - timedelta(days=START.weekday())
+    schedules = client.get(f'/api/schedules?week_start={week_start.isoformat()}').get_json()
+    
+    virtual = [schedule for schedule in schedules if schedule.get('virtual')]
+    assert virtual
+    assert all(schedule['id'] == f"r{rule['id']}-{schedule['scheduled_date']}" for schedule in virtual)
+
+
+def test_virtual_occurrences_count_in_daily_stats_until_today(user_id, rule):
+    series = read(get_daily_stats_series, user_id, START)
+    
+    assert sorted(series) == [START + timedelta(days=offset) for offset in range(7)]
+    assert all(day['scheduled_count'] == 1 and day['scheduled_minutes'] == 20 for day in series.values())
+    assert read(sum_daily_stats, user_id, START)['scheduled_minutes'] == 140
+    assert read(get_schedule_priority_metrics, user_id)['today'] == 1
+    
+    rollup = read(get_category_rollup, user_id, {'all': (None, None), 'future': (TODAY + timedelta(days=1), None)})
+    assert rollup == [{
+        'category_id': rule['category_id'], 'name': 'Saúde', 'color': rollup[0]['color'],
+        'periods': {'all': {'value': 140, 'count': 7}, 'future': {'value': 0, 'count': 0}}
+    }]
+    # O agregado gravado continua só com os agendamentos concretos
+    assert read(rebuild_daily_stats, user_id, fix=False) == []
+
+
+def test_virtual_occurrences_count_in_history_and_time_patterns(client, user_id, rule):
+    historical = client.get('/api/profile/historical?days=30').get_json()
+    
+    assert historical['summary']['total_scheduled'] == 7
+    assert sum(day['time_spent'] for day in historical['historical_data']) == 140
+    assert read(analyze_time_patterns, user_id)['preferred_times'] == {'07:00': 7}
+    assert read(get_time_patterns, user_id)['hourly_patterns'] == {'07:30': 7}
+
+
+def test_deleted_and_materialized_occurrences_are_not_counted_twice(client, user_id, rule):
+    other = Activity(name='Caminhada', user_id=user_id, category_id=rule['category_id'], measurement_type='boolean')
+    db.session.add(other)
+    db.session.commit()
+    yesterday = TODAY - timedelta(days=1)
+    
+    assert client.delete(f"/api/schedules/r{rule['id']}-{TODAY.isoformat()}").status_code == 200
+    response = client.put(f"/api/schedules/r{rule['id']}-{yesterday.isoformat()}", json={
+        'activity_id': other.id, 'scheduled_date': yesterday.isoformat(), 'scheduled_time': '18:00', 'duration': 45
+    })
+    
+    assert response.status_code == 200
+    assert db.session.get(ScheduledActivity, response.get_json()['id']).activity_id == other.id
+    totals = read(sum_daily_stats, user_id, START)
+    assert (totals['scheduled_count'], totals['scheduled_minutes']) == (6, 5 * 20 + 45)
+    assert read(rebuild_daily_stats, user_id, fix=False) == []
+
+
+def test_occurrence_of_another_user_is_not_found(rule, make_user):
+    other_client = client_for(make_user())
+    
+    response = other_client.delete(f"/api/schedules/r{rule['id']}-{TODAY.isoformat()}")
+    
+    assert response.status_code == 404
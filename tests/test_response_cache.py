@@ -0,0 +1,73 @@
+# Cache de respostas e ETag: respostas normais são reaproveitadas; as de contingência
+# (falha transitória devolvida com 200) não são gravadas nem recebem ETag.
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+import app as app_module
+from app import app as flask_app, db, delete_user_data
+from models import BackgroundJob, ResponseCacheEntry, UserDataVersion
+
+
+@pytest.fixture(autouse=True)
+def cache_ttl(monkeypatch):
+    monkeypatch.setitem(flask_app.config, 'RESPONSE_CACHE_TTL', 300)
+
+
+def broken(*args, **kwargs):
+    raise RuntimeError('banco indisponível')
+
+
+def test_successful_response_is_cached_with_etag(client):
+    first = client.get('/api/profile/historical?days=7')
+    second = client.get('/api/profile/historical?days=7')
+    
+    assert first.headers['X-Cache'] == 'MISS'
+    assert second.headers['X-Cache'] == 'HIT'
+    assert second.headers['ETag'] == first.headers['ETag']
+    assert client.get('/api/profile/historical?days=7', headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+
+
+@pytest.mark.parametrize('path, dependency', [
+    ('/api/activities/hierarchy', 'load_activity_subtree'),
+    ('/api/profile/complete', 'get_category_time'),
+    ('/api/profile/historical?days=7', 'expand_recurrence_occurrences'),
+])
+def test_fallback_response_is_not_cached(client, monkeypatch, path, dependency):
+    with monkeypatch.context() as patch:
+        patch.setattr(app_module, dependency, broken)
+        fallback = client.get(path)
+    
+    assert fallback.status_code == 200
+    assert 'ETag' not in fallback.headers
+    
+    recovered = client.get(path)
+    assert recovered.headers['X-Cache'] == 'MISS'
+    assert 'ETag' in recovered.headers
+
+
+def add_account_rows(user_id):
+    db.session.add(ResponseCacheEntry(cache_key=f'teste-{user_id}', user_id=user_id, payload='{}',
+                                      expires_at=datetime.utcnow() + timedelta(minutes=5)))
+    db.session.add(BackgroundJob(task='purge_response_cache', payload=json.dumps({'user_id': user_id})))
+    db.session.commit()
+
+
+def test_reset_keeps_data_version_and_account_removal_drops_it(client, user_id, make_user):
+    other_id = make_user()
+    client.post('/api/categories', json={'name': 'Leitura'})
+    add_account_rows(user_id)
+    add_account_rows(other_id)
+    
+    delete_user_data(user_id)
+    db.session.commit()
+    
+    assert ResponseCacheEntry.query.filter_by(user_id=user_id).count() == 0
+    assert [json.loads(job.payload)['user_id'] for job in BackgroundJob.query.all()] == [other_id]
+    assert db.session.get(UserDataVersion, user_id).version >= 1
+    
+    delete_user_data(user_id, remove_account=True)
+    db.session.commit()
+    
+    assert db.session.get(UserDataVersion, user_id) is None
@@ -0,0 +1,82 @@
+# Recompensas condicionais: regras avaliadas por evento e vínculo com atividades excluídas.
+import pytest
+
+from app import db, build_reward_rule_index, evaluate_reward_rules
+from models import Activity, Category, Reward, WeeklyStreak
+
+
+@pytest.fixture
+def category(user_id):
+    category = Category(name='Estudos', user_id=user_id)
+    db.session.add(category)
+    db.session.commit()
+    return category
+
+
+def add_activity(user_id, category, name, **fields):
+    activity = Activity(name=name, user_id=user_id, category_id=category.id, measurement_type='boolean', **fields)
+    db.session.add(activity)
+    db.session.commit()
+    return activity
+
+
+def add_reward(user_id, name, condition_type, condition_value=None, activity=None):
+    reward = Reward(name=name, user_id=user_id, condition_type=condition_type, condition_value=condition_value,
+                    condition_activity_id=activity.id if activity else None)
+    db.session.add(reward)
+    db.session.commit()
+    return reward.id
+
+
+def test_rule_index_loads_only_rules_the_event_can_satisfy(user_id, category):
+    touched = add_activity(user_id, category, 'Leitura')
+    other = add_activity(user_id, category, 'Escrita')
+    touched_rule = add_reward(user_id, 'Leitor', 'activity', activity=touched)
+    add_reward(user_id, 'Escritor', 'activity', activity=other)
+    reached = add_reward(user_id, 'Duas semanas', 'streak', 2)
+    add_reward(user_id, 'Cinco semanas', 'streak', 5)
+    
+    index = build_reward_rule_index(user_id, [touched.id], streak_count=3)
+    
+    assert index['activity'] == {touched.id: [(touched_rule, None)]}
+    assert index['streak'] == [reached]
+    assert build_reward_rule_index(user_id, [touched.id])['streak'] == []
+
+
+def test_evaluation_marks_completed_activity_and_reached_streak(user_id, category):
+    done = add_activity(user_id, category, 'Leitura', status='completed')
+    pending = add_activity(user_id, category, 'Escrita')
+    done_rule = add_reward(user_id, 'Leitor', 'activity', activity=done)
+    pending_rule = add_reward(user_id, 'Escritor', 'activity', activity=pending)
+    reached = add_reward(user_id, 'Duas semanas', 'streak', 2)
+    add_reward(user_id, 'Cinco semanas', 'streak', 5)
+    db.session.add(WeeklyStreak(user_id=user_id, streak_count=2))
+    db.session.commit()
+    
+    achieved = evaluate_reward_rules(user_id, [done.id, pending.id], streak=True)
+    db.session.commit()
+    
+    assert sorted(achieved) == sorted([done_rule, reached])
+    assert db.session.get(Reward, pending_rule).achieved is False
+
+
+def test_deleting_an_activity_detaches_its_reward_rules(client, user_id, category):
+    activity = add_activity(user_id, category, 'Leitura')
+    reward_id = add_reward(user_id, 'Leitor', 'activity', activity=activity)
+    
+    response = client.delete(f'/api/activities/{activity.id}')
+    
+    assert response.status_code == 200
+    db.session.expire_all()
+    assert db.session.get(Reward, reward_id).condition_activity_id is None
+
+
+def test_deleting_a_category_detaches_its_activities_reward_rules(client, user_id, category):
+    activity = add_activity(user_id, category, 'Leitura')
+    reward_id = add_reward(user_id, 'Leitor', 'activity', activity=activity)
+    
+    response = client.delete(f'/api/categories/{category.id}')
+    
+    assert response.status_code == 200
+    db.session.expire_all()
+    assert db.session.get(Reward, reward_id).condition_activity_id is None
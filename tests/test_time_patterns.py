@@ -0,0 +1,116 @@
+# Análise de horários: recalculada sobre a janela a cada leitura ('window') ou lida dos
+# contadores por dia da semana e hora mantidos na escrita ('incremental'); nos dois modos
+# criações, edições e exclusões de agendamentos aparecem na leitura seguinte.
+from datetime import date, timedelta
+
+import pytest
+
+from app import (app as flask_app, db, analyze_time_patterns, rebuild_schedule_time_stats,
+                 create_synthetic_data_for_user, WEEKDAY_NAMES)
+from models import Activity, Category, ScheduledActivity
+
+
+@pytest.fixture
+def activity_id(user_id):
+    category = Category(name='Trabalho', user_id=user_id)
+    db.session.add(category)
+    db.session.flush()
+    activity = Activity(name='Revisão', user_id=user_id, category_id=category.id, measurement_type='boolean')
+    db.session.add(activity)
+    db.session.commit()
+    return activity.id
+
+
+@pytest.fixture(params=['window', 'incremental'])
+def mode(request, monkeypatch):
+    monkeypatch.setitem(flask_app.config, 'TIME_PATTERNS_MODE', request.param)
+    return request.param
+
+
+def patterns(user_id):
+    # Contexto novo: a memoização por requisição não reaproveita a leitura anterior
+    with flask_app.app_context():
+        return analyze_time_patterns(user_id)
+
+
+def test_patterns_follow_schedule_edits_and_deletes(client, user_id, activity_id, mode):
+    monday = date.today() - timedelta(days=date.today().weekday() + 7)
+    tuesday = monday + timedelta(days=1)
+    first = client.post('/api/schedules', json={'activity_id': activity_id, 'scheduled_date': monday.isoformat(),
+                                                'scheduled_time': '08:00', 'duration': 30}).get_json()['id']
+    second = client.post('/api/schedules', json={'activity_id': activity_id, 'scheduled_date': tuesday.isoformat(),
+                                                 'scheduled_time': '9:30', 'duration': 60}).get_json()['id']
+    
+    before = patterns(user_id)
+    assert before['busiest_days'] == {WEEKDAY_NAMES[0]: 1, WEEKDAY_NAMES[1]: 1}
+    assert before['preferred_times'] == {'08:00': 1, '09:00': 1}
+    assert before['average_session_length'] == 45
+    
+    client.put(f'/api/schedules/{second}', json={'scheduled_date': (monday + timedelta(days=2)).isoformat(),
+                                                  'scheduled_time': '18:00'})
+    client.delete(f'/api/schedules/{first}')
+    
+    after = patterns(user_id)
+    assert after['busiest_days'] == {WEEKDAY_NAMES[2]: 1}
+    assert after['preferred_times'] == {'18:00': 1}
+    assert after['average_session_length'] == 60
+
+
+def test_patterns_ignore_schedules_outside_the_window(client, user_id, activity_id, monkeypatch):
+    monkeypatch.setitem(flask_app.config, 'TIME_PATTERNS_WINDOW_DAYS', 30)
+    old = date.today() - timedelta(days=60)
+    recent = date.today() - timedelta(days=3)
+    for day in (old, recent):
+        client.post('/api/schedules', json={'activity_id': activity_id, 'scheduled_date': day.isoformat(),
+                                            'scheduled_time': '07:00', 'duration': 20})
+    
+    assert patterns(user_id)['busiest_days'] == {WEEKDAY_NAMES[recent.weekday()]: 1}
+
+
+def test_counters_follow_every_schedule_write(client, user_id, activity_id):
+    monday = date.today() - timedelta(days=date.today().weekday() + 14)
+    first = client.post('/api/schedules', json={'activity_id': activity_id, 'scheduled_date': monday.isoformat(),
+                                                'scheduled_time': '08:00', 'duration': 30}).get_json()['id']
+    client.post('/api/schedules', json={'activity_id': activity_id, 'scheduled_date': monday.isoformat(),
+                                        'scheduled_time': '', 'duration': 10})
+    client.post(f'/api/schedules/{first}/replicate', json={'type': 'daily',
+                                                           'until_date': (monday + timedelta(days=3)).isoformat()})
+    client.put(f'/api/schedules/{first}', json={'scheduled_time': '21:15', 'duration': 50})
+    rule = client.post('/api/recurrences', json={'activity_id': activity_id, 'frequency': 'daily',
+                                                 'start_date': monday.isoformat(), 'scheduled_time': '06:00',
+                                                 'duration': 15}).get_json()['id']
+    client.put(f'/api/schedules/r{rule}-{monday.isoformat()}', json={'scheduled_time': '12:00'})
+    
+    assert rebuild_schedule_time_stats(user_id, fix=False) == []
+    
+    client.delete(f'/api/activities/{activity_id}')
+    
+    assert rebuild_schedule_time_stats(user_id, fix=False) == []
+
+
+def test_incremental_mode_backfills_existing_schedules(user_id, activity_id, monkeypatch):
+    monkeypatch.setitem(flask_app.config, 'TIME_PATTERNS_MODE', 'incremental')
+    wednesday = date.today() - timedelta(days=date.today().weekday() + 5)
+    db.session.add(ScheduledActivity(activity_id=activity_id, user_id=user_id, scheduled_date=wednesday,
+                                     scheduled_time='14:45', duration=40))
+    db.session.commit()
+    
+    result = patterns(user_id)
+    
+    assert result['busiest_days'] == {WEEKDAY_NAMES[2]: 1}
+    assert result['preferred_times'] == {'14:00': 1}
+    assert rebuild_schedule_time_stats(user_id, fix=False) == []
+
+
+def test_incremental_mode_matches_full_window(make_user, monkeypatch):
+    user_id = make_user()
+    create_synthetic_data_for_user(user_id, categories=3, activities=20, max_depth=2, days=40,
+                                   progress_per_day=1, schedules_per_day=6)
+    
+    monkeypatch.setitem(flask_app.config, 'TIME_PATTERNS_WINDOW_DAYS', 0)
+    window = patterns(user_id)
+    monkeypatch.setitem(flask_app.config, 'TIME_PATTERNS_MODE', 'incremental')
+    incremental = patterns(user_id)
+    
+    assert incremental == window
+    assert list(incremental['busiest_days']) == [WEEKDAY_NAMES[day] for day in range(7)]